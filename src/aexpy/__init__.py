@@ -47,8 +47,58 @@ def runInDocker():
     return os.getenv("RUN_IN_DOCKER") is not None
 
 
+def runOffline():
+    return os.getenv("AEXPY_OFFLINE") is not None
+
+
+def getEnvironmentPoolSize() -> int | None:
+    """Number of warm extraction environments kept per Python version, or None to disable pooling."""
+
+    size = os.getenv("AEXPY_ENV_POOL")
+    if size is None:
+        return None
+    try:
+        return max(0, int(size))
+    except ValueError:
+        return None
+
+
+def getEnvironmentReuseBudget() -> int | None:
+    """Disk budget in bytes for extraction environments kept for reuse, or None to disable reusing."""
+
+    budget = os.getenv("AEXPY_ENV_REUSE")
+    if budget is None:
+        return None
+    try:
+        return max(0, int(float(budget) * (1 << 30)))
+    except ValueError:
+        return None
+
+
+def getDetectorServerIdle() -> float | None:
+    """Idle seconds before a long-lived API detector server exits, or None to run the detector once per extraction."""
+
+    idle = os.getenv("AEXPY_DETECTOR_SERVER")
+    if idle is None:
+        return None
+    try:
+        return max(1.0, float(idle))
+    except ValueError:
+        return None
+
+
+def getDetectorPreloads() -> list[str]:
+    """Modules imported once by API detector servers, before forking for each extraction."""
+
+    return [
+        name.strip()
+        for name in os.getenv("AEXPY_DETECTOR_PRELOAD", "").split(",")
+        if name.strip()
+    ]
+
+
 def getEnvironmentManager():
     env = os.getenv("AEXPY_ENV_PROVIDER")
-    if env in {"micromamba", "conda", "mamba"}:
+    if env in {"micromamba", "conda", "mamba", "venv"}:
         return env
     return "micromamba"
@@ -2,6 +2,7 @@ import code
 from io import BytesIO, TextIOWrapper
 import json
 import logging
+import os
 from pathlib import Path
 import sys
 from tempfile import TemporaryDirectory
@@ -12,11 +13,12 @@ import click
 
 from aexpy.models import ProduceState
 from aexpy.caching import (
+    FileProduceCache,
     StreamReaderProduceCache,
     StreamWriterProduceCache,
 )
 
-from . import __version__, initializeLogging, runInDocker
+from . import __version__, initializeLogging, runInDocker, runOffline
 from .models import (
     ApiDescription,
     ApiDifference,
@@ -27,7 +29,6 @@ from .models import (
 )
 from .producers import ProduceContext, produce
 
-
 FLAG_interact = False
 
 
@@ -107,6 +108,9 @@ def preprocessCore(
     mode: (
         Literal["src"] | Literal["dist"] | Literal["wheel"] | Literal["release"]
     ) = "src",
+    offline: bool = False,
+    unpack: Literal["full"] | Literal["sources"] | Literal["mount"] = "full",
+    metadataOnly: bool = False,
 ):
     from .models import Distribution
 
@@ -129,15 +133,28 @@ def preprocessCore(
             pyversion=pyversion,
         )
     ) as context:
+        if mode == "release" and metadataOnly:
+            assert (
+                context.product.release.project and context.product.release.version
+            ), "Please give the release ID."
+            from .preprocessing.download import WheelMetadataFetchPreprocessor
+
+            preprocessor = WheelMetadataFetchPreprocessor(
+                logger=context.logger, offline=offline
+            )
+            context.use(preprocessor)
+            preprocessor.preprocess(context.product)
+            return context
+
         if mode == "release":
             assert path.is_dir(), "The cache path should be a directory."
             assert (
                 context.product.release.project and context.product.release.version
             ), "Please give the release ID."
-            from .preprocessing.download import PipWheelDownloadPreprocessor
+            from .preprocessing.download import WheelDownloadPreprocessor
 
-            preprocessor = PipWheelDownloadPreprocessor(
-                cacheDir=path, logger=context.logger
+            preprocessor = WheelDownloadPreprocessor(
+                cacheDir=path, logger=context.logger, offline=offline
             )
             context.use(preprocessor)
             preprocessor.preprocess(context.product)
@@ -153,7 +170,9 @@ def preprocessCore(
             else:
                 # a cache path, from release download
                 assert context.product.wheelFile, "The wheel path should be a file."
-            preprocessor = WheelUnpackPreprocessor(cacheDir=path, logger=context.logger)
+            preprocessor = WheelUnpackPreprocessor(
+                cacheDir=path, logger=context.logger, mode=unpack
+            )
             context.use(preprocessor)
             preprocessor.preprocess(context.product)
             mode = "dist"
@@ -180,12 +199,84 @@ def preprocessCore(
     return context
 
 
+type BatchItem = tuple[str, Literal["src", "dist", "wheel", "release"], Path, str]
+"""Output id, preprocessing mode, path and project of an item in a batch."""
+
+
+def parseBatchManifest(manifest: Path, cacheDir: Path) -> list[BatchItem]:
+    """Parse a manifest with one release ID, wheel file or directory per line.
+
+    Blank lines, lines starting with `#` and duplicated items are ignored.
+    Relative paths are resolved against the manifest directory.
+    """
+
+    items: list[BatchItem] = []
+    for line in manifest.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = (manifest.parent / line).resolve()
+        if path.is_file():
+            items.append((path.stem, "wheel", path, ""))
+        elif path.is_dir():
+            mode = "dist" if any(path.glob("*.dist-info")) else "src"
+            items.append((path.name, mode, path, ""))
+        else:
+            release = Release.fromId(line)
+            assert (
+                release.project and release.version
+            ), f"Invalid batch item, neither a path nor a release ID: {line}"
+            items.append((str(release), "release", cacheDir, line))
+    seen: set[str] = set()
+    return [item for item in items if not (item[0] in seen or seen.add(item[0]))]
+
+
+def preprocessBatchItem(
+    item: BatchItem,
+    output: Path,
+    offline: bool = False,
+    unpack: Literal["full"] | Literal["sources"] | Literal["mount"] = "full",
+    metadataOnly: bool = False,
+):
+    """Preprocess an item in a batch, and return its id, success, duration and error."""
+
+    id, mode, path, project = item
+    context = preprocessCore(
+        path=path,
+        project=project,
+        mode=mode,
+        offline=offline,
+        unpack=unpack,
+        metadataOnly=metadataOnly,
+    )
+    FileProduceCache(id, output / f"{id}.json", output / f"{id}.log").save(
+        context.product, context.log
+    )
+    return (
+        id,
+        context.product.success,
+        context.product.duration.total_seconds(),
+        str(context.exception or ""),
+    )
+
+
 def extractCore(
     data: Distribution,
     env: str = "",
     temp: bool = False,
+    workers: int = 0,
+    payload: str = "full",
+    static: bool = False,
 ):
     with produce(ApiDescription(distribution=data)) as context:
+        if static:
+            from .extracting.static import StaticExtractor
+
+            extractor = StaticExtractor(logger=context.logger)
+            context.use(extractor)
+            extractor.extract(data, context.product)
+            return context
+
         from .extracting.default import DefaultExtractor
 
         if env:
@@ -209,8 +300,10 @@ def extractCore(
                 CurrentEnvironment(context.logger), context.logger
             )
 
-        with envBuilder.use(data.pyversion, context.logger) as eenv:
-            extractor = DefaultExtractor(env=eenv, logger=context.logger)
+        with envBuilder.use(data.pyversion, context.logger, data) as eenv:
+            extractor = DefaultExtractor(
+                env=eenv, logger=context.logger, workers=workers, payload=payload
+            )
             context.use(extractor)
             extractor.extract(data, context.product)
 
@@ -261,6 +354,25 @@ def extractCore(
 )
 @click.option("-w", "--wheel", "mode", flag_value="wheel", help="Wheel file mode")
 @click.option("-r", "--release", "mode", flag_value="release", help="Release ID mode")
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=runOffline(),
+    help="Only use cached index metadata and stored wheels, without network access.",
+)
+@click.option(
+    "--unpack",
+    type=click.Choice(["full", "sources", "mount"]),
+    default="full",
+    help="How to unpack the wheel: all files, only Python sources and dist-info, or read the wheel in place.",
+)
+@click.option(
+    "--metadata-only",
+    "metadataOnly",
+    is_flag=True,
+    default=False,
+    help="For releases, only fetch dist-info from the index without downloading the wheel.",
+)
 def preprocess(
     path: Path,
     distribution: IO[str],
@@ -272,6 +384,9 @@ def preprocess(
     mode: (
         Literal["src"] | Literal["dist"] | Literal["wheel"] | Literal["release"]
     ) = "src",
+    offline: bool = False,
+    unpack: Literal["full"] | Literal["sources"] | Literal["mount"] = "full",
+    metadataOnly: bool = False,
 ):
     """Preprocess and generate a package distribution file.
 
@@ -305,6 +420,9 @@ def preprocess(
         depends=depends,
         requirements=requirements,
         mode=mode,
+        offline=offline,
+        unpack=unpack,
+        metadataOnly=metadataOnly,
     )
 
     result = context.product
@@ -317,6 +435,146 @@ def preprocess(
     exitWithContext(context=context)
 
 
+@main.command("preprocess-batch")
+@click.argument(
+    "manifest",
+    type=click.Path(
+        exists=True,
+        file_okay=True,
+        resolve_path=True,
+        dir_okay=False,
+        path_type=Path,
+    ),
+)
+@click.argument(
+    "output",
+    type=click.Path(
+        file_okay=False,
+        resolve_path=True,
+        dir_okay=True,
+        path_type=Path,
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(1),
+    default=os.cpu_count() or 1,
+    help="Number of worker processes.",
+)
+@click.option(
+    "-c",
+    "--cache",
+    type=click.Path(
+        file_okay=False,
+        resolve_path=True,
+        dir_okay=True,
+        path_type=Path,
+    ),
+    default=None,
+    help="Directory for downloading and unpacking releases, default to OUTPUT/cache.",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=runOffline(),
+    help="Only use cached index metadata and stored wheels, without network access.",
+)
+@click.option(
+    "--unpack",
+    type=click.Choice(["full", "sources", "mount"]),
+    default="full",
+    help="How to unpack the wheel: all files, only Python sources and dist-info, or read the wheel in place.",
+)
+@click.option(
+    "--metadata-only",
+    "metadataOnly",
+    is_flag=True,
+    default=False,
+    help="For releases, only fetch dist-info from the index without downloading the wheel.",
+)
+def preprocessBatch(
+    manifest: Path,
+    output: Path,
+    jobs: int = 1,
+    cache: Path | None = None,
+    offline: bool = False,
+    unpack: Literal["full"] | Literal["sources"] | Literal["mount"] = "full",
+    metadataOnly: bool = False,
+):
+    """Preprocess a batch of distributions in parallel.
+
+    MANIFEST is a text file with one item per line: a release ID (project@version), a '.whl' file, an unpacked wheel directory (with .dist-info), or a source code directory.
+
+    OUTPUT is the directory for distribution files, one '<id>.json' with its '<id>.log' for each item.
+
+    Items whose distribution file already exists and succeeded are skipped, so an interrupted batch can be resumed.
+
+    Examples:
+
+    aexpy preprocess-batch ./releases.txt ./dists -j 8
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from .utils import elapsedTimer, ensureDirectory
+
+    cache = cache or output / "cache"
+    ensureDirectory(output)
+    ensureDirectory(cache)
+
+    items = parseBatchManifest(manifest, cache)
+    pending: list[BatchItem] = []
+    for item in items:
+        try:
+            result = FileProduceCache(item[0], output / f"{item[0]}.json")
+            if result.data(Distribution).success:
+                continue
+        except Exception:
+            pass
+        pending.append(item)
+    skipped = len(items) - len(pending)
+    print(
+        f"Preprocess {len(pending)} items with {jobs} jobs, skip {skipped} finished items.",
+        file=sys.stderr,
+    )
+
+    failures: list[tuple[str, str]] = []
+    busy = 0.0
+    with elapsedTimer() as elapsed:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(
+                    preprocessBatchItem, item, output, offline, unpack, metadataOnly
+                ): item
+                for item in pending
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                id = futures[future][0]
+                try:
+                    id, success, duration, error = future.result()
+                except Exception as ex:
+                    success, duration, error = False, 0.0, repr(ex)
+                busy += duration
+                if not success:
+                    failures.append((id, error))
+                print(
+                    f"[{i}/{len(pending)}] {'✅' if success else '❌'} {id} ({duration:.2f}s)",
+                    file=sys.stderr,
+                )
+
+    total = elapsed().total_seconds()
+    print(
+        f"""Processed {len(pending)} items in {total:.2f}s ({len(pending) / total if total else 0:.2f} items/s, {busy:.2f}s in workers).
+  ✅ {len(pending) - len(failures)} succeeded
+  ❌ {len(failures)} failed
+  ⏭ {skipped} skipped""",
+        file=sys.stderr,
+    )
+    for id, error in failures:
+        print(f"  ❌ {id}: {error}", file=sys.stderr)
+
+    exit(1 if failures else 0)
+
+
 @main.command()
 @click.argument("distribution", type=click.File("rb"))
 @click.argument("description", type=click.File("w"))
@@ -350,6 +608,24 @@ def preprocess(
 )
 @click.option("-w", "--wheel", "mode", flag_value="wheel", help="Wheel file mode")
 @click.option("-r", "--release", "mode", flag_value="release", help="Release ID mode")
+@click.option(
+    "--workers",
+    type=int,
+    default=0,
+    help="Number of forked worker processes to import and inspect subpackages (POSIX only), 0 to inspect in one process.",
+)
+@click.option(
+    "--payload",
+    type=click.Choice(["minimal", "standard", "full"]),
+    default="full",
+    help="Inspection payloads stored in entry data: none, the repr, or the repr and dir.",
+)
+@click.option(
+    "--static",
+    is_flag=True,
+    default=False,
+    help="Extract from the AST of the sources, with no environment and no imports.",
+)
 def extract(
     distribution: IO[bytes],
     description: IO[str],
@@ -358,6 +634,9 @@ def extract(
     mode: (
         Literal["json"] | Literal["src"] | Literal["wheel"] | Literal["release"]
     ) = "json",
+    workers: int = 0,
+    payload: Literal["minimal"] | Literal["standard"] | Literal["full"] = "full",
+    static: bool = False,
 ):
     """Extract the API in a distribution.
 
@@ -384,12 +663,16 @@ def extract(
     aexpy extract ./temp/aexpy-0.1.0.whl api.json -w
 
     zip -r - ./aexpy | aexpy extract - api.json -s
+
+    aexpy extract ./distribution.json ./api.json --static
     """
 
     if mode == "json":
         with TextIOWrapper(distribution) as distributionText:
             data = StreamReaderProduceCache(distributionText).data(Distribution)
-        context = extractCore(data, env=env, temp=temp)
+        context = extractCore(
+            data, env=env, temp=temp, workers=workers, payload=payload, static=static
+        )
     else:
         with TemporaryDirectory() as tmpdir:
             tmpdir = Path(tmpdir)
@@ -426,7 +709,14 @@ def extract(
             data = context.product
             print(data.overview(), file=sys.stderr)
 
-            context = extractCore(data, env=env, temp=temp)
+            context = extractCore(
+                data,
+                env=env,
+                temp=temp,
+                workers=workers,
+                payload=payload,
+                static=static,
+            )
 
     result = context.product
 
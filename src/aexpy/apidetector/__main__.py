@@ -1,10 +1,16 @@
 import logging
 import importlib
+import json
+import os
 import pkgutil
 import platform
 import sys
+import tempfile
+from types import ModuleType
 from typing import Union, List
 
+from pydantic import TypeAdapter
+
 from .compat import (
     Distribution,
     ModuleEntry,
@@ -14,9 +20,20 @@ from .compat import (
     SpecialEntry,
 )
 
-from .processor import Processor
+from .processor import PAYLOAD_FULL, Processor
+from .profiling import Profiler
 
 TRANSFER_BEGIN = "AEXPY_TRANSFER_BEGIN"
+TRANSFER_FD_OPTION = "--transfer-fd"
+WORKERS_OPTION = "--workers"
+PAYLOAD_OPTION = "--payload"
+SERVE_OPTION = "--serve"
+IDLE_OPTION = "--idle"
+PRELOAD_OPTION = "--preload"
+
+ENTRY_ADAPTER = TypeAdapter(
+    Union[ModuleEntry, ClassEntry, FunctionEntry, AttributeEntry, SpecialEntry]
+)
 
 
 LOGGING_FORMAT = "%(levelname)s %(asctime)s %(name)s [%(pathname)s:%(lineno)d:%(funcName)s]\n%(message)s\n"
@@ -33,17 +50,25 @@ def initializeLogging(level: int = logging.WARNING) -> None:
     root.addHandler(handler)
 
 
-def importModule(name: str):
+def importModule(name: str, profiler: "Profiler | None" = None, walk: bool = True):
+    """Import the module, and its submodules in the order of `pkgutil.walk_packages` if walk is set."""
+
     logger = logging.getLogger("import")
     logger.debug(f"Import {name}.")
 
-    module = importlib.import_module(name)
+    profiler = profiler or Profiler()
+
+    with profiler.measure(name, "importing"):
+        module = importlib.import_module(name)
 
     modules = [module]
 
     def onerror(name):
         logger.error(f"Failed to import {name}")
 
+    if not walk or not hasattr(module, "__path__"):
+        return modules
+
     try:
         for sub in pkgutil.walk_packages(
             path=module.__path__, prefix=module.__name__ + ".", onerror=onerror
@@ -54,7 +79,8 @@ def importModule(name: str):
                 continue
             try:
                 logger.debug(f"Import {submoduleName}.")
-                submodule = importlib.import_module(submoduleName)
+                with profiler.measure(submoduleName, "importing"):
+                    submodule = importlib.import_module(submoduleName)
                 logger.debug(f"Imported {submoduleName}: {submodule}.")
                 modules.append(submodule)
             except Exception as ex:
@@ -69,23 +95,205 @@ def importModule(name: str):
     return modules
 
 
-def main(dist: Distribution):
+def subtrees(module) -> "List[tuple[str, int]]":
+    """Direct submodules of the package, with the number of files in each subtree."""
+
+    result = []
+    for info in pkgutil.iter_modules(module.__path__, module.__name__ + "."):
+        if info.name.endswith(".__main__"):
+            continue
+        size = 1
+        try:
+            if info.ispkg:
+                path = os.path.join(
+                    info.module_finder.path, info.name.rsplit(".", 1)[1]
+                )
+                size = sum(len(files) for _, _, files in os.walk(path))
+        except Exception:
+            pass
+        result.append((info.name, size))
+    return result
+
+
+def partitionSubtrees(items: "List[tuple[str, int]]", workers: int):
+    """Assign subtrees to workers, larger first to the least loaded one."""
+
+    groups: "List[List[str]]" = [[] for _ in range(workers)]
+    loads = [0] * workers
+    for name, size in sorted(items, key=lambda x: x[1], reverse=True):
+        index = loads.index(min(loads))
+        groups[index].append(name)
+        loads[index] += size
+    return [group for group in groups if group]
+
+
+def isUnder(name: str, prefixes: "List[str]"):
+    return any(name == prefix or name.startswith(prefix + ".") for prefix in prefixes)
+
+
+def extractSubtrees(
+    root,
+    names: "List[str]",
+    output: str,
+    payload: str = PAYLOAD_FULL,
+):
+    """Import and inspect the subtrees in a worker, and write entries as lines to the output file.
+
+    Modules, classes and functions outside the subtrees are only referenced, and written to a JSON file next to the output,
+    with the facts that decide private flags, scopes and parents in the parent, and the imported modules of each subtree in order.
+    """
+
+    logger = logging.getLogger("parallel")
+
+    processor = Processor(payload)
+    modules: "List[ModuleType]" = []
+    order: "dict[str, List[str]]" = {}
+    for name in names:
+        try:
+            imported = importModule(name, processor.profiler)
+        except Exception as ex:
+            logger.error(f"Failed to import {name}", exc_info=ex)
+            continue
+        except SystemExit as ex:
+            logger.error(f"Failed to import {name}", exc_info=ex)
+            continue
+        modules.extend(imported)
+        order[name] = [processor.getObjectId(module) for module in imported]
+
+    processor.skipped = lambda name: not isUnder(name, names)
+    processor.process(root, [root] + modules, visitRoot=False)
+    with open(f"{output}.refs", "w") as f:
+        json.dump(processor.references, f)
+    with open(f"{output}.facts", "w") as f:
+        json.dump({**processor.facts(), "order": order}, f)
+    with open(f"{output}.profile", "w") as f:
+        json.dump(processor.profiler.records, f)
+    with open(output, "wb") as f:
+        for entry in processor.allEntries():
+            f.write(ENTRY_ADAPTER.dump_json(entry) + b"\n")
+
+
+def processParallel(processor: Processor, root: ModuleType, workers: int):
+    """Import and inspect subtrees of subpackages in forked workers, and the top-level module in this process meanwhile.
+
+    Each process owns the modules, classes and functions in its subtrees, and references others by id.
+    Entries from workers are merged after the entries of this process, and duplicate ids are dropped.
+    Subpackages imported by workers are added to the members of the top-level module, as importing binds them.
+    References not owned by any process are then imported and inspected in this process.
+    Workers only record facts on members, and private flags, scopes and parents are decided once in this process,
+    in the order of modules of a serial walk.
+    """
+
+    logger = logging.getLogger("parallel")
+
+    items = subtrees(root)
+    groups = partitionSubtrees(items, workers)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pids = {}
+        for i, group in enumerate(groups):
+            output = os.path.join(tmpdir, f"{i}.jsonl")
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                code = 0
+                try:
+                    extractSubtrees(root, group, output, processor.payload)
+                except BaseException as ex:
+                    logger.error(f"Worker failed to extract {group}.", exc_info=ex)
+                    code = 1
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(code)
+            logger.info(f"Fork worker {pid} for {group}.")
+            pids[pid] = (group, output)
+
+        names = [name for name, _ in items]
+        processor.skipped = lambda name: isUnder(name, names)
+        try:
+            processor.process(root, [root])
+        finally:
+            processor.skipped = None
+
+        references: "dict[str, List[str]]" = {}
+        orders: "dict[str, List[str]]" = {}
+        for pid, (group, output) in pids.items():
+            _, status = os.waitpid(pid, 0)
+            if status != 0:
+                logger.error(f"Worker {pid} for {group} exited with status {status}.")
+            if not os.path.exists(output):
+                continue
+            with open(output, "rb") as f:
+                for line in f:
+                    try:
+                        entry = ENTRY_ADAPTER.validate_json(line)
+                    except Exception as ex:
+                        logger.error(
+                            f"Failed to load entry from worker {pid}.", exc_info=ex
+                        )
+                        continue
+                    if entry.id in processor.mapper:
+                        continue
+                    processor.addEntry(entry)
+            with open(f"{output}.refs") as f:
+                references.update(json.load(f))
+            with open(f"{output}.facts") as f:
+                facts = json.load(f)
+                processor.mergeFacts(facts)
+                orders.update(facts["order"])
+            with open(f"{output}.profile") as f:
+                processor.profiler.merge(json.load(f))
+
+        rootId = processor.getObjectId(root)
+        processor.order.append(rootId)
+        # a module __dir__ hides bound submodules from inspect.getmembers
+        listed = getattr(root, "__dict__", {}).get("__dir__")
+        for name, _ in items:
+            if name not in orders:
+                continue
+            processor.order.extend(orders[name])
+            member = name.rsplit(".", 1)[1]
+            if listed is None or member in listed():
+                processor.addModuleMember(rootId, member, name)
+
+        for id, (moduleName, qualname, parent) in references.items():
+            try:
+                processor.visitReference(id, moduleName, qualname, parent)
+            except Exception as ex:
+                logger.error(f"Failed to visit reference {id}.", exc_info=ex)
+
+
+def main(dist: Distribution, workers: int = 0, payload: str = PAYLOAD_FULL):
     logger = logging.getLogger("main")
 
     platformStr = f"{platform.platform()} {platform.machine()} {platform.processor()} {platform.python_implementation()} {platform.python_version()}"
     logging.info(f"Platform: {platformStr}")
 
-    processor = Processor()
+    processor = Processor(payload)
 
     successToplevels = []
 
     for topLevel in dist.topModules:
+        if workers > 1 and hasattr(os, "fork"):
+            try:
+                logger.info(f"Import module {topLevel}.")
+                # workers share the imported top-level module by fork, and import their subtrees
+                root = importModule(topLevel, processor.profiler, walk=False)[0]
+                if hasattr(root, "__path__"):
+                    logger.info(f"Extract {topLevel} with {workers} workers.")
+                    processParallel(processor, root, workers)
+                    successToplevels.append(topLevel)
+                    continue
+            except Exception as ex:
+                logger.error(f"Failed to extract {topLevel} with workers.", exc_info=ex)
+
         modules = None
 
         try:
             logger.info(f"Import module {topLevel}.")
 
-            modules = importModule(topLevel)
+            modules = importModule(topLevel, processor.profiler)
         except Exception as ex:
             logger.error(f"Failed to import module {topLevel}.", exc_info=ex)
             modules = None
@@ -94,6 +302,7 @@ def main(dist: Distribution):
             try:
                 logger.info(f"Extract {topLevel} ({modules}).")
 
+                processor.order.extend(map(processor.getObjectId, modules))
                 processor.process(modules[0], modules)
 
                 successToplevels.append(topLevel)
@@ -102,10 +311,36 @@ def main(dist: Distribution):
 
     assert len(successToplevels) > 0, "No top level module extracted."
 
-    return processor.allEntries()
+    processor.decide()
 
+    return processor.allEntries(), processor.profiler.records
+
+
+def getOption(argv: "List[str]", name: str):
+    if name in argv:
+        return argv[argv.index(name) + 1]
+    return None
+
+
+def openTransfer(argv: "List[str]"):
+    """Open the transfer stream, the file descriptor given by the host, or stdout after the begin marker."""
+
+    fd = getOption(argv, TRANSFER_FD_OPTION)
+    if fd is not None:
+        return os.fdopen(int(fd), "w", encoding="utf-8")
+    sys.stdout.write(f"\n{TRANSFER_BEGIN}\n")
+    return sys.stdout
+
+
+def writeFrame(transfer, kind: str, data: bytes):
+    """Write a frame as a line of the kind and the JSON data, separated by a tab."""
+
+    transfer.write(f"{kind}\t{data.decode()}\n")
+
+
+def run(argv: "List[str]"):
+    """Extract the distribution from stdin, and write frames to the transfer stream."""
 
-if __name__ == "__main__":
     initializeLogging(logging.NOTSET)
     dist = Distribution.model_validate_json(sys.stdin.read())
 
@@ -113,12 +348,40 @@ if __name__ == "__main__":
 
     sys.path.insert(0, str(dist.rootPath.resolve()))
 
-    from pydantic import TypeAdapter
+    entries, profiles = main(
+        dist,
+        int(getOption(argv, WORKERS_OPTION) or 0),
+        getOption(argv, PAYLOAD_OPTION) or PAYLOAD_FULL,
+    )
+    transfer = openTransfer(argv)
+    try:
+        for entry in entries:
+            writeFrame(transfer, "entry", ENTRY_ADAPTER.dump_json(entry))
+        for name, stages in profiles.items():
+            writeFrame(
+                transfer, "profile", json.dumps({"name": name, **stages}).encode()
+            )
+    finally:
+        transfer.flush()
+        if transfer is not sys.stdout:
+            transfer.close()
+
 
-    output = TypeAdapter(
-        List[
-            Union[ModuleEntry, ClassEntry, FunctionEntry, AttributeEntry, SpecialEntry]
-        ]
-    ).dump_json(main(dist))
-    print(TRANSFER_BEGIN, end="")
-    print(output.decode())
+if __name__ == "__main__":
+    path = getOption(sys.argv, SERVE_OPTION)
+    if path is not None:
+        from .server import serve
+
+        initializeLogging(logging.INFO)
+        serve(
+            path,
+            float(getOption(sys.argv, IDLE_OPTION) or 600),
+            [
+                name
+                for name in (getOption(sys.argv, PRELOAD_OPTION) or "").split(",")
+                if name
+            ],
+            lambda argv, fd: run(argv + [TRANSFER_FD_OPTION, str(fd)]),
+        )
+    else:
+        run(sys.argv)
@@ -0,0 +1,214 @@
+import abc
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Methods required by the subclass hooks of collections.abc, which return True or NotImplemented
+HOOK_METHODS = {
+    "Hashable": ("__hash__",),
+    "Awaitable": ("__await__",),
+    "Coroutine": ("__await__", "send", "throw", "close"),
+    "AsyncIterable": ("__aiter__",),
+    "AsyncIterator": ("__anext__", "__aiter__"),
+    "AsyncGenerator": ("__aiter__", "__anext__", "asend", "athrow", "aclose"),
+    "Iterable": ("__iter__",),
+    "Iterator": ("__iter__", "__next__"),
+    "Reversible": ("__reversed__", "__iter__"),
+    "Generator": ("__iter__", "__next__", "send", "throw", "close"),
+    "Sized": ("__len__",),
+    "Container": ("__contains__",),
+    "Collection": ("__len__", "__iter__", "__contains__"),
+    "Callable": ("__call__",),
+    "Buffer": ("__buffer__",),
+}
+
+
+class Unsupported(Exception):
+    """The subclass check of an ABC can not be reproduced, so `issubclass` is used for it."""
+
+
+def hookOwner(cls) -> type:
+    for base in cls.__mro__:
+        if "__subclasshook__" in base.__dict__:
+            return base
+    return object
+
+
+def registry(cls) -> "List[type]":
+    if hasattr(abc, "_get_dump"):
+        refs = abc._get_dump(cls)[0]
+        return [item for item in (ref() for ref in refs) if item is not None]
+    return list(cls._abc_registry)
+
+
+def probeHook(owner: type, methods: "Tuple[str, ...]"):
+    """Check that the hook of the owner requires exactly the methods, and ignores other classes."""
+
+    def probe(none: "Optional[str]" = None):
+        namespace: "Dict[str, Any]" = {name: lambda self: None for name in methods}
+        if none:
+            namespace[none] = None
+        return type("Probe", (), namespace)
+
+    hook = owner.__dict__["__subclasshook__"].__func__
+    if hook(owner, probe()) is not True or hook(probe(), probe()) is not NotImplemented:
+        return False
+    return all(hook(owner, probe(name)) is NotImplemented for name in methods)
+
+
+class Conformance:
+    """Find ABCs a class conforms to, with the same results as `issubclass`.
+
+    `issubclass` against an ABC calls its subclass hook, and on a miss scans its registry and subclasses recursively.
+    Instead, for each state of ABC registries (`abc.get_cache_token()`) and of subclasses of the scanned ABCs,
+    the classes reachable from each ABC are indexed once,
+    so a class conforms if its MRO meets them, or it has the methods required by a reachable hook,
+    resolved along the MRO and memoized for the MRO tail shared with the base class.
+    ABCs whose checks can not be reproduced (custom subclass checks or hooks) fall back to `issubclass`.
+    """
+
+    def __init__(self, abcs: "Sequence[type]"):
+        self.abcs = list(abcs)
+        self.token = None
+        self.hooks: "Dict[type, Optional[Tuple[str, ...]]]" = {}
+        """Required methods of known hooks by owners, or None if the hook is not supported."""
+        self.nodes: "Dict[int, Tuple[type, int]]" = {}
+        """Mask of ABCs that each reachable class conforms to by being in the MRO, by ids."""
+        self.structural: "List[Tuple[Tuple[str, ...], int]]" = []
+        """Mask of ABCs that classes with the required methods conform to."""
+        self.fallback: "List[int]" = []
+        self.scanned: "Dict[int, type]" = {}
+        """ABCs whose subclasses are scanned, by ids."""
+        self.subclassCount = 0
+        """Total number of subclasses of the scanned ABCs, which only grows since the index holds the subclasses."""
+        self.methods: "Set[str]" = set()
+        self.resolved: "Dict[int, Tuple[type, Dict[str, bool]]]" = {}
+        """Whether required methods resolve to non-None along the MRO, by class ids."""
+
+    def hookMethods(self, cls: type):
+        """Methods required by the hook of the class, None if the hook always returns NotImplemented for it."""
+
+        owner = hookOwner(cls)
+        if owner is object:
+            return None
+        if owner not in self.hooks:
+            methods = HOOK_METHODS.get(owner.__name__)
+            if methods is None or owner.__module__ != "collections.abc":
+                self.hooks[owner] = None
+            else:
+                try:
+                    valid = probeHook(owner, methods)
+                except Exception:
+                    valid = False
+                self.hooks[owner] = methods if valid else None
+        methods = self.hooks[owner]
+        if methods is None:
+            raise Unsupported()
+        return methods if owner is cls else None
+
+    def reach(self, root: type):
+        """Classes that `issubclass(..., root)` checks, with the methods required by their hooks, and the ABCs whose subclasses are scanned."""
+
+        nodes: "Dict[int, type]" = {}
+        hooks: "List[Tuple[str, ...]]" = []
+        scanned: "List[type]" = []
+        stack = [root]
+        while stack:
+            cls = stack.pop()
+            if id(cls) in nodes:
+                continue
+            nodes[id(cls)] = cls
+            check = getattr(type(cls), "__subclasscheck__", None)
+            if check is type.__subclasscheck__:
+                continue
+            if check is not abc.ABCMeta.__subclasscheck__:
+                raise Unsupported()
+            methods = self.hookMethods(cls)
+            if methods is not None:
+                hooks.append(methods)
+            stack.extend(registry(cls))
+            scanned.append(cls)
+            stack.extend(cls.__subclasses__())
+        return nodes, hooks, scanned
+
+    def countSubclasses(self):
+        return sum(map(len, map(type.__subclasses__, self.scanned.values())))
+
+    def changed(self):
+        """Whether classes are defined under the scanned ABCs since indexing, which may bring new hooks."""
+
+        return self.countSubclasses() != self.subclassCount
+
+    def refresh(self):
+        token = abc.get_cache_token()
+        if token == self.token and not self.changed():
+            return
+        self.token = token
+        self.nodes = {}
+        self.fallback = []
+        self.scanned = {}
+        structural: "Dict[Tuple[str, ...], int]" = {}
+        for index, item in enumerate(self.abcs):
+            try:
+                nodes, hooks, scanned = self.reach(item)
+            except Exception:
+                self.fallback.append(index)
+                continue
+            for cls in scanned:
+                self.scanned[id(cls)] = cls
+            bit = 1 << index
+            for key, cls in nodes.items():
+                mask = self.nodes.get(key, (cls, 0))[1]
+                self.nodes[key] = (cls, mask | bit)
+            for methods in hooks:
+                structural[methods] = structural.get(methods, 0) | bit
+        self.structural = list(structural.items())
+        self.methods = {name for methods in structural for name in methods}
+        self.resolved = {}
+        self.subclassCount = self.countSubclasses()
+
+    def resolve(self, cls: type) -> "Dict[str, bool]":
+        cached = self.resolved.get(id(cls))
+        if cached is not None and cached[0] is cls:
+            return cached[1]
+
+        mro = cls.__mro__
+        bases = cls.__bases__
+        if len(bases) == 1 and mro[1:] == bases[0].__mro__:
+            result = dict(self.resolve(bases[0]))
+            namespace = cls.__dict__
+            for name in self.methods:
+                if name in namespace:
+                    result[name] = namespace[name] is not None
+        else:
+            result = {}
+            for base in mro:
+                namespace = base.__dict__
+                for name in self.methods:
+                    if name not in result and name in namespace:
+                        result[name] = namespace[name] is not None
+        self.resolved[id(cls)] = (cls, result)
+        return result
+
+    def match(self, cls: type) -> "List[type]":
+        """ABCs that the class conforms to, in the order of the ABCs."""
+
+        try:
+            self.refresh()
+            mask = 0
+            for base in cls.__mro__:
+                node = self.nodes.get(id(base))
+                if node is not None and node[0] is base:
+                    mask |= node[1]
+            if self.structural:
+                resolved = self.resolve(cls)
+                for methods, bits in self.structural:
+                    if mask & bits != bits and all(
+                        resolved.get(name, False) for name in methods
+                    ):
+                        mask |= bits
+        except Exception:
+            return [item for item in self.abcs if issubclass(cls, item)]
+
+        for index in self.fallback:
+            if issubclass(cls, self.abcs[index]):
+                mask |= 1 << index
+        return [item for index, item in enumerate(self.abcs) if mask >> index & 1]
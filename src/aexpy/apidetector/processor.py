@@ -1,7 +1,9 @@
 from dataclasses import is_dataclass
+import importlib
 import inspect
 import logging
 import pathlib
+import sys
 
 # Builtin ABCs (https://docs.python.org/3/glossary.html#term-abstract-base-class)
 from collections.abc import (
@@ -60,6 +62,9 @@ from .compat import (
     ParameterKind,
 )
 from .compat import getObjectId, islocal, getModuleName, isFunction
+from .conformance import Conformance
+from .profiling import Profiler
+from .source import SourceIndex
 
 ABCs = [
     Container,
@@ -106,12 +111,32 @@ ABCs = [
 ]
 
 
+PAYLOAD_MINIMAL = "minimal"
+PAYLOAD_STANDARD = "standard"
+PAYLOAD_FULL = "full"
+
+
 def getAnnotations(obj) -> "list[tuple[str, Any]]":
     if hasattr(inspect, "get_annotations"):
         return list(inspect.get_annotations(obj).items())
     return list(getattr(obj, "__annotations__", {}).items())
 
 
+def listNames(obj) -> "list[str]":
+    """Names by dir, without an empty __annotations__, which classes and modules get once it is read, in any order of visits."""
+
+    names = dir(obj)
+    if inspect.ismodule(obj):
+        scopes = [obj]
+    elif inspect.isclass(obj):
+        scopes = list(getattr(obj, "__mro__", []))
+    else:
+        scopes = [obj, *getattr(type(obj), "__mro__", [])]
+    if any(getattr(scope, "__dict__", {}).get("__annotations__") for scope in scopes):
+        return names
+    return [name for name in names if name != "__annotations__"]
+
+
 class Processor:
     PARA_KIND_MAP = {
         inspect.Parameter.KEYWORD_ONLY: ParameterKind.Keyword,
@@ -150,9 +175,40 @@ class Processor:
         "__dataclass_fields__",
     }
 
-    def __init__(self):
+    def __init__(self, payload: str = PAYLOAD_FULL):
+        self.payload = payload
+        """Inspection payloads stored in entry data, `minimal` for none, `standard` for the repr, and `full` for the repr and dir."""
         self.mapper: "dict[str, ModuleEntry | ClassEntry | FunctionEntry | AttributeEntry | SpecialEntry]" = ({})
         self.logger = logging.getLogger("processor")
+        self.skipped: "Callable[[str], bool] | None" = None
+        """Predicate on module names, whose modules, classes and functions are left to another process and only referenced by id."""
+        self.order: "list[str]" = []
+        """Ids of modules in the order of the serial walk, which visits each module and its members depth-first."""
+        self.moduleMembers: (
+            "dict[str, tuple[list[str] | None, list[tuple[str, str]]]]"
+        ) = {}
+        """Names in `__all__` and ids of members visited or left to another process, by module ids, which decide private flags."""
+        self.classMembers: "dict[str, list[str]]" = {}
+        """Ids of members visited or left to another process, by class ids, which nest in the serial walk."""
+        self.methods: "list[tuple[str, bool]]" = []
+        """Ids of functions found as class members, with whether they are bound methods, which decide scopes."""
+        self.references: "dict[str, tuple[str, str, str]]" = {}
+        """Module names, qualified names and parents of skipped entries by id, to resolve them in another process."""
+        self.profiler = Profiler()
+        self.sources = SourceIndex()
+        self.conformance = Conformance(ABCs)
+        self.relativeFiles: "dict[str, str]" = {}
+        """Files relative to the parent of the root path."""
+        self.externals: "dict[int, tuple[Any, bool]]" = {}
+        """External verdicts with the objects by id, for the current modules."""
+        self.resolvedPaths: "dict[str, str]" = {}
+
+    def relativeFile(self, file: str):
+        result = self.relativeFiles.get(file)
+        if result is None:
+            result = str(pathlib.Path(file).relative_to(self.rootPath.parent))
+            self.relativeFiles[file] = result
+        return result
 
     def getObjectId(self, obj):
         try:
@@ -161,13 +217,17 @@ class Processor:
             self.logger.error(f"Failed to get id.", exc_info=ex)
             return "<unknown>"
 
-    def process(self, root: ModuleType, others: "list[ModuleType]"):
+    def process(
+        self, root: ModuleType, others: "list[ModuleType]", visitRoot: bool = True
+    ):
         self.modules = others + [root]
+        self.externals.clear()
         self.root = root
         assert root.__file__
         self.rootPath = pathlib.Path(root.__file__).parent.resolve()
 
-        self.visitModule(self.root)
+        if visitRoot:
+            self.visitModule(self.root)
 
         for module in others:
             if module == root:
@@ -199,8 +259,10 @@ class Processor:
             result.name = result.id
 
         try:
-            result.data["raw"] = repr(obj)
-            result.data["dir"] = dir(obj)
+            if self.payload != PAYLOAD_MINIMAL:
+                result.data["raw"] = repr(obj)
+            if self.payload == PAYLOAD_FULL:
+                result.data["dir"] = listNames(obj)
 
             if isinstance(result, AttributeEntry):
                 return
@@ -225,16 +287,14 @@ class Processor:
                 if not file.startswith(str(self.rootPath)) and module:
                     file = inspect.getfile(module)
                 if file.startswith(str(self.rootPath)):
-                    location.file = str(
-                        pathlib.Path(file).relative_to(self.rootPath.parent)
-                    )
+                    location.file = self.relativeFile(file)
             except Exception as ex:
                 self.logger.error(
                     f"Failed to get location for {result.id}", exc_info=ex
                 )
 
             try:
-                sl = inspect.getsourcelines(obj)
+                sl = self.sources.getsourcelines(obj)
                 src = "".join(sl[0])
                 result.src = src
                 location.line = sl[1]
@@ -243,31 +303,172 @@ class Processor:
                     f"Failed to get source code for {result.id}", exc_info=ex
                 )
             result.docs = inspect.cleandoc(inspect.getdoc(obj) or "")
-            result.comments = inspect.getcomments(obj) or ""
+            result.comments = self.sources.getcomments(obj) or ""
             result.location = location
         except Exception as ex:
             self.logger.error(f"Failed to inspect entry for {result.id}", exc_info=ex)
 
     def isExternal(self, obj):
+        cached = self.externals.get(id(obj))
+        if cached is not None and cached[0] is obj:
+            return cached[1]
+        result = self.classifyExternal(obj)
+        # keep the object, so that its id is not reused by another object
+        self.externals[id(obj)] = (obj, result)
+        return result
+
+    def classifyExternal(self, obj):
         try:
+            if not self.modules:
+                return False
+            # only the first module decides
+            module = self.modules[0]
             moduleName = getModuleName(obj)
-            for module in self.modules:
-                if moduleName:
-                    return not moduleName.startswith(module.__name__)
-                if inspect.ismodule(obj) or inspect.isclass(obj) or isFunction(obj):
-                    if module.__file__ is None:
-                        return True
-                    try:
-                        modulePath = str(pathlib.Path(module.__file__).parent.resolve())
-                        return not str(
-                            pathlib.Path(inspect.getfile(obj)).resolve()
-                        ).startswith(modulePath)
-                    except:
-                        return True  # fail to get file -> a builtin module
+            if moduleName:
+                return not moduleName.startswith(module.__name__)
+            if inspect.ismodule(obj) or inspect.isclass(obj) or isFunction(obj):
+                if module.__file__ is None:
+                    return True
+                try:
+                    modulePath = self.resolvePath(pathlib.Path(module.__file__).parent)
+                    return not self.resolvePath(inspect.getfile(obj)).startswith(
+                        modulePath
+                    )
+                except:
+                    return True  # fail to get file -> a builtin module
         except:
             pass
         return False
 
+    def resolvePath(self, path: "str | pathlib.Path"):
+        key = str(path)
+        result = self.resolvedPaths.get(key)
+        if result is None:
+            result = str(pathlib.Path(path).resolve())
+            self.resolvedPaths[key] = result
+        return result
+
+    def isSkipped(self, obj, parent: str = ""):
+        if self.skipped is None:
+            return False
+        if inspect.ismodule(obj):
+            moduleName, qualname = obj.__name__, ""
+        elif inspect.isclass(obj) or isFunction(obj):
+            moduleName = getModuleName(obj)
+            qualname = getattr(obj, "__qualname__", "") or getattr(obj, "__name__", "")
+        else:
+            return False
+        if not self.skipped(moduleName):
+            return False
+        if moduleName not in sys.modules or islocal(qualname):
+            # not resolvable by name in another process
+            return False
+        self.references[self.getObjectId(obj)] = (moduleName, qualname, parent)
+        return True
+
+    def facts(self):
+        """Facts recorded by visiting that decide private flags and scopes, in JSON."""
+
+        return {
+            "modules": self.moduleMembers,
+            "classes": self.classMembers,
+            "methods": self.methods,
+        }
+
+    def mergeFacts(self, facts: "dict"):
+        for id, (public, members) in facts["modules"].items():
+            self.moduleMembers.setdefault(
+                id, (public, [(name, target) for name, target in members])
+            )
+        for id, members in facts["classes"].items():
+            self.classMembers.setdefault(id, members)
+        self.methods.extend((id, bound) for id, bound in facts["methods"])
+
+    def addModuleMember(self, id: str, name: str, target: str):
+        """Bind the member of the visited module, as importing a submodule binds it in the package."""
+
+        entry = self.mapper.get(id)
+        if not isinstance(entry, ModuleEntry) or target not in self.mapper:
+            return
+        entry.members[name] = target
+        public, members = self.moduleMembers.setdefault(id, (None, []))
+        members[:] = [member for member in members if member[0] != name]
+        members.append((name, target))
+        # in the order of inspect.getmembers
+        members.sort(key=lambda member: member[0])
+        if isinstance(entry.data.get("dir"), list) and name not in entry.data["dir"]:
+            entry.data["dir"] = sorted(entry.data["dir"] + [name])
+
+    def decide(self):
+        """Decide private flags, scopes and parents of entries from the recorded facts.
+
+        Modules with `__all__` set the private flag of each member after visiting it,
+        so the flag comes from the last such module in the serial walk, which is replayed in the order of modules.
+        Entries without dotted ids take the parent that visits them first in the walk.
+        """
+
+        visited: "set[str]" = set()
+        privacy: "dict[str, bool]" = {}
+        parents: "dict[str, str]" = {}
+
+        def walk(id: str, parent: str = ""):
+            if id in visited:
+                return
+            visited.add(id)
+            parents[id] = parent
+            if id in self.moduleMembers:
+                public, members = self.moduleMembers[id]
+                for name, target in members:
+                    walk(target, id)
+                    if public is not None:
+                        privacy[target] = name in public
+            elif id in self.classMembers:
+                for target in self.classMembers[id]:
+                    walk(target, id)
+
+        for id in self.order:
+            walk(id)
+
+        for id, parent in parents.items():
+            entry = self.mapper.get(id)
+            if isinstance(entry, ApiEntry) and "." not in id:
+                entry.parent = parent
+
+        for id, private in privacy.items():
+            entry = self.mapper.get(id)
+            if isinstance(entry, ApiEntry):
+                entry.private = private
+
+        for id, bound in self.methods:
+            entry = self.mapper.get(id)
+            if not isinstance(entry, FunctionEntry):
+                continue
+            if bound:
+                entry.scope = ItemScope.Class
+            if len(entry.parameters) > 0:
+                if entry.parameters[0].name == "self":
+                    entry.scope = ItemScope.Instance
+                # elif entry.parameters[0].name == "cls":
+                #     entry.scope = ItemScope.Class
+
+    def visitReference(self, id: str, moduleName: str, qualname: str, parent: str = ""):
+        """Visit the entry skipped by another process, by resolving it from loaded modules."""
+
+        if id in self.mapper:
+            return
+        # the module may be imported only by the process that skipped the entry
+        obj = importlib.import_module(moduleName)
+        for name in qualname.split(".") if qualname else []:
+            obj = getattr(obj, name)
+        if self.getObjectId(obj) != id:
+            raise Exception(f"Resolved {moduleName}:{qualname} to another object.")
+        if inspect.ismodule(obj):
+            self.visitModule(obj, parent=parent)
+        elif inspect.isclass(obj):
+            self.visitClass(obj, parent=parent)
+        elif isFunction(obj):
+            self.visitFunc(obj, parent=parent)
+
     def visitModule(self, obj, parent: str = ""):
         assert inspect.ismodule(obj)
 
@@ -280,11 +481,23 @@ class Processor:
 
         self.logger.debug(f"Module: {id}")
 
+        with self.profiler.measure(id, "visiting"):
+            return self._visitModule(obj, id, parent)
+
+    def _visitModule(self, obj, id: str, parent: str):
         res = ModuleEntry(id=id, parent=id.rsplit(".", 1)[0] if "." in id else parent)
         self._visitEntry(res, obj)
         self.addEntry(res)
 
         publicMembers = getattr(obj, "__all__", None)
+        public = None
+        if publicMembers is not None:
+            try:
+                public = [str(name) for name in publicMembers]
+            except Exception as ex:
+                self.logger.error(f"Failed to read __all__ of {id}.", exc_info=ex)
+        members: "list[tuple[str, str]]" = []
+        self.moduleMembers[id] = (public, members)
 
         for mname, member in inspect.getmembers(obj):
             entry = None
@@ -293,6 +506,9 @@ class Processor:
                     pass
                 elif self.isExternal(member):
                     entry = self.getObjectId(member)
+                elif self.isSkipped(member, parent=res.id):
+                    entry = self.getObjectId(member)
+                    members.append((mname, entry))
                 elif inspect.ismodule(member):
                     entry = self.visitModule(member, parent=res.id)
                 elif inspect.isclass(member):
@@ -309,8 +525,6 @@ class Processor:
                     )
                     if not entry.annotation:
                         entry.annotation = res.annotations.get(mname) or ""
-                if publicMembers is not None and isinstance(entry, ApiEntry):
-                    entry.private = mname in publicMembers
             except Exception as ex:
                 self.logger.error(
                     f"Failed to extract module member {id}.{mname}: {member}",
@@ -318,6 +532,7 @@ class Processor:
                 )
             if isinstance(entry, ApiEntry):
                 res.members[mname] = entry.id
+                members.append((mname, entry.id))
             elif isinstance(entry, str):
                 res.members[mname] = entry
         return res
@@ -338,11 +553,7 @@ class Processor:
 
         istuple = tuple in bases
 
-        abcs = []
-
-        for abc in ABCs:
-            if issubclass(obj, abc):
-                abcs.append(self.getObjectId(abc))
+        abcs = [self.getObjectId(abc) for abc in self.conformance.match(obj)]
 
         res = ClassEntry(
             id=id,
@@ -357,6 +568,8 @@ class Processor:
         self.addEntry(res)
 
         slots = set(res.slots)
+        members: "list[str]" = []
+        self.classMembers[id] = members
 
         for mname, member in inspect.getmembers(obj):
             entry = None
@@ -370,6 +583,13 @@ class Processor:
                     pass
                 elif not (istuple and mname == "__new__") and self.isExternal(member):
                     entry = self.getObjectId(member)
+                elif not (istuple and mname == "__new__") and self.isSkipped(
+                    member, parent=res.id
+                ):
+                    entry = self.getObjectId(member)
+                    members.append(entry)
+                    if isFunction(member):
+                        self.methods.append((entry, inspect.ismethod(member)))
                 elif inspect.ismodule(member):
                     entry = self.visitModule(member, parent=res.id)
                 elif inspect.isclass(member):
@@ -406,13 +626,8 @@ class Processor:
                             )
                         else:
                             entry = self.visitFunc(member, parent=res.id)
-                    if inspect.ismethod(member):
-                        entry.scope = ItemScope.Class
-                    if len(entry.parameters) > 0:
-                        if entry.parameters[0].name == "self":
-                            entry.scope = ItemScope.Instance
-                        # elif entry.parameters[0].name == "cls":
-                        #     entry.scope = ItemScope.Class
+                    # scopes of functions shared by classes are decided after visiting
+                    self.methods.append((entry.id, inspect.ismethod(member)))
                 else:
                     entry = self.visitAttribute(
                         member,
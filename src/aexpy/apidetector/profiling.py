@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Union
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def currentRss() -> int:
+    """Resident set size of this process in bytes, or the peak one if the current one is unavailable."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return rss if sys.platform == "darwin" else rss * 1024
+    return 0
+
+
+def snapshot() -> "List[Union[float, int, None]]":
+    return [
+        time.perf_counter(),
+        time.process_time(),
+        currentRss(),
+        tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+    ]
+
+
+class Profiler:
+    """Record wall time, CPU time and memory deltas of stages per module.
+
+    Nested measurements are excluded from the outer one, so each record is the cost of the module itself.
+    Traced memory is recorded only if tracemalloc is tracing, e.g. by `PYTHONTRACEMALLOC=1`.
+    """
+
+    def __init__(self):
+        self.records: "Dict[str, Dict[str, Dict[str, Union[float, int]]]]" = {}
+        """Records by module name and stage."""
+        self.stack: "List[List[Union[float, int, None]]]" = []
+        """Costs of nested measurements in running ones."""
+
+    @contextmanager
+    def measure(self, name: str, stage: str):
+        start = snapshot()
+        nested: "List[Union[float, int, None]]" = [0, 0, 0, 0]
+        self.stack.append(nested)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            end = snapshot()
+            total = [
+                None if e is None or s is None else e - s for s, e in zip(start, end)
+            ]
+            if self.stack:
+                outer = self.stack[-1]
+                for i, value in enumerate(total):
+                    if value is not None:
+                        outer[i] += value
+            record = {
+                "wall": total[0] - nested[0],
+                "cpu": total[1] - nested[1],
+                "rss": total[2] - nested[2],
+            }
+            if total[3] is not None:
+                record["memory"] = total[3] - nested[3]
+            self.records.setdefault(name, {})[stage] = record
+
+    def merge(self, records: "Dict[str, Dict[str, Dict[str, Union[float, int]]]]"):
+        for name, stages in records.items():
+            self.records.setdefault(name, {}).update(stages)
@@ -0,0 +1,162 @@
+import array
+import importlib
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, List
+
+FD_COUNT = 4
+HEADER_SIZE = 1 << 16
+CHECK_INTERVAL = 10.0
+"""Seconds between checks that the interpreter of the server still exists."""
+
+
+def receive(conn: socket.socket):
+    """Receive the request header, with file descriptors of stdin, stdout, stderr and the transfer stream."""
+
+    fds = array.array("i")
+    msg, ancdata, _, _ = conn.recvmsg(
+        HEADER_SIZE, socket.CMSG_LEN(FD_COUNT * fds.itemsize)
+    )
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+    return json.loads(msg.decode()), list(fds)
+
+
+def exitCode(status: int):
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return 1
+
+
+def flush():
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+def execute(
+    argv: "List[str]", fds: "List[int]", run: "Callable[[List[str], int], None]"
+):
+    """Run the detector in the forked child, with the standard streams of the request."""
+
+    stdin, stdout, stderr, transfer = fds
+    for fd, target in ((stdin, 0), (stdout, 1), (stderr, 2)):
+        os.dup2(fd, target)
+        os.close(fd)
+    # packages may be installed into the environment after the server started
+    importlib.invalidate_caches()
+    code = 0
+    try:
+        run(argv, transfer)
+    except SystemExit as ex:
+        code = ex.code if isinstance(ex.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        flush()
+    os._exit(code)
+
+
+def handle(conn: socket.socket, run: "Callable[[List[str], int], None]"):
+    """Serve the request in a forked child, and send its exit code back."""
+
+    header, fds = receive(conn)
+    if len(fds) != FD_COUNT:
+        for fd in fds:
+            os.close(fd)
+        conn.sendall(b'{"code": 1}\n')
+        return
+    flush()
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        execute(header["argv"], fds, run)
+    for fd in fds:
+        os.close(fd)
+    _, status = os.waitpid(pid, 0)
+    conn.sendall(json.dumps({"code": exitCode(status)}).encode() + b"\n")
+
+
+def serve(
+    path: str,
+    idle: float,
+    preload: "List[str]",
+    run: "Callable[[List[str], int], None]",
+):
+    """Serve detector requests on the Unix socket, until no request comes in idle seconds, or the interpreter is removed with its environment.
+
+    Modules to preload are imported once, and each request is served in a child forked from this warm process,
+    so it stays clean from imports of extracted packages.
+    """
+
+    logger = logging.getLogger("server")
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+            logger.info(f"Preloaded {name}.")
+        except Exception as ex:
+            logger.error(f"Failed to preload {name}.", exc_info=ex)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    temp = f"{path}.{os.getpid()}"
+    sock.bind(temp)
+    os.chmod(temp, 0o600)
+    os.replace(temp, path)
+    inode = os.stat(path).st_ino
+    sock.listen()
+    sock.settimeout(min(idle, CHECK_INTERVAL))
+    logger.info(f"Serve at {path}.")
+
+    children = set()
+    last = time.monotonic()
+    try:
+        while True:
+            for pid in list(children):
+                if os.waitpid(pid, os.WNOHANG)[0] != 0:
+                    children.discard(pid)
+            try:
+                conn, _ = sock.accept()
+            except socket.timeout:
+                if not os.path.exists(sys.executable):
+                    logger.info(
+                        f"Exit since the interpreter {sys.executable} is removed."
+                    )
+                    break
+                if children:
+                    last = time.monotonic()
+                    continue
+                if time.monotonic() - last < idle:
+                    continue
+                logger.info(f"Exit after idle for {idle} seconds.")
+                break
+            last = time.monotonic()
+            conn.setblocking(True)
+            flush()
+            pid = os.fork()
+            if pid == 0:
+                sock.close()
+                try:
+                    handle(conn, run)
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    flush()
+                    os._exit(0)
+            children.add(pid)
+            conn.close()
+    finally:
+        sock.close()
+        try:
+            if os.stat(path).st_ino == inode:
+                os.unlink(path)
+        except OSError:
+            pass
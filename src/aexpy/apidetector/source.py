@@ -0,0 +1,133 @@
+import ast
+import inspect
+import linecache
+from typing import Any, Dict, List, Tuple
+
+# Python 3.9 to 3.12 parse the whole module again to find each class
+CLASS_FINDER = hasattr(inspect, "_ClassFinder")
+
+
+class ClassIndexer(ast.NodeVisitor):
+    """Collect line numbers of classes by qualified names, as `inspect._ClassFinder` finds them."""
+
+    def __init__(self):
+        self.stack: "List[str]" = []
+        self.lines: "Dict[str, int]" = {}
+
+    def visit_FunctionDef(self, node):
+        self.stack.append(node.name)
+        self.stack.append("<locals>")
+        self.generic_visit(node)
+        self.stack.pop()
+        self.stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.stack.append(node.name)
+        lineno = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+        self.lines.setdefault(".".join(self.stack), lineno - 1)
+        self.generic_visit(node)
+        self.stack.pop()
+
+
+class SourceIndex:
+    """Source lookups like `inspect`, with classes indexed by a single AST pass for each file."""
+
+    def __init__(self):
+        self.classes: "Dict[str, Tuple[List[str], Any]]" = {}
+        """Class line numbers by qualified names, or the parsing error, with the indexed lines by file."""
+
+    def classLines(self, file: str, lines: "List[str]"):
+        cached = self.classes.get(file)
+        if cached is None or cached[0] is not lines:
+            try:
+                indexer = ClassIndexer()
+                indexer.visit(ast.parse("".join(lines)))
+                cached = (lines, indexer.lines)
+            except Exception as ex:
+                cached = (lines, ex)
+            self.classes[file] = cached
+        if isinstance(cached[1], Exception):
+            raise cached[1]
+        return cached[1]
+
+    def findsource(self, obj) -> "Tuple[List[str], int]":
+        if not (CLASS_FINDER and inspect.isclass(obj)):
+            return inspect.findsource(obj)
+
+        file = inspect.getsourcefile(obj)
+        if file:
+            linecache.checkcache(file)
+        else:
+            file = inspect.getfile(obj)
+            if not (file.startswith("<") and file.endswith(">")):
+                raise OSError("source code not available")
+        module = inspect.getmodule(obj, file)
+        if module:
+            lines = linecache.getlines(file, module.__dict__)
+        else:
+            lines = linecache.getlines(file)
+        if not lines:
+            raise OSError("could not get source code")
+
+        lnum = self.classLines(file, lines).get(obj.__qualname__)
+        if lnum is None:
+            raise OSError("could not find class definition")
+        return lines, lnum
+
+    def getsourcelines(self, obj):
+        obj = inspect.unwrap(obj)
+        lines, lnum = self.findsource(obj)
+        if inspect.ismodule(obj):
+            return lines, 0
+        return inspect.getblock(lines[lnum:]), lnum + 1
+
+    def getcomments(self, obj):
+        try:
+            lines, lnum = self.findsource(obj)
+        except (OSError, TypeError):
+            return None
+
+        if inspect.ismodule(obj):
+            # comment block at the top of the file
+            start = 0
+            if lines and lines[0][:2] == "#!":
+                start = 1
+            while start < len(lines) and lines[start].strip() in ("", "#"):
+                start = start + 1
+            if start < len(lines) and lines[start][:1] == "#":
+                comments = []
+                end = start
+                while end < len(lines) and lines[end][:1] == "#":
+                    comments.append(lines[end].expandtabs())
+                    end = end + 1
+                return "".join(comments)
+
+        # preceding block of comments at the same indentation
+        elif lnum > 0:
+            indent = inspect.indentsize(lines[lnum])
+            end = lnum - 1
+            if (
+                end >= 0
+                and lines[end].lstrip()[:1] == "#"
+                and inspect.indentsize(lines[end]) == indent
+            ):
+                comments = [lines[end].expandtabs().lstrip()]
+                if end > 0:
+                    end = end - 1
+                    comment = lines[end].expandtabs().lstrip()
+                    while (
+                        comment[:1] == "#" and inspect.indentsize(lines[end]) == indent
+                    ):
+                        comments[:0] = [comment]
+                        end = end - 1
+                        if end < 0:
+                            break
+                        comment = lines[end].expandtabs().lstrip()
+                while comments and comments[0].strip() == "#":
+                    comments[:1] = []
+                while comments and comments[-1].strip() == "#":
+                    comments[-1:] = []
+                return "".join(comments)
+        return None
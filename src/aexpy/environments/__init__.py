@@ -1,61 +1,109 @@
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
+import json
+import os
+import shlex
 import subprocess
 import sys
 import logging
 from typing import override
+from uuid import uuid1
+
+from ..models import Distribution
+
+RESOLVE_SCRIPT = "import json, os, sys; print(json.dumps({'python': sys.executable, 'env': dict(os.environ)}))"
+
+
+def joinCommand(args: list[str]):
+    return subprocess.list2cmdline(args) if os.name == "nt" else shlex.join(args)
+
+
+def splitCommand(command: str):
+    return shlex.split(command, posix=os.name != "nt")
 
 
 class ExecutionEnvironmentRunner:
     def __init__(
-        self, commandPrefix: str = "", pythonName: str = "python", **options
+        self,
+        commandPrefix: str = "",
+        pythonName: str = "python",
+        pythonPath: str | None = None,
+        env: dict[str, str] | None = None,
+        **options,
     ) -> None:
         self.commandPrefix = commandPrefix
         self.pythonName = pythonName
+        self.pythonPath = pythonPath
+        """Resolved interpreter path, to run commands directly without a shell."""
+        self.env = env
+        """Environment variables for direct commands, None to inherit."""
         self.options = options
 
-    def run(self, command: str, **kwargs) -> subprocess.CompletedProcess:
+    def args(self, command: str | list[str], python: bool = False):
+        """Get the arguments to run, and whether to run in a shell."""
+
+        if self.pythonPath is not None:
+            args = splitCommand(command) if isinstance(command, str) else command
+            return ([self.pythonPath] if python else []) + args, False
+        if not isinstance(command, str):
+            command = joinCommand(command)
+        prefix = self.commandPrefix
+        if python:
+            prefix = f"{prefix} {self.pythonName}"
+        return f"{prefix} {command}".strip(), True
+
+    def execute(self, command: str | list[str], python: bool = False, **kwargs):
+        args, shell = self.args(command, python)
+        if self.env is not None and not shell:
+            kwargs.setdefault("env", self.env)
+        return subprocess.run(args, **kwargs, **self.options, shell=shell)
+
+    def popen(self, command: str | list[str], python: bool = False, **kwargs):
+        """Start a command in the environment without waiting for it."""
+
+        args, shell = self.args(command, python)
+        if self.env is not None and not shell:
+            kwargs.setdefault("env", self.env)
+        return subprocess.Popen(args, **kwargs, **self.options, shell=shell)
+
+    def run(self, command: str | list[str], **kwargs) -> subprocess.CompletedProcess:
         """Run a command in the environment."""
 
-        return subprocess.run(
-            f"{self.commandPrefix} {command}".strip(),
-            **kwargs,
-            **self.options,
-            shell=True,
-        )
+        return self.execute(command, **kwargs)
 
-    def runPython(self, command: str, **kwargs) -> subprocess.CompletedProcess:
+    def runPython(
+        self, command: str | list[str], **kwargs
+    ) -> subprocess.CompletedProcess:
         """Run a command in the environment."""
 
-        return subprocess.run(
-            f"{self.commandPrefix} {self.pythonName} {command}".strip(),
-            **kwargs,
-            **self.options,
-            shell=True,
-        )
+        return self.execute(command, python=True, **kwargs)
 
-    def runText(self, command: str, **kwargs) -> subprocess.CompletedProcess[str]:
+    def runText(
+        self, command: str | list[str], **kwargs
+    ) -> subprocess.CompletedProcess[str]:
         """Run a command in the environment."""
 
-        return subprocess.run(
-            f"{self.commandPrefix} {command}".strip(),
-            **kwargs,
-            **self.options,
-            capture_output=True,
-            text=True,
-            shell=True,
-        )
+        return self.execute(command, capture_output=True, text=True, **kwargs)
 
-    def runPythonText(self, command: str, **kwargs) -> subprocess.CompletedProcess[str]:
+    def runPythonText(
+        self, command: str | list[str], **kwargs
+    ) -> subprocess.CompletedProcess[str]:
         """Run a command in the environment."""
 
-        return subprocess.run(
-            f"{self.commandPrefix} {self.pythonName} {command}".strip(),
-            **kwargs,
-            **self.options,
-            capture_output=True,
-            text=True,
-            shell=True,
+        return self.execute(
+            command, python=True, capture_output=True, text=True, **kwargs
+        )
+
+    def resolve(self) -> "ExecutionEnvironmentRunner":
+        """Resolve the interpreter and environment variables once, and get a runner that runs commands directly."""
+
+        if self.pythonPath is not None:
+            return self
+        res = self.runPythonText(f'-c "{RESOLVE_SCRIPT}"')
+        res.check_returncode()
+        data = json.loads(res.stdout.strip().splitlines()[-1])
+        return ExecutionEnvironmentRunner(
+            pythonPath=data["python"], env=data["env"], **self.options
         )
 
 
@@ -65,13 +113,34 @@ class ExecutionEnvironment:
     def __init__(self, logger: logging.Logger | None = None) -> None:
         self.logger = logger or logging.getLogger("exe-env")
         """Python version of the environment."""
+        self.resolvedRunner: ExecutionEnvironmentRunner | None = None
+        self.persistent = True
+        """Whether the environment outlives its use, so that long-lived processes can be kept for it."""
 
     def runner(self):
         return ExecutionEnvironmentRunner()
 
+    def resolveRunner(self):
+        """Get the runner that runs commands directly, resolved once by activating the environment."""
+
+        if self.resolvedRunner is None:
+            runner = self.runner()
+            try:
+                self.resolvedRunner = runner.resolve()
+                self.logger.info(
+                    f"Resolved interpreter: {self.resolvedRunner.pythonPath}"
+                )
+            except Exception as ex:
+                self.logger.warning(
+                    "Failed to resolve the environment, run commands in shell.",
+                    exc_info=ex,
+                )
+                self.resolvedRunner = runner
+        return self.resolvedRunner
+
     def __enter__(self):
         self.logger.info(f"Enter the environment: {self=}")
-        return self.runner()
+        return self.resolveRunner()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.logger.info(f"Exit the environment: {self=}")
@@ -92,7 +161,17 @@ class ExecutionEnvironmentBuilder[T: ExecutionEnvironment](ABC):
         pass
 
     @contextmanager
-    def use(self, pyversion: str = "3.12", logger: logging.Logger | None = None):
+    def use(
+        self,
+        pyversion: str = "3.12",
+        logger: logging.Logger | None = None,
+        dist: Distribution | None = None,
+    ):
+        """Use a built environment and clean it after use.
+
+        The distribution to extract is given for builders that reuse environments by its dependencies.
+        """
+
         logger = logger or self.logger.getChild("sub-env")
         self.logger.info(f"Build env {pyversion=}")
         try:
@@ -121,12 +200,53 @@ class ExecutionEnvironmentBuilder[T: ExecutionEnvironment](ABC):
             self.logger.info(f"Cleaned env {pyversion=}, {env=}")
 
 
+class ClonableEnvironmentBuilder[T: ExecutionEnvironment](
+    ExecutionEnvironmentBuilder[T]
+):
+    """Builder for named environments that can be cloned from each other."""
+
+    def __init__(
+        self, envprefix: str = "aex-", logger: logging.Logger | None = None
+    ) -> None:
+        super().__init__(logger=logger)
+        self.envprefix = envprefix
+        """Created environment name prefix."""
+
+    @abstractmethod
+    def create(self, name: str, pyversion: str = "3.12"):
+        """Create the environment with required packages."""
+        pass
+
+    @abstractmethod
+    def clone(self, source: str, name: str):
+        """Create the environment as a copy of the source environment."""
+        pass
+
+    @abstractmethod
+    def remove(self, name: str):
+        """Remove the environment."""
+        pass
+
+    @abstractmethod
+    def environment(self, name: str, logger: logging.Logger | None = None) -> T:
+        """Get the environment by name."""
+        pass
+
+    @override
+    def build(self, pyversion="3.12", logger=None):
+        name = f"{self.envprefix}{pyversion}-{uuid1()}"
+        self.create(name, pyversion)
+        env = self.environment(name, logger)
+        env.persistent = False
+        return env
+
+
 class CurrentEnvironment(ExecutionEnvironment):
     """Use the same environment for extractor."""
 
     @override
     def runner(self):
-        return ExecutionEnvironmentRunner(pythonName=sys.executable)
+        return ExecutionEnvironmentRunner(pythonPath=sys.executable)
 
 
 class SingleExecutionEnvironmentBuilder[T: ExecutionEnvironment](
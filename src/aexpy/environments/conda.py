@@ -2,15 +2,14 @@ from logging import Logger
 import platform
 import subprocess
 from typing import override
-from uuid import uuid1
 import json
 from functools import cache
 
 from aexpy.utils import logProcessResult
 
 from . import (
+    ClonableEnvironmentBuilder,
     ExecutionEnvironment,
-    ExecutionEnvironmentBuilder,
     ExecutionEnvironmentRunner,
 )
 
@@ -52,11 +51,9 @@ class CondaEnvironment(ExecutionEnvironment):
 
     def __enter__(self):
         self.logger.info(f"Activate conda env: {self.name}")
-        runner = self.runner()
+        runner = self.resolveRunner()
         if self.packages:
-            res = runner.runPythonText(
-                f"-m pip install {f' '.join(self.packages)}",
-            )
+            res = runner.runPythonText(["-m", "pip", "install", *self.packages])
             logProcessResult(self.logger, res)
             res.check_returncode()
         return super().__enter__()
@@ -65,7 +62,7 @@ class CondaEnvironment(ExecutionEnvironment):
         pass
 
 
-class CondaEnvironmentBuilder(ExecutionEnvironmentBuilder[CondaEnvironment]):
+class CondaEnvironmentBuilder(ClonableEnvironmentBuilder[CondaEnvironment]):
     """Conda environment builder."""
 
     def __init__(
@@ -74,17 +71,13 @@ class CondaEnvironmentBuilder(ExecutionEnvironmentBuilder[CondaEnvironment]):
         packages: list[str] | None = None,
         logger: Logger | None = None,
     ) -> None:
-        super().__init__(logger=logger)
-
-        self.envprefix = envprefix
-        """Created environment name prefix."""
+        super().__init__(envprefix=envprefix, logger=logger)
 
         self.packages = packages or []
         """Required packages in the environment."""
 
     @override
-    def build(self, pyversion="3.12", logger=None):
-        name = f"{self.envprefix}{pyversion}-{uuid1()}"
+    def create(self, name, pyversion="3.12"):
         res = subprocess.run(
             f"conda create -n {name} python={pyversion} -c conda-forge -y -q",
             shell=True,
@@ -101,13 +94,31 @@ class CondaEnvironmentBuilder(ExecutionEnvironmentBuilder[CondaEnvironment]):
         )
         logProcessResult(self.logger, res)
         res.check_returncode()
-        return CondaEnvironment(name=name, logger=logger)
 
     @override
-    def clean(self, env):
+    def clone(self, source, name):
+        res = subprocess.run(
+            f"conda create -n {name} --clone {source} --offline -y -q",
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+        logProcessResult(self.logger, res)
+        res.check_returncode()
+
+    @override
+    def remove(self, name):
         subprocess.run(
-            f"conda remove -n {env.name} --all -y -q",
+            f"conda remove -n {name} --all -y -q",
             shell=True,
             capture_output=True,
             check=True,
         )
+
+    @override
+    def environment(self, name, logger=None):
+        return CondaEnvironment(name=name, logger=logger)
+
+    @override
+    def clean(self, env):
+        self.remove(env.name)
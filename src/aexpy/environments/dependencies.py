@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from .. import getCacheDirectory, runOffline, utils
+from ..utils import logProcessResult
+from . import ExecutionEnvironmentRunner
+
+INSPECT_SCRIPT = "import json, sys, sysconfig; paths = sysconfig.get_paths(); print(json.dumps({'tag': sys.implementation.cache_tag, 'platform': sysconfig.get_platform(), 'purelib': paths['purelib'], 'platlib': paths['platlib']}))"
+
+
+def siteEntries(site: Path):
+    return {item.name for item in site.iterdir()} if site.is_dir() else set()
+
+
+def linkEntry(source: Path, target: Path):
+    """Hardlink the file or directory tree, falling back to copying."""
+
+    if source.is_dir():
+        utils.linkTree(source, target)
+        return
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class DependencyInstaller:
+    """Install dependencies into environments by a single resolve, backed by a shared wheelhouse and pip cache.
+
+    Dependency sets installed by pure additions to site-packages are kept per interpreter and base packages,
+    and hardlinked into later environments with the same key, without running pip."""
+
+    def __init__(
+        self, cacheDir: Path | None = None, logger: logging.Logger | None = None
+    ) -> None:
+        self.logger = logger or logging.getLogger("dependencies")
+        self.cacheDir = cacheDir or getCacheDirectory()
+        self.wheelhouse = self.cacheDir / "wheelhouse"
+        self.pipCache = self.cacheDir / "pip"
+        self.sets = self.cacheDir / "depsets"
+
+    def environ(self, runner: ExecutionEnvironmentRunner):
+        return {**(runner.env or os.environ), "PIP_CACHE_DIR": str(self.pipCache)}
+
+    def pip(self, runner: ExecutionEnvironmentRunner, *args: str):
+        options = ["--find-links", str(self.wheelhouse)]
+        if runOffline():
+            options.append("--no-index")
+        res = runner.runPythonText(
+            ["-m", "pip", *args, *options], env=self.environ(runner)
+        )
+        logProcessResult(self.logger, res)
+        return res
+
+    def installWheel(self, runner: ExecutionEnvironmentRunner, wheelFile: Path):
+        """Install the wheel file with its dependencies."""
+
+        utils.ensureDirectory(self.wheelhouse)
+        self.pip(runner, "install", str(wheelFile)).check_returncode()
+
+    def install(self, runner: ExecutionEnvironmentRunner, dependencies: list[str]):
+        """Install the dependencies, falling back to one by one if they cannot be resolved together."""
+
+        dependencies = sorted(set(dependencies))
+        if not dependencies:
+            return
+        utils.ensureDirectory(self.wheelhouse)
+        try:
+            self.installSet(runner, dependencies)
+            return
+        except Exception as ex:
+            self.logger.error(
+                f"Failed to install dependencies together: {dependencies}",
+                exc_info=ex,
+            )
+        for dep in dependencies:
+            try:
+                self.pip(runner, "install", dep).check_returncode()
+            except Exception as ex:
+                self.logger.error(f"Failed to install dependency: {dep}", exc_info=ex)
+
+    def installSet(self, runner: ExecutionEnvironmentRunner, dependencies: list[str]):
+        res = runner.runPythonText(["-c", INSPECT_SCRIPT])
+        res.check_returncode()
+        info = json.loads(res.stdout.strip().splitlines()[-1])
+        site = Path(info["purelib"])
+        if info["purelib"] != info["platlib"]:
+            site = None
+
+        setDir = None
+        before = set()
+        if site is not None:
+            before = siteEntries(site)
+            key = json.dumps(
+                [
+                    info["tag"],
+                    info["platform"],
+                    sorted(item for item in before if item.endswith(".dist-info")),
+                    dependencies,
+                ]
+            )
+            setDir = self.sets / hashlib.sha256(key.encode()).hexdigest()
+            if self.linkSet(setDir, site, before):
+                return
+
+        self.build(runner, dependencies)
+        self.pip(runner, "install", "--no-index", *dependencies).check_returncode()
+
+        if site is not None and setDir is not None:
+            try:
+                self.saveSet(setDir, site, before)
+            except Exception as ex:
+                self.logger.warning(
+                    f"Failed to save dependency set {setDir}.", exc_info=ex
+                )
+
+    def build(self, runner: ExecutionEnvironmentRunner, dependencies: list[str]):
+        """Resolve once and collect wheels of all dependencies into the wheelhouse."""
+
+        tempDir = Path(tempfile.mkdtemp(prefix=".build.", dir=self.wheelhouse))
+        try:
+            self.pip(
+                runner, "wheel", "--wheel-dir", str(tempDir), *dependencies
+            ).check_returncode()
+            for file in tempDir.glob("*.whl"):
+                target = self.wheelhouse / file.name
+                if not target.exists():
+                    os.replace(file, target)
+        finally:
+            shutil.rmtree(tempDir, ignore_errors=True)
+
+    def linkSet(self, setDir: Path, site: Path, before: set[str]):
+        """Hardlink the saved dependency set into site-packages, if it does not overlap existing entries."""
+
+        if not setDir.is_dir():
+            return False
+        entries = siteEntries(setDir)
+        if entries & before:
+            return False
+        self.logger.info(f"Link dependency set {setDir} into {site}")
+        for entry in entries:
+            linkEntry(setDir / entry, site / entry)
+        os.utime(setDir)
+        return True
+
+    def saveSet(self, setDir: Path, site: Path, before: set[str]):
+        """Keep the entries added to site-packages as a dependency set, if no distribution was replaced."""
+
+        if setDir.exists():
+            return
+        after = siteEntries(site)
+        if not before <= after:
+            return
+        added = sorted(after - before - {"__pycache__"})
+        if not added:
+            return
+        utils.ensureDirectory(self.sets)
+        tempDir = Path(tempfile.mkdtemp(prefix=".set.", dir=self.sets))
+        try:
+            for entry in added:
+                linkEntry(site / entry, tempDir / entry)
+            os.rename(tempDir, setDir)
+            self.logger.info(f"Saved dependency set {setDir}: {added}")
+        except OSError:
+            pass
+        finally:
+            if tempDir.exists():
+                shutil.rmtree(tempDir, ignore_errors=True)
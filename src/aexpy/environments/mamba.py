@@ -1,14 +1,15 @@
 from logging import Logger
+import json
+from pathlib import Path
 import subprocess
 from typing import override
-from uuid import uuid1
 from functools import cache
 
-from aexpy.utils import logProcessResult
+from aexpy.utils import linkTree, logProcessResult
 
 from . import (
+    ClonableEnvironmentBuilder,
     ExecutionEnvironment,
-    ExecutionEnvironmentBuilder,
     ExecutionEnvironmentRunner,
 )
 
@@ -44,11 +45,9 @@ class MambaEnvironment(ExecutionEnvironment):
 
     def __enter__(self):
         self.logger.info(f"Activate mamba env: {self.name}")
-        runner = self.runner()
+        runner = self.resolveRunner()
         if self.packages:
-            res = runner.runPythonText(
-                f"-m pip install {f' '.join(self.packages)}",
-            )
+            res = runner.runPythonText(["-m", "pip", "install", *self.packages])
             logProcessResult(self.logger, res)
             res.check_returncode()
         return super().__enter__()
@@ -57,7 +56,7 @@ class MambaEnvironment(ExecutionEnvironment):
         pass
 
 
-class MambaEnvironmentBuilder(ExecutionEnvironmentBuilder[MambaEnvironment]):
+class MambaEnvironmentBuilder(ClonableEnvironmentBuilder[MambaEnvironment]):
     """Mamba environment builder."""
 
     def __init__(
@@ -67,10 +66,7 @@ class MambaEnvironmentBuilder(ExecutionEnvironmentBuilder[MambaEnvironment]):
         mamba="micromamba",
         logger: Logger | None = None,
     ) -> None:
-        super().__init__(logger=logger)
-
-        self.envprefix = envprefix
-        """Created environment name prefix."""
+        super().__init__(envprefix=envprefix, logger=logger)
 
         self.packages = packages or []
         """Required packages in the environment."""
@@ -78,9 +74,23 @@ class MambaEnvironmentBuilder(ExecutionEnvironmentBuilder[MambaEnvironment]):
         self.mamba = mamba
         """Mamba executable name."""
 
+    def prefix(self, name: str) -> Path:
+        envs: list[str] = json.loads(
+            subprocess.run(
+                f"{self.mamba} env list --json",
+                shell=True,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )["envs"]
+        for env in envs:
+            if Path(env).name == name:
+                return Path(env)
+        raise Exception(f"Not found mamba env {name}.")
+
     @override
-    def build(self, pyversion="3.12", logger=None):
-        name = f"{self.envprefix}{pyversion}-{uuid1()}"
+    def create(self, name, pyversion="3.12"):
         res = subprocess.run(
             f"{self.mamba} create -n {name} python={pyversion} -c conda-forge -y -q",
             shell=True,
@@ -97,13 +107,27 @@ class MambaEnvironmentBuilder(ExecutionEnvironmentBuilder[MambaEnvironment]):
         )
         logProcessResult(self.logger, res)
         res.check_returncode()
-        return MambaEnvironment(name=name, mamba=self.mamba, logger=logger)
 
     @override
-    def clean(self, env):
+    def clone(self, source, name):
+        # copy the env prefix by hard links without solving, for both mamba and micromamba,
+        # it is safe since pip replaces files instead of modifying them in place
+        sourcePrefix = self.prefix(source)
+        linkTree(sourcePrefix, sourcePrefix.parent / name)
+
+    @override
+    def remove(self, name):
         subprocess.run(
-            f"{self.mamba} remove -n {env.name} --all -y -q",
+            f"{self.mamba} remove -n {name} --all -y -q",
             shell=True,
             capture_output=True,
             check=True,
         )
+
+    @override
+    def environment(self, name, logger=None):
+        return MambaEnvironment(name=name, mamba=self.mamba, logger=logger)
+
+    @override
+    def clean(self, env):
+        self.remove(env.name)
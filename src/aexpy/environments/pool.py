@@ -0,0 +1,153 @@
+from pathlib import Path
+import logging
+import pickle
+import subprocess
+import sys
+from typing import override
+from uuid import uuid1
+
+from .. import getCacheDirectory, utils
+from . import ClonableEnvironmentBuilder, ExecutionEnvironment
+
+
+class PooledEnvironmentBuilder[T: ExecutionEnvironment](ClonableEnvironmentBuilder[T]):
+    """Builder that hands out clones of a persistent base environment per Python version.
+
+    A number of warm clones are kept ready for each Python version, and shared by processes through marker files.
+    Clones are removed after use, and the pool is refilled by a detached process, so that callers never wait for cloning.
+    """
+
+    def __init__(
+        self,
+        inner: ClonableEnvironmentBuilder[T],
+        size: int = 1,
+        root: Path | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        super().__init__(envprefix=inner.envprefix, logger=logger)
+        self.inner = inner
+        self.size = size
+        """Number of warm clones kept for each Python version."""
+        self.root = root or (getCacheDirectory() / "envs" / inner.envprefix)
+
+    def baseName(self, pyversion: str):
+        return f"{self.envprefix}base-{pyversion}"
+
+    def readyDir(self, pyversion: str):
+        return self.root / pyversion / "ready"
+
+    def ensureBase(self, pyversion: str):
+        name = self.baseName(pyversion)
+        marker = self.root / pyversion / "base"
+        if marker.is_file():
+            return name
+        with utils.fileLock(self.root / pyversion / "base.lock"):
+            if marker.is_file():
+                return name
+            self.logger.info(f"Create base env {name}.")
+            try:
+                self.inner.remove(name)
+            except Exception:
+                pass
+            self.inner.create(name, pyversion)
+            utils.ensureFile(marker, name)
+        return name
+
+    def claim(self, pyversion: str):
+        """Take a warm clone, or None if the pool is empty."""
+
+        ready = self.readyDir(pyversion)
+        if not ready.is_dir():
+            return None
+        markers = []
+        for marker in ready.iterdir():
+            try:
+                markers.append((marker.stat().st_mtime, marker))
+            except FileNotFoundError:  # claimed by another process
+                continue
+        for _, marker in sorted(markers):
+            try:
+                # only one process succeeds to remove the marker
+                marker.unlink()
+            except FileNotFoundError:
+                continue
+            self.logger.info(f"Claim warm env {marker.name}.")
+            return marker.name
+        return None
+
+    def refill(self, pyversion: str):
+        try:
+            base = self.ensureBase(pyversion)
+            ready = self.readyDir(pyversion)
+            utils.ensureDirectory(ready)
+            with utils.fileLock(self.root / pyversion / "refill.lock"):
+                while len(list(ready.iterdir())) < self.size:
+                    name = f"{self.envprefix}{pyversion}-{uuid1()}"
+                    self.logger.info(f"Prepare warm env {name}.")
+                    self.inner.clone(base, name)
+                    utils.ensureFile(ready / name, "")
+        except Exception as ex:
+            self.logger.error(f"Failed to refill env pool {pyversion=}", exc_info=ex)
+
+    def refillDetached(self, pyversion: str):
+        """Refill the pool in a new process, which keeps running after the current process exits."""
+
+        try:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", __name__, pyversion],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            assert proc.stdin is not None
+            with proc.stdin:
+                proc.stdin.write(pickle.dumps(self))
+        except Exception as ex:
+            self.logger.error(
+                f"Failed to start env pool refill {pyversion=}", exc_info=ex
+            )
+
+    @override
+    def create(self, name, pyversion="3.12"):
+        self.inner.clone(self.ensureBase(pyversion), name)
+
+    @override
+    def clone(self, source, name):
+        self.inner.clone(source, name)
+
+    @override
+    def remove(self, name):
+        self.inner.remove(name)
+
+    @override
+    def environment(self, name, logger=None):
+        return self.inner.environment(name, logger)
+
+    @override
+    def build(self, pyversion="3.12", logger=None):
+        name = self.claim(pyversion)
+        if name is None:
+            name = f"{self.envprefix}{pyversion}-{uuid1()}"
+            self.create(name, pyversion)
+        if self.size > 0:
+            self.refillDetached(pyversion)
+        env = self.environment(name, logger)
+        env.persistent = False
+        return env
+
+    @override
+    def clean(self, env):
+        self.inner.clean(env)
+
+
+if __name__ == "__main__":
+    pyversion = sys.argv[1]
+    builder: PooledEnvironmentBuilder = pickle.load(sys.stdin.buffer)
+    utils.ensureDirectory(builder.root / pyversion)
+    logging.basicConfig(
+        filename=builder.root / pyversion / "refill.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s",
+    )
+    builder.refill(pyversion)
@@ -0,0 +1,216 @@
+from contextlib import ExitStack, contextmanager
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import time
+from typing import override
+
+from .. import getCacheDirectory, utils
+from ..models import Distribution
+from ..utils import logProcessResult
+from . import ClonableEnvironmentBuilder, ExecutionEnvironment
+
+PREFIX_SCRIPT = "import sys; print(sys.prefix)"
+
+
+def requirements(dist: Distribution):
+    """Requirement specifiers of the distribution, with version pins and markers."""
+
+    result = [str(v) for k, v in dist.metadata if k.lower() == "requires-dist"]
+    return sorted(set(result or dist.dependencies))
+
+
+def treeSize(path: Path):
+    """Disk usage of the directory tree, counting each hard-linked file once."""
+
+    seen = set()
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            total += stat.st_size
+    return total
+
+
+class ReusableEnvironmentBuilder[T: ExecutionEnvironment](
+    ClonableEnvironmentBuilder[T]
+):
+    """Builder that keeps environments after use, keyed by a fingerprint of the dependency set.
+
+    The fingerprint covers the Python version, the sorted requirement specifiers of the distribution, and the required packages of the extractor.
+    A distribution with the same fingerprint reuses the environment, and its own package is uninstalled after use.
+    Environments in use are locked as long as their users live, and the least recently used ones not in use are removed when they exceed the disk budget.
+    """
+
+    def __init__(
+        self,
+        inner: ClonableEnvironmentBuilder[T],
+        budget: int,
+        packages: list[str] | None = None,
+        root: Path | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        super().__init__(envprefix=inner.envprefix, logger=logger)
+        self.inner = inner
+        self.budget = budget
+        """Disk budget in bytes for kept environments."""
+        self.packages = packages or []
+        """Required packages of the extractor, part of the fingerprint."""
+        self.root = root or (getCacheDirectory() / "envs" / "reuse")
+
+    def fingerprint(self, pyversion: str, dist: Distribution):
+        key = json.dumps([pyversion, requirements(dist), sorted(self.packages)])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def recordFile(self, key: str):
+        return self.root / f"{key}.json"
+
+    def lockFile(self, key: str):
+        return self.root / f"{key}.lock"
+
+    def lock(self, key: str):
+        """Lock of the environment for the key, held while it is used or removed, and released only by its holder or its exit."""
+
+        return utils.fileLock(self.lockFile(key), timeout=0)
+
+    def load(self, key: str) -> dict | None:
+        try:
+            return json.loads(self.recordFile(key).read_text())
+        except Exception:
+            return None
+
+    @override
+    def create(self, name, pyversion="3.12"):
+        self.inner.create(name, pyversion)
+
+    @override
+    def clone(self, source, name):
+        self.inner.clone(source, name)
+
+    @override
+    def remove(self, name):
+        self.inner.remove(name)
+
+    @override
+    def environment(self, name, logger=None):
+        return self.inner.environment(name, logger)
+
+    @override
+    def build(self, pyversion="3.12", logger=None):
+        return self.inner.build(pyversion, logger)
+
+    @override
+    def clean(self, env):
+        self.inner.clean(env)
+
+    @contextmanager
+    @override
+    def use(self, pyversion="3.12", logger=None, dist=None):
+        if dist is None:
+            with super().use(pyversion, logger) as env:
+                yield env
+            return
+
+        key = self.fingerprint(pyversion, dist)
+        stack = ExitStack()
+        try:
+            stack.enter_context(self.lock(key))
+        except TimeoutError:
+            stack = None
+        if stack is None:
+            self.logger.info(f"Env {key} is in use, build a temporary env.")
+            with super().use(pyversion, logger) as env:
+                yield env
+            return
+
+        with stack:
+            record = self.load(key)
+            env = None
+            if record:
+                try:
+                    env = self.inner.environment(record["name"], logger)
+                    self.prefix(env)
+                    self.logger.info(f"Reuse env {record['name']} for {key}.")
+                except Exception as ex:
+                    self.logger.warning(f"Failed to load env {key}.", exc_info=ex)
+                    self.discard(key, record["name"])
+                    env = None
+            if env is None:
+                env = self.inner.build(pyversion, logger)
+                record = {"name": getattr(env, "name"), "pyversion": pyversion}
+                self.logger.info(f"Built env {record['name']} for {key}.")
+            env.persistent = True
+
+            try:
+                yield env
+            except Exception:
+                self.logger.warning(f"Discard env {record['name']} after failure.")
+                self.discard(key, record["name"])
+                raise
+
+            try:
+                self.release(env, dist)
+                record["size"] = treeSize(self.prefix(env))
+                record["used"] = time.time()
+                utils.ensureFile(self.recordFile(key), json.dumps(record))
+            except Exception as ex:
+                self.logger.error(f"Failed to keep env {key}.", exc_info=ex)
+                self.discard(key, record["name"])
+
+        self.evict()
+
+    def prefix(self, env: ExecutionEnvironment):
+        res = env.resolveRunner().runPythonText(["-c", PREFIX_SCRIPT])
+        res.check_returncode()
+        return Path(res.stdout.strip().splitlines()[-1])
+
+    def release(self, env: ExecutionEnvironment, dist: Distribution):
+        """Uninstall the package of the distribution, keeping its dependencies."""
+
+        if not dist.release.project:
+            return
+        res = env.resolveRunner().runPythonText(
+            ["-m", "pip", "uninstall", "-y", dist.release.project]
+        )
+        logProcessResult(self.logger, res)
+
+    def discard(self, key: str, name: str):
+        self.recordFile(key).unlink(missing_ok=True)
+        try:
+            self.inner.remove(name)
+        except Exception as ex:
+            self.logger.error(f"Failed to remove env {name}.", exc_info=ex)
+
+    def evict(self):
+        """Remove least recently used environments not in use, until they fit in the budget."""
+
+        try:
+            with utils.fileLock(self.root / "evict.lock", timeout=0):
+                records = []
+                for file in self.root.glob("*.json"):
+                    try:
+                        records.append((file.stem, json.loads(file.read_text())))
+                    except Exception:
+                        continue
+                records.sort(key=lambda x: x[1].get("used", 0))
+                total = sum(record.get("size", 0) for _, record in records)
+                for key, record in records:
+                    if total <= self.budget:
+                        break
+                    try:
+                        with self.lock(key):
+                            self.logger.info(f"Evict env {record['name']} for {key}.")
+                            self.discard(key, record["name"])
+                    except TimeoutError:
+                        continue
+                    total -= record.get("size", 0)
+        except TimeoutError:
+            pass
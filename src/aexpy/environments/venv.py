@@ -0,0 +1,215 @@
+from logging import Logger
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+from typing import override
+from functools import cache
+from uuid import uuid1
+
+from aexpy import getCacheDirectory
+from aexpy.utils import ensureDirectory, fileLock, linkTree, logProcessResult
+
+from . import (
+    ClonableEnvironmentBuilder,
+    ExecutionEnvironment,
+    ExecutionEnvironmentRunner,
+)
+
+PROBE_SCRIPT = (
+    "import sys; print(sys.executable); print('%d.%d' % sys.version_info[:2])"
+)
+
+
+def getVenvRoot():
+    return getCacheDirectory() / "venvs"
+
+
+def pythonCandidates(pyversion: str):
+    """Interpreter candidates for the Python version: pyenv versions (latest first), then executables on PATH."""
+
+    pyenv = Path(os.getenv("PYENV_ROOT") or Path.home() / ".pyenv") / "versions"
+    if pyenv.is_dir():
+        versions = []
+        for item in pyenv.iterdir():
+            if item.name.startswith(f"{pyversion}."):
+                patch = item.name.removeprefix(f"{pyversion}.")
+                if patch.isdigit():
+                    versions.append((int(patch), item))
+        for _, item in sorted(versions, reverse=True):
+            yield item / "bin" / "python"
+    if f"{sys.version_info.major}.{sys.version_info.minor}" == pyversion:
+        yield Path(sys.executable)
+    for name in (f"python{pyversion}", "python3", "python"):
+        path = shutil.which(name)
+        if path:
+            yield Path(path)
+
+
+@cache
+def findPython(pyversion: str) -> Path | None:
+    """Find a local interpreter of the Python version."""
+
+    for candidate in pythonCandidates(pyversion):
+        if not candidate.is_file():
+            continue
+        try:
+            res = subprocess.run(
+                [str(candidate), "-c", PROBE_SCRIPT],
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
+        except Exception:
+            continue
+        lines = res.stdout.strip().splitlines()
+        if res.returncode == 0 and len(lines) == 2 and lines[1] == pyversion:
+            return Path(lines[0])
+    return None
+
+
+def venvPython(path: Path):
+    if os.name == "nt":
+        return path / "Scripts" / "python.exe"
+    return path / "bin" / "python"
+
+
+class VenvEnvironment(ExecutionEnvironment):
+    """Virtual environment created by venv."""
+
+    def __init__(
+        self,
+        name: str,
+        packages: list[str] | None = None,
+        root: Path | None = None,
+        logger: Logger | None = None,
+    ) -> None:
+        super().__init__(logger)
+        self.name = name
+        self.packages = packages or []
+        """Required packages in the environment."""
+        self.root = root or getVenvRoot()
+        """Directory containing named environments."""
+
+    @property
+    def path(self):
+        path = Path(self.name)
+        if path.is_absolute() or path.is_dir():
+            return path.resolve()
+        return self.root / self.name
+
+    @override
+    def runner(self):
+        python = venvPython(self.path)
+        env = dict(os.environ)
+        env.pop("PYTHONHOME", None)
+        env["VIRTUAL_ENV"] = str(self.path)
+        env["PATH"] = os.pathsep.join([str(python.parent), env.get("PATH", "")])
+        return ExecutionEnvironmentRunner(pythonPath=str(python), env=env)
+
+    def __enter__(self):
+        self.logger.info(f"Activate venv: {self.path}")
+        runner = self.resolveRunner()
+        if self.packages:
+            res = runner.runPythonText(["-m", "pip", "install", *self.packages])
+            logProcessResult(self.logger, res)
+            res.check_returncode()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class VenvEnvironmentBuilder(ClonableEnvironmentBuilder[VenvEnvironment]):
+    """Venv environment builder.
+
+    A template environment with required packages is created once for each Python version from a local interpreter,
+    and environments are built as hard-linked copies of it."""
+
+    def __init__(
+        self,
+        envprefix: str = "venv-aex-",
+        packages: list[str] | None = None,
+        root: Path | None = None,
+        logger: Logger | None = None,
+    ) -> None:
+        super().__init__(envprefix=envprefix, logger=logger)
+
+        self.packages = packages or []
+        """Required packages in the environment."""
+
+        self.root = root or getVenvRoot()
+        """Directory containing created environments."""
+
+    def templateName(self, pyversion: str):
+        return f"{self.envprefix}template-{pyversion}"
+
+    def ensureTemplate(self, pyversion: str):
+        name = self.templateName(pyversion)
+        marker = self.root / f"{name}.ready"
+        if marker.is_file():
+            return name
+        with fileLock(self.root / f"{name}.lock"):
+            if marker.is_file():
+                return name
+            self.logger.info(f"Create template venv {name}.")
+            self.remove(name)
+            self.create(name, pyversion)
+            marker.touch()
+        return name
+
+    @override
+    def create(self, name, pyversion="3.12"):
+        python = findPython(pyversion)
+        if python is None:
+            raise Exception(f"Not found local interpreter for Python {pyversion}.")
+        ensureDirectory(self.root)
+        res = subprocess.run(
+            [str(python), "-m", "venv", str(self.root / name)],
+            capture_output=True,
+            text=True,
+        )
+        logProcessResult(self.logger, res)
+        res.check_returncode()
+        if self.packages:
+            res = subprocess.run(
+                [
+                    str(venvPython(self.root / name)),
+                    "-m",
+                    "pip",
+                    "install",
+                    *self.packages,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            logProcessResult(self.logger, res)
+            res.check_returncode()
+
+    @override
+    def clone(self, source, name):
+        # scripts keep shebangs of the source, but commands are run by the interpreter,
+        # and pyvenv.cfg locates the clone by its own path
+        linkTree(self.root / source, self.root / name)
+
+    @override
+    def remove(self, name):
+        shutil.rmtree(self.root / name, ignore_errors=True)
+
+    @override
+    def environment(self, name, logger=None):
+        return VenvEnvironment(name=name, root=self.root, logger=logger)
+
+    @override
+    def clean(self, env):
+        self.remove(env.name)
+
+    @override
+    def build(self, pyversion="3.12", logger=None):
+        template = self.ensureTemplate(pyversion)
+        name = f"{self.envprefix}{pyversion}-{uuid1()}"
+        self.clone(template, name)
+        env = self.environment(name, logger)
+        env.persistent = False
+        return env
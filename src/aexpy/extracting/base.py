@@ -1,7 +1,10 @@
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+import json
+from logging import Logger
+import os
+import subprocess
 from pathlib import Path
-from typing import Annotated, override
-import tempfile
+from typing import Annotated, Iterable, override
 
 from pydantic import Field, TypeAdapter
 
@@ -13,14 +16,24 @@ from aexpy.models.description import (
 )
 from aexpy.utils import logProcessResult
 
-from .. import getAppDirectory
-from ..models import ApiDescription, Distribution
+from .. import getDetectorPreloads, getDetectorServerIdle
+from ..environments import ExecutionEnvironment, ExecutionEnvironmentRunner
+from ..models import ApiDescription, Distribution, ModuleProfile
+from .bundle import detectorDirectory
 from .environment import EnvirontmentExtractor
 
+ENTRY_ADAPTER = TypeAdapter(Annotated[ApiEntryType, Field(discriminator="form")])
+
 
 def resolveAlias(api: ApiDescription):
     alias: dict[str, set[str]] = {}
     working: set[str] = set()
+    # members referring to each target, in the order of collections and their members
+    referrers: dict[str, list[tuple[CollectionEntry, str]]] = {}
+    for item in api:
+        if isinstance(item, CollectionEntry):
+            for name, target in item.members.items():
+                referrers.setdefault(target, []).append((item, name))
 
     def resolve(entry: ApiEntryType):
         if entry.id in alias:
@@ -28,22 +41,20 @@ def resolveAlias(api: ApiDescription):
         ret: set[str] = set()
         ret.add(entry.id)
         working.add(entry.id)
-        for item in api:
-            if not isinstance(item, CollectionEntry):
-                continue
-            itemalias = None
+        last = None
+        itemalias = None
+        for item, name in referrers.get(entry.id, ()):
             # ignore submodules and subclasses
             if item.id.startswith(f"{entry.id}."):
                 continue
-            for name, target in item.members.items():
-                if target == entry.id:
-                    if itemalias is None:
-                        if item.id in working:  # cycle reference
-                            itemalias = {item.id}
-                        else:
-                            itemalias = resolve(item)
-                    for aliasname in itemalias:
-                        ret.add(f"{aliasname}.{name}")
+            if item is not last:
+                last = item
+                if item.id in working:  # cycle reference
+                    itemalias = {item.id}
+                else:
+                    itemalias = resolve(item)
+            for aliasname in itemalias:
+                ret.add(f"{aliasname}.{name}")
         alias[entry.id] = ret
         working.remove(entry.id)
         return ret
@@ -53,37 +64,53 @@ def resolveAlias(api: ApiDescription):
 
 
 class BaseExtractor(EnvirontmentExtractor):
-    """Basic extractor that uses dynamic inspect."""
+    """Basic extractor that uses dynamic inspect.
+
+    With more than one worker, subpackages of each top-level module are imported and inspected in forked worker processes (POSIX only).
+    The payload level controls inspection payloads stored in entry data: `minimal` for none, `standard` for the repr, and `full` for the repr and dir.
+    """
+
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        env: ExecutionEnvironment | None = None,
+        workers: int = 0,
+        payload: str = "full",
+    ) -> None:
+        super().__init__(logger, env)
+        self.workers = workers
+        self.payload = payload
+
+    def detectorOptions(self):
+        options = []
+        if self.workers > 1:
+            options.extend(["--workers", str(self.workers)])
+        if self.payload != "full":
+            options.extend(["--payload", self.payload])
+        return options
+
+    def detectorArgs(self):
+        return ["-m", "aexpy_apidetector", *self.detectorOptions()]
 
     @override
     def extractInEnv(self, result, runner):
         assert result.distribution
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-
-            # pydantic will failed if run in app directory under python 3.12 in another python
-            self.logger.info(f"Copy from {getAppDirectory()} to {tmpdir}")
-            shutil.copytree(
-                getAppDirectory() / "apidetector", Path(tmpdir) / "aexpy_apidetector"
-            )
-
-            subres = runner.runPythonText(
-                f"-m aexpy_apidetector",
-                cwd=tmpdir,
-                input=result.distribution.model_dump_json(),
-            )
-
-        logProcessResult(self.logger, subres)
-
-        subres.check_returncode()
-
-        data = subres.stdout.split(TRANSFER_BEGIN, 1)[1]
-        entries: list[ApiEntryType] = TypeAdapter(
-            list[Annotated[ApiEntryType, Field(discriminator="form")]]
-        ).validate_json(data)
-        for entry in entries:
-            if entry.id not in result:
-                result.addEntry(entry)
+        subres = None
+        idle = getDetectorServerIdle()
+        # servers are kept for the interpreter, so not for temporary environments removed after use
+        if (
+            idle is not None
+            and os.name != "nt"
+            and runner.pythonPath
+            and self.env.persistent
+        ):
+            subres = self.runServer(result, runner, idle)
+        if subres is not None:
+            logProcessResult(self.logger, subres)
+            subres.check_returncode()
+        else:
+            self.runDetector(result, runner)
 
         resolveAlias(result)
         for item in result:
@@ -91,3 +118,105 @@ class BaseExtractor(EnvirontmentExtractor):
                 item.private = True
 
         result.calcSubclasses()
+
+    def runServer(
+        self, result: ApiDescription, runner: ExecutionEnvironmentRunner, idle: float
+    ):
+        """Run the detector in a long-lived server of the environment, or return None if the server is unavailable."""
+
+        from .server import DetectorServer
+
+        assert result.distribution
+        server = DetectorServer(runner, idle, getDetectorPreloads(), self.logger)
+        try:
+            sock = server.start()
+        except Exception as ex:
+            self.logger.warning(
+                "Failed to connect to the detector server, run the detector directly.",
+                exc_info=ex,
+            )
+            return None
+        self.logger.info(f"Run the detector in server {server.socketPath}.")
+        return server.request(
+            sock,
+            self.detectorOptions(),
+            result.distribution.model_dump_json(),
+            lambda transfer: self.readFrames(result, transfer),
+        )
+
+    def runDetector(self, result: ApiDescription, runner: ExecutionEnvironmentRunner):
+        """Run the detector in a new process."""
+
+        assert result.distribution
+
+        with detectorDirectory(runner, self.logger) as cwd:
+            self.logger.info(f"Run the detector from {cwd}")
+
+            if os.name == "nt":
+                # no file descriptor passing, entries are transferred after the begin marker in stdout
+                subres = runner.runPythonText(
+                    self.detectorArgs(),
+                    cwd=cwd,
+                    input=result.distribution.model_dump_json(),
+                )
+                logProcessResult(self.logger, subres)
+                subres.check_returncode()
+                self.readFrames(
+                    result, subres.stdout.split(TRANSFER_BEGIN, 1)[1].splitlines()
+                )
+            else:
+                subres = self.runStreaming(result, runner, cwd)
+                logProcessResult(self.logger, subres)
+                subres.check_returncode()
+
+    def runStreaming(
+        self, result: ApiDescription, runner: ExecutionEnvironmentRunner, cwd: Path
+    ):
+        """Run the detector with a dedicated pipe for transfer, and add entries while they arrive."""
+
+        assert result.distribution
+        read, write = os.pipe()
+        try:
+            proc = runner.popen(
+                [*self.detectorArgs(), "--transfer-fd", str(write)],
+                python=True,
+                cwd=cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                pass_fds=(write,),
+            )
+        except:
+            os.close(read)
+            raise
+        finally:
+            os.close(write)
+
+        with ThreadPoolExecutor(1) as pool:
+            outputs = pool.submit(
+                proc.communicate, result.distribution.model_dump_json()
+            )
+            try:
+                with os.fdopen(read, encoding="utf-8") as transfer:
+                    self.readFrames(result, transfer)
+            finally:
+                stdout, stderr = outputs.result()
+        return subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
+
+    def readFrames(self, result: ApiDescription, lines: Iterable[str]):
+        """Read frames of the kind and the JSON data separated by a tab, one per line."""
+
+        for line in lines:
+            kind, sep, data = line.rstrip("\n").partition("\t")
+            if not sep:
+                continue
+            if kind == "entry":
+                entry = ENTRY_ADAPTER.validate_json(data)
+                if entry.id not in result:
+                    result.addEntry(entry)
+            elif kind == "profile":
+                profile = json.loads(data)
+                result.profiles[profile.pop("name")] = ModuleProfile.model_validate(
+                    profile
+                )
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from functools import cache
+import hashlib
+from logging import Logger
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+from .. import __version__, getAppDirectory, getCacheDirectory, utils
+from ..environments import ExecutionEnvironmentRunner
+from ..utils import logProcessResult
+
+PACKAGE_NAME = "aexpy_apidetector"
+
+
+@cache
+def detectorHash():
+    """Hash of the API detector sources, so bundles and servers of stale detectors are not used."""
+
+    digest = hashlib.sha256()
+    root = getAppDirectory() / "apidetector"
+    for file in sorted(root.glob("*.py")):
+        digest.update(file.name.encode())
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def getDetectorBundle():
+    """Directory containing the API detector package, copied once for each version and sources of aexpy."""
+
+    root = getCacheDirectory() / "detectors" / "bundles"
+    bundle = root / f"{__version__}-{detectorHash()[:16]}"
+    if (bundle / PACKAGE_NAME).is_dir():
+        return bundle
+    utils.ensureDirectory(root)
+    temp = Path(tempfile.mkdtemp(prefix=".bundle.", dir=root))
+    try:
+        shutil.copytree(
+            getAppDirectory() / "apidetector",
+            temp / PACKAGE_NAME,
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+        try:
+            os.rename(temp, bundle)
+        except OSError:
+            # created by another process meanwhile
+            if not (bundle / PACKAGE_NAME).is_dir():
+                raise
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+    return bundle
+
+
+def compileBundle(
+    bundle: Path, runner: ExecutionEnvironmentRunner, logger: Logger | None = None
+):
+    """Compile the bundle to bytecode for the interpreter of the runner, once for each interpreter."""
+
+    marker = None
+    if runner.pythonPath:
+        key = hashlib.sha256(runner.pythonPath.encode()).hexdigest()[:16]
+        marker = bundle / f".compiled-{key}"
+        if marker.is_file():
+            return
+    res = runner.runPythonText(["-m", "compileall", "-q", str(bundle / PACKAGE_NAME)])
+    if logger:
+        logProcessResult(logger, res)
+    res.check_returncode()
+    if marker is not None:
+        marker.touch()
+
+
+@contextmanager
+def detectorDirectory(runner: ExecutionEnvironmentRunner, logger: Logger | None = None):
+    """Provide a directory to run the API detector from, the compiled bundle or a temporary copy if it is unavailable."""
+
+    try:
+        bundle = getDetectorBundle()
+        compileBundle(bundle, runner, logger)
+    except Exception as ex:
+        if logger:
+            logger.warning(
+                "Failed to prepare the detector bundle, use a temporary copy.",
+                exc_info=ex,
+            )
+        bundle = None
+    if bundle is not None:
+        yield bundle
+        return
+
+    # pydantic will failed if run in app directory under python 3.12 in another python
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shutil.copytree(getAppDirectory() / "apidetector", Path(tmpdir) / PACKAGE_NAME)
+        yield Path(tmpdir)
@@ -11,15 +11,25 @@ class DefaultExtractor(Extractor):
     """Basic extractor that uses dynamic inspect."""
 
     def __init__(
-        self, logger: Logger | None = None, env: ExecutionEnvironment | None = None
+        self,
+        logger: Logger | None = None,
+        env: ExecutionEnvironment | None = None,
+        workers: int = 0,
+        payload: str = "full",
     ):
         super().__init__(logger=logger)
         self.env = env
+        self.workers = workers
+        """Number of worker processes to inspect subpackages, 0 or 1 to inspect in one process."""
+        self.payload = payload
+        """Inspection payloads stored in entry data, `minimal`, `standard` or `full`."""
 
     def base(self, dist: Distribution, product: ApiDescription):
         from .base import BaseExtractor
 
-        BaseExtractor(self.logger, self.env).extract(dist, product)
+        BaseExtractor(self.logger, self.env, self.workers, self.payload).extract(
+            dist, product
+        )
         product.distribution = dist
 
     def attributes(
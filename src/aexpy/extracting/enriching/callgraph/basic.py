@@ -1,5 +1,6 @@
 import ast
 import logging
+import re
 from typing import override
 from ast import Call, NodeVisitor, parse
 
@@ -15,6 +16,28 @@ class CallsiteGetter(NodeVisitor):
         super().__init__()
         self.result = result
         self.src = src
+        # split once, instead of for each segment in ast.get_source_segment
+        self.lines = re.findall(r".*?(?:\r\n|\r|\n)|.+$", src)
+
+    def segment(self, node: ast.AST):
+        """Same as `ast.get_source_segment`."""
+
+        try:
+            if node.end_lineno is None or node.end_col_offset is None:  # type: ignore
+                return ""
+            lineno = node.lineno - 1  # type: ignore
+            endLineno = node.end_lineno - 1  # type: ignore
+            colOffset = node.col_offset  # type: ignore
+            endColOffset = node.end_col_offset  # type: ignore
+        except AttributeError:
+            return ""
+
+        if endLineno == lineno:
+            return self.lines[lineno].encode()[colOffset:endColOffset].decode()
+
+        first = self.lines[lineno].encode()[colOffset:].decode()
+        last = self.lines[endLineno].encode()[:endColOffset].decode()
+        return "".join([first, *self.lines[lineno + 1 : endLineno], last])
 
     def visit_Call(self, node: Call):
         site = Callsite(value=node)
@@ -25,14 +48,14 @@ class CallsiteGetter(NodeVisitor):
             case ast.Name() as name:
                 site.targets = [name.id]
         for arg in node.args:
-            argu = Argument(value=arg, raw=ast.get_source_segment(self.src, arg) or "")
+            argu = Argument(value=arg, raw=self.segment(arg))
             site.arguments.append(argu)
         for arg in node.keywords:
             argu = Argument(
                 name=arg.arg or "<none>",
                 value=arg.value,
                 iskwargs=arg.arg is None,
-                raw=ast.get_source_segment(self.src, arg.value) or "",
+                raw=self.segment(arg.value),
             )
             site.arguments.append(argu)
         self.result.sites.append(site)
@@ -3,9 +3,12 @@ from typing import override
 from aexpy.environments import ExecutionEnvironment, ExecutionEnvironmentRunner
 from aexpy.extracting import Extractor
 from logging import Logger
-from aexpy import getEnvironmentManager
+from aexpy import (
+    getEnvironmentManager,
+    getEnvironmentPoolSize,
+    getEnvironmentReuseBudget,
+)
 from aexpy.models import ApiDescription
-from aexpy.utils import logProcessResult
 
 
 def getExtractorEnvironment(name: str, logger: Logger | None = None):
@@ -18,12 +21,33 @@ def getExtractorEnvironment(name: str, logger: Logger | None = None):
         from aexpy.environments.mamba import MambaEnvironment
 
         return MambaEnvironment(name, ["pydantic"], mamba="mamba", logger=logger)
+    elif env == "venv":
+        from aexpy.environments.venv import VenvEnvironment
+
+        return VenvEnvironment(name, ["pydantic"], logger=logger)
     from aexpy.environments.mamba import MambaEnvironment
 
     return MambaEnvironment(name, ["pydantic"], logger=logger)
 
 
 def getExtractorEnvironmentBuilder(logger: Logger | None = None):
+    builder = getBaseExtractorEnvironmentBuilder(logger)
+    size = getEnvironmentPoolSize()
+    if size is not None:
+        from aexpy.environments.pool import PooledEnvironmentBuilder
+
+        builder = PooledEnvironmentBuilder(builder, size=size, logger=logger)
+    budget = getEnvironmentReuseBudget()
+    if budget is not None:
+        from aexpy.environments.reuse import ReusableEnvironmentBuilder
+
+        builder = ReusableEnvironmentBuilder(
+            builder, budget=budget, packages=["pydantic"], logger=logger
+        )
+    return builder
+
+
+def getBaseExtractorEnvironmentBuilder(logger: Logger | None = None):
     env = getEnvironmentManager()
     if env == "conda":
         from aexpy.environments.conda import CondaEnvironmentBuilder
@@ -35,6 +59,10 @@ def getExtractorEnvironmentBuilder(logger: Logger | None = None):
         return MambaEnvironmentBuilder(
             "aex-ext-", ["pydantic"], mamba="mamba", logger=logger
         )
+    elif env == "venv":
+        from aexpy.environments.venv import VenvEnvironmentBuilder
+
+        return VenvEnvironmentBuilder("aex-ext-", ["pydantic"], logger=logger)
     from aexpy.environments.mamba import MambaEnvironmentBuilder
 
     return MambaEnvironmentBuilder("aex-ext-", ["pydantic"], logger=logger)
@@ -63,17 +91,16 @@ class EnvirontmentExtractor(Extractor):
 
     @override
     def extract(self, dist, product):
+        from ..environments.dependencies import DependencyInstaller
+
+        installer = DependencyInstaller(logger=self.logger)
         with self.env as runner:
             doneDeps = False
             if dist.wheelFile:
                 if dist.wheelFile.is_file():
                     self.logger.info(f"Install package wheel file: {dist.wheelFile}")
                     try:
-                        res = runner.runPythonText(
-                            f"-m pip install {str(dist.wheelFile)}"
-                        )
-                        logProcessResult(self.logger, res)
-                        res.check_returncode()
+                        installer.installWheel(runner, dist.wheelFile)
                         doneDeps = True
                     except Exception as ex:
                         self.logger.error(
@@ -81,14 +108,5 @@ class EnvirontmentExtractor(Extractor):
                             exc_info=ex,
                         )
             if not doneDeps and dist.dependencies:
-                for dep in dist.dependencies:
-                    try:
-                        res = runner.runPythonText(f"-m pip install {dep}")
-                        # res = run(f"python -m pip --version", capture_output=True, text=True)
-                        logProcessResult(self.logger, res)
-                        res.check_returncode()
-                    except Exception as ex:
-                        self.logger.error(
-                            f"Failed to install dependency: {dep}", exc_info=ex
-                        )
+                installer.install(runner, dist.dependencies)
             self.extractInEnv(product, runner)
@@ -0,0 +1,161 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from logging import Logger
+import logging
+import os
+from pathlib import Path
+import socket
+import subprocess
+import tempfile
+import time
+from typing import IO, Callable
+
+from .. import getCacheDirectory, utils
+from ..environments import ExecutionEnvironmentRunner
+from .bundle import compileBundle, detectorHash, getDetectorBundle
+
+
+class DetectorServer:
+    """Client of a long-lived API detector server for an interpreter, started on demand.
+
+    The server listens on a Unix socket, and serves each request in a forked child
+    that takes the standard streams and the transfer stream of the request by file descriptor passing.
+    It exits after idle seconds without requests.
+    """
+
+    def __init__(
+        self,
+        runner: ExecutionEnvironmentRunner,
+        idle: float,
+        preload: list[str] | None = None,
+        logger: Logger | None = None,
+    ) -> None:
+        assert runner.pythonPath, "Detector server needs a resolved interpreter."
+        self.runner = runner
+        self.idle = idle
+        self.preload = preload or []
+        self.logger = logger or logging.getLogger("detector-server")
+        key = json.dumps([runner.pythonPath, self.preload, detectorHash()])
+        self.key = hashlib.sha256(key.encode()).hexdigest()[:16]
+        self.directory = getCacheDirectory() / "detectors" / self.key
+        """Directory of the log and the start lock of the server."""
+
+    @property
+    def socketPath(self):
+        # Unix socket paths are limited to about 100 characters, so not in the cache directory
+        return Path(tempfile.gettempdir()) / f"aexpy-{os.getuid()}" / f"{self.key}.sock"
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(self.socketPath))
+            return sock
+        except OSError:
+            sock.close()
+            return None
+
+    def start(self, timeout: float = 300):
+        """Connect to the server, starting it if it is not running."""
+
+        sock = self.connect()
+        if sock is not None:
+            return sock
+        with utils.fileLock(self.directory.with_suffix(".lock"), timeout=timeout):
+            sock = self.connect()
+            if sock is not None:
+                return sock
+
+            utils.ensureDirectory(self.directory)
+            bundle = getDetectorBundle()
+            compileBundle(bundle, self.runner, self.logger)
+            utils.ensureDirectory(self.socketPath.parent)
+            os.chmod(self.socketPath.parent, 0o700)
+
+            self.logger.info(f"Start detector server at {self.socketPath}.")
+            args = [
+                "-m",
+                "aexpy_apidetector",
+                "--serve",
+                str(self.socketPath),
+                "--idle",
+                str(self.idle),
+            ]
+            if self.preload:
+                args.extend(["--preload", ",".join(self.preload)])
+            with open(self.directory / "server.log", "ab") as log:
+                proc = self.runner.popen(
+                    args,
+                    python=True,
+                    cwd=bundle,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=log,
+                    start_new_session=True,
+                )
+
+            start = time.monotonic()
+            while time.monotonic() - start < timeout:
+                sock = self.connect()
+                if sock is not None:
+                    return sock
+                if proc.poll() is not None:
+                    raise Exception(
+                        f"Detector server exited with {proc.returncode}, see {self.directory / 'server.log'}."
+                    )
+                time.sleep(0.1)
+            raise TimeoutError(f"Timeout to start detector server {self.socketPath}.")
+
+    def request(
+        self,
+        sock: socket.socket,
+        argv: list[str],
+        input: str,
+        readTransfer: Callable[[IO[str]], None],
+    ):
+        """Run the detector with arguments and stdin in the server, and read the transfer stream."""
+
+        stdinRead, stdinWrite = os.pipe()
+        stdoutRead, stdoutWrite = os.pipe()
+        stderrRead, stderrWrite = os.pipe()
+        transferRead, transferWrite = os.pipe()
+        try:
+            socket.send_fds(
+                sock,
+                [json.dumps({"argv": argv}).encode()],
+                [stdinRead, stdoutWrite, stderrWrite, transferWrite],
+            )
+        except:
+            for fd in (stdinWrite, stdoutRead, stderrRead, transferRead):
+                os.close(fd)
+            sock.close()
+            raise
+        finally:
+            for fd in (stdinRead, stdoutWrite, stderrWrite, transferWrite):
+                os.close(fd)
+
+        def write():
+            try:
+                with os.fdopen(stdinWrite, "w", encoding="utf-8") as f:
+                    f.write(input)
+            except BrokenPipeError:
+                pass
+
+        def read(fd: int):
+            with os.fdopen(fd, encoding="utf-8", errors="replace") as f:
+                return f.read()
+
+        with sock, ThreadPoolExecutor(3) as pool:
+            written = pool.submit(write)
+            stdout = pool.submit(read, stdoutRead)
+            stderr = pool.submit(read, stderrRead)
+            try:
+                with os.fdopen(transferRead, encoding="utf-8") as transfer:
+                    readTransfer(transfer)
+            finally:
+                written.result()
+                outputs = stdout.result(), stderr.result()
+            with sock.makefile("r") as f:
+                status = f.readline()
+        code = json.loads(status)["code"] if status else 1
+        return subprocess.CompletedProcess(["aexpy_apidetector", *argv], code, *outputs)
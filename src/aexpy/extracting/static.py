@@ -0,0 +1,1066 @@
+import abc
+import ast
+import builtins
+from dataclasses import dataclass, field
+from functools import cache
+import importlib.machinery
+import inspect
+from logging import Logger
+from pathlib import Path
+import sys
+from typing import override
+import warnings
+
+from ..apidetector.processor import ABCs, Processor
+from ..models import ApiDescription, Distribution
+from ..models.description import (
+    ApiEntry,
+    AttributeEntry,
+    ClassEntry,
+    FunctionEntry,
+    ItemScope,
+    Location,
+    ModuleEntry,
+    Parameter,
+    ParameterKind,
+    SpecialEntry,
+    SpecialKind,
+    isPrivate,
+)
+from . import Extractor
+
+UNKNOWN = "unknown"
+"""Key in entry data for the reason that the entry is not known statically."""
+
+STDLIB = "stdlib"
+"""Key in entry data for the Python version whose standard library resolves the external classes in the MRO."""
+
+STDLIB_VERSION = f"{sys.version_info.major}.{sys.version_info.minor}"
+
+UNIMPORTED_MODULES = {"antigravity", "this"}
+"""Standard library modules with side effects on import, never imported to resolve external objects."""
+
+FUNCTION_DECORATORS = {
+    "staticmethod",
+    "classmethod",
+    "abstractmethod",
+    "overload",
+    "override",
+    "final",
+    "contextmanager",
+    "asynccontextmanager",
+}
+"""Decorators that keep the decorated function a function."""
+
+PROPERTY_DECORATORS = {
+    "property",
+    "abstractproperty",
+    "setter",
+    "getter",
+    "deleter",
+    "cached_property",
+}
+
+CLASS_DECORATORS = {"final", "runtime_checkable", "total_ordering", "unique"}
+"""Decorators that keep members of the decorated class."""
+
+
+@dataclass
+class Binding:
+    kind: str
+    """`module`, `import`, `class`, `function` or `value`."""
+    target: str = ""
+    """Module name, imported reference, or the id of the definition."""
+    node: ast.AST | None = None
+
+
+@dataclass
+class Scope:
+    id: str
+    module: "StaticModule"
+    node: ast.AST | None = None
+    bindings: dict[str, Binding] = field(default_factory=dict)
+    annotations: dict[str, str] = field(default_factory=dict)
+    stars: list[str] = field(default_factory=list)
+    exports: list[str] | None = None
+    """Names in a literal `__all__`."""
+    unknown: list[str] = field(default_factory=list)
+    """Reasons that members may be incomplete."""
+
+
+@dataclass
+class StaticModule:
+    name: str
+    package: bool = False
+    file: Path | None = None
+    path: str = ""
+    """Posix path of the file relative to the root."""
+    missing: bool = False
+    """Whether the module has no source, such as an extension module without stubs."""
+    source: str = ""
+    lines: list[str] = field(default_factory=list)
+    tree: ast.Module | None = None
+    scope: Scope | None = None
+
+
+@dataclass
+class Resolved:
+    kind: str
+    """`module`, `class`, `function`, `attribute`, `external` or `unknown`."""
+    id: str = ""
+    binding: Binding | None = None
+    scope: Scope | None = None
+
+
+def precedingComments(lines: list[str], index: int):
+    """Block of comments right before the line with the same indentation, as `inspect.getcomments` finds it."""
+
+    if index <= 0 or index >= len(lines):
+        return ""
+    indent = inspect.indentsize(lines[index])
+    end = index - 1
+    comments: list[str] = []
+    while (
+        end >= 0
+        and lines[end].lstrip()[:1] == "#"
+        and inspect.indentsize(lines[end]) == indent
+    ):
+        comments.insert(0, lines[end].expandtabs().lstrip())
+        end -= 1
+    while comments and comments[0].strip() == "#":
+        comments.pop(0)
+    while comments and comments[-1].strip() == "#":
+        comments.pop()
+    return "".join(comments)
+
+
+def moduleComments(lines: list[str]):
+    """Block of comments at the top of the file, as `inspect.getcomments` finds it."""
+
+    start = 1 if lines and lines[0][:2] == "#!" else 0
+    while start < len(lines) and lines[start].strip() in ("", "#"):
+        start += 1
+    comments: list[str] = []
+    while start < len(lines) and lines[start][:1] == "#":
+        comments.append(lines[start].expandtabs())
+        start += 1
+    return "".join(comments)
+
+
+@cache
+def abcTypes():
+    """Ids and ABCs checked by the API detector, in its order."""
+
+    return [(objectId(item), item) for item in ABCs]
+
+
+def objectId(obj):
+    """Id of the object, as the API detector gives to external objects."""
+
+    if inspect.ismodule(obj):
+        return obj.__name__
+    module = inspect.getmodule(obj)
+    moduleName = module.__name__ if module else str(getattr(obj, "__module__", ""))
+    qualname = getattr(obj, "__qualname__", "") or getattr(obj, "__name__", "")
+    if not qualname:
+        qualname = f"<instance ({type(obj)})>"
+    return f"{moduleName}.{qualname}" if moduleName else qualname
+
+
+def decoratorName(node: ast.expr):
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+
+def isTypeChecking(node: ast.expr):
+    return decoratorName(node) == "TYPE_CHECKING"
+
+
+def isGenerator(node: ast.AST):
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return True
+        if isinstance(
+            child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+        ):
+            continue
+        if isGenerator(child):
+            return True
+    return False
+
+
+def literalDefault(node: ast.expr) -> str | None:
+    """Default value in the format of the API detector, None for a variable default value."""
+
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif (
+        isinstance(node, ast.UnaryOp)
+        and isinstance(node.op, (ast.USub, ast.UAdd))
+        and isinstance(node.operand, ast.Constant)
+    ):
+        try:
+            value = ast.literal_eval(node)
+        except ValueError:
+            return None
+    else:
+        return None
+    if value is True or value is False:
+        return f"bool('{value}')"
+    elif isinstance(value, int):
+        return f"int('{value}')"
+    elif isinstance(value, float):
+        return f"float('{value}')"
+    elif isinstance(value, str):
+        return f"str('{value}')"
+    elif value is None:
+        return "None"
+    return None
+
+
+def literalStrings(node: ast.expr | None) -> list[str] | None:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        result = []
+        for item in node.elts:
+            if not (isinstance(item, ast.Constant) and isinstance(item.value, str)):
+                return None
+            result.append(item.value)
+        return result
+    return None
+
+
+def linearize(head: str, sequences: list[list[str]]):
+    """C3 linearization, or None if it is inconsistent."""
+
+    result = [head]
+    sequences = [list(item) for item in sequences if item]
+    while sequences:
+        for sequence in sequences:
+            candidate = sequence[0]
+            if not any(candidate in other[1:] for other in sequences):
+                break
+        else:
+            return None
+        result.append(candidate)
+        sequences = [item[1:] if item[0] == candidate else item for item in sequences]
+        sequences = [item for item in sequences if item]
+    return result
+
+
+class StaticExtractor(Extractor):
+    """Extractor that reads the AST of the sources, with no environment and no imports.
+
+    Modules are found as `pkgutil.walk_packages` finds them, and `.pyi` stubs are used for modules without Python sources
+    (such as extension modules) if `stubs` is set. Members are bound by the statements of module and class bodies,
+    preferring the main branch of `if` and `try` statements, and skipping `if TYPE_CHECKING` blocks.
+    External classes are resolved from standard library modules of this interpreter, for MROs and ABCs,
+    and classes with them in MROs record its version in `data["stdlib"]`.
+
+    Entries not known statically are marked by the reason in `data["unknown"]`:
+    unresolved members are special entries of unknown kind, attributes of unknown values, definitions with decorators that may replace them,
+    classes with metaclasses or external bases, and modules with dynamic members or no sources.
+    Instance attributes and kwargs are enriched by the AST fallbacks, and types are not enriched.
+    """
+
+    def __init__(self, logger: Logger | None = None, stubs: bool = True):
+        super().__init__(logger=logger)
+        self.stubs = stubs
+        self.modules: dict[str, StaticModule] = {}
+        self.classes: dict[str, Scope] = {}
+        self.mros: dict[str, list[str]] = {}
+        self.externals: dict[str, tuple[bool, object]] = {}
+
+    @override
+    def extract(self, dist: Distribution, product: ApiDescription):
+        from .attributes import AttributeExtractor
+        from .base import resolveAlias
+        from .kwargs import KwargsExtractor
+
+        assert dist.rootPath, "No src path"
+        if dist.pyversion and dist.pyversion != STDLIB_VERSION:
+            self.logger.warning(
+                f"Resolve external classes for Python {dist.pyversion} from the standard library of Python {STDLIB_VERSION}."
+            )
+
+        self.modules = {}
+        self.classes = {}
+        self.mros = {}
+        for topLevel in dist.topModules:
+            for module in self.discover(dist.rootPath, topLevel):
+                self.modules.setdefault(module.name, module)
+        assert self.modules, "No top level module found."
+
+        for module in self.modules.values():
+            self.parse(module, dist.rootPath)
+        # submodules are bound in the package once imported, unless the package rebinds the names
+        for module in self.modules.values():
+            parent, _, name = module.name.rpartition(".")
+            if parent in self.modules:
+                scope = self.modules[parent].scope
+                assert scope is not None
+                scope.bindings[name] = Binding("module", module.name)
+        for module in self.modules.values():
+            if module.scope is not None and module.tree is not None:
+                self.bind(module.scope, module.tree.body)
+
+        for module in self.modules.values():
+            try:
+                self.visitModule(module, product, dist.rootPath)
+            except Exception as ex:
+                self.logger.error(f"Failed to visit module {module.name}.", exc_info=ex)
+
+        resolveAlias(product)
+        for item in product:
+            if isPrivate(item):
+                item.private = True
+        product.calcSubclasses()
+
+        AttributeExtractor(self.logger, lambda _: None).extract(dist, product)
+        KwargsExtractor(self.logger, lambda _: None).extract(dist, product)
+
+    def sourceFile(self, base: Path):
+        """Source file of the module at the path without suffixes, or None if there is no source."""
+
+        source = base.with_name(f"{base.name}.py")
+        if source.is_file():
+            return source
+        stub = base.with_name(f"{base.name}.pyi")
+        if self.stubs and stub.is_file():
+            return stub
+        return None
+
+    def isModuleFile(self, file: Path):
+        return file.suffix in (".py", ".pyi") or any(
+            file.name.endswith(suffix)
+            for suffix in importlib.machinery.EXTENSION_SUFFIXES
+        )
+
+    def hasModule(self, directory: Path, name: str):
+        return any(
+            self.isModuleFile(file) and file.name.split(".", 1)[0] == name
+            for file in directory.glob(f"{name}.*")
+        )
+
+    def discover(self, root: Path, name: str):
+        """Modules of the top-level module, as `pkgutil.walk_packages` finds them."""
+
+        path = root / name
+        if path.is_dir():
+            yield from self.discoverPackage(path, name)
+            return
+        if self.hasModule(root, name):
+            file = self.sourceFile(path)
+            yield StaticModule(name, file=file, missing=file is None)
+            return
+        self.logger.warning(f"No module {name} found in {root}.")
+
+    def discoverPackage(self, path: Path, name: str):
+        file = self.sourceFile(path / "__init__")
+        missing = file is None and self.hasModule(path, "__init__")
+        yield StaticModule(name, package=True, file=file, missing=missing)
+        names: set[str] = set()
+        for item in sorted(path.iterdir()):
+            if item.is_dir():
+                # directories without __init__ are not packages for pkgutil
+                if item.name.isidentifier() and self.hasModule(item, "__init__"):
+                    yield from self.discoverPackage(item, f"{name}.{item.name}")
+                continue
+            stem = item.name.split(".", 1)[0]
+            if (
+                not self.isModuleFile(item)
+                or not stem.isidentifier()
+                or stem in ("__init__", "__main__")
+                or stem in names
+            ):
+                continue
+            names.add(stem)
+            file = self.sourceFile(path / stem)
+            yield StaticModule(f"{name}.{stem}", file=file, missing=file is None)
+
+    def parse(self, module: StaticModule, root: Path):
+        module.scope = Scope(module.name, module)
+        if module.file is None:
+            if module.missing:
+                module.scope.unknown.append("no source")
+            return
+        module.path = module.file.relative_to(root).as_posix()
+        try:
+            module.source = module.file.read_text(encoding="utf-8")
+            module.lines = module.source.splitlines(keepends=True)
+            module.tree = ast.parse(module.source, str(module.file))
+            module.scope.node = module.tree
+        except Exception as ex:
+            self.logger.error(f"Failed to parse {module.file}.", exc_info=ex)
+            module.scope.unknown.append("invalid source")
+
+    def absoluteModule(self, module: StaticModule, name: str | None, level: int):
+        if level == 0:
+            return name or ""
+        parts = module.name.split(".")
+        if not module.package:
+            parts.pop()
+        if level > 1:
+            parts = parts[: len(parts) - (level - 1)]
+        if name:
+            parts.append(name)
+        return ".".join(parts)
+
+    def bind(self, scope: Scope, body: list[ast.stmt]):
+        """Bind names by the statements of the module or class body, in order."""
+
+        for stmt in body:
+            match stmt:
+                case ast.ClassDef():
+                    id = f"{scope.id}.{stmt.name}"
+                    scope.bindings[stmt.name] = Binding("class", id, stmt)
+                    classScope = Scope(id, scope.module, stmt)
+                    self.classes[id] = classScope
+                    self.bind(classScope, stmt.body)
+                case ast.FunctionDef() | ast.AsyncFunctionDef():
+                    scope.bindings[stmt.name] = Binding(
+                        "function", f"{scope.id}.{stmt.name}", stmt
+                    )
+                    if stmt.name == "__getattr__" and scope.node is scope.module.tree:
+                        scope.unknown.append("module __getattr__")
+                case ast.Import():
+                    for alias in stmt.names:
+                        if alias.asname:
+                            scope.bindings[alias.asname] = Binding("import", alias.name)
+                        else:
+                            top = alias.name.split(".", 1)[0]
+                            scope.bindings[top] = Binding("import", top)
+                case ast.ImportFrom():
+                    base = self.absoluteModule(scope.module, stmt.module, stmt.level)
+                    for alias in stmt.names:
+                        if alias.name == "*":
+                            scope.stars.append(base)
+                        else:
+                            scope.bindings[alias.asname or alias.name] = Binding(
+                                "import", f"{base}.{alias.name}"
+                            )
+                case ast.Assign():
+                    for target in stmt.targets:
+                        self.bindTarget(scope, target, stmt.value)
+                case ast.AnnAssign(target=ast.Name() as target):
+                    scope.annotations[target.id] = ast.unparse(stmt.annotation)
+                    if stmt.value is not None:
+                        self.bindTarget(scope, target, stmt.value)
+                case ast.AugAssign(target=ast.Name(id="__all__")):
+                    names = literalStrings(stmt.value)
+                    if scope.exports is not None and names is not None:
+                        scope.exports.extend(names)
+                    else:
+                        scope.exports = None
+                case ast.If():
+                    # the main branch is preferred, so bound last
+                    self.bind(scope, stmt.orelse)
+                    if not isTypeChecking(stmt.test):
+                        self.bind(scope, stmt.body)
+                case ast.Try() | ast.TryStar():
+                    for handler in stmt.handlers:
+                        self.bind(scope, handler.body)
+                    self.bind(scope, stmt.body)
+                    self.bind(scope, stmt.orelse)
+                    self.bind(scope, stmt.finalbody)
+                case ast.With() | ast.AsyncWith():
+                    self.bind(scope, stmt.body)
+
+    def bindTarget(self, scope: Scope, target: ast.expr, value: ast.expr | None):
+        if isinstance(target, ast.Name):
+            if target.id == "__all__":
+                names = literalStrings(value)
+                scope.exports = list(names) if names is not None else None
+            scope.bindings[target.id] = Binding(
+                "value", f"{scope.id}.{target.id}", value
+            )
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for item in target.elts:
+                self.bindTarget(scope, item, None)
+        elif isinstance(target, ast.Starred):
+            self.bindTarget(scope, target.value, None)
+
+    def starNames(self, scope: Scope):
+        """Names imported by star imports of internal modules."""
+
+        result: dict[str, str] = {}
+        for base in scope.stars:
+            module = self.modules.get(base)
+            if module is None or module.scope is None:
+                continue
+            names = module.scope.exports
+            if names is None:
+                names = [
+                    name for name in module.scope.bindings if not name.startswith("_")
+                ]
+            for name in names:
+                result[name] = base
+        return result
+
+    def externalObject(self, id: str) -> tuple[bool, object]:
+        """The object of the id in standard library modules, imported if not loaded, so the result does not depend on modules loaded before."""
+
+        if id in self.externals:
+            return self.externals[id]
+        result = (False, None)
+        parts = id.split(".")
+        if parts[0] in sys.stdlib_module_names and parts[0] not in UNIMPORTED_MODULES:
+            for index in range(len(parts) - 1, 0, -1):
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore")
+                        module = importlib.import_module(".".join(parts[:index]))
+                except Exception:
+                    continue
+                obj = module
+                try:
+                    for name in parts[index:]:
+                        obj = getattr(obj, name)
+                    result = (True, obj)
+                except AttributeError:
+                    pass
+                break
+        self.externals[id] = result
+        return result
+
+    def externalClass(self, id: str) -> type | None:
+        found, obj = self.externalObject(id)
+        return obj if found and inspect.isclass(obj) else None
+
+    def resolveRef(self, ref: str, seen: set[str] | None = None) -> Resolved:
+        """Resolve the dotted reference by following the bindings of internal modules and classes."""
+
+        if ref in self.modules:
+            return Resolved("module", ref)
+        seen = seen if seen is not None else set()
+        if ref in seen:
+            return Resolved("unknown", ref)
+        seen.add(ref)
+        parent, _, name = ref.rpartition(".")
+        if not parent:
+            return Resolved("external", ref)
+        return self.resolveMember(self.resolveRef(parent, seen), name, seen)
+
+    def resolveMember(self, base: Resolved, name: str, seen: set[str]) -> Resolved:
+        """Resolve the member of the resolved base."""
+
+        if base.kind == "module":
+            scope = self.modules[base.id].scope
+        elif base.kind == "class":
+            scope = self.classes.get(base.id)
+        elif base.kind == "external":
+            return Resolved("external", f"{base.id}.{name}")
+        else:
+            return Resolved("unknown", f"{base.id}.{name}")
+        if scope is None:
+            return Resolved("unknown", f"{base.id}.{name}")
+        return self.resolveName(scope, name, seen)
+
+    def resolveName(self, scope: Scope, name: str, seen: set[str]) -> Resolved:
+        key = f"{scope.id}:{name}"
+        if key in seen:
+            return Resolved("unknown", f"{scope.id}.{name}")
+        seen.add(key)
+        binding = scope.bindings.get(name)
+        if binding is None:
+            star = self.starNames(scope).get(name)
+            if star is not None:
+                return self.resolveRef(f"{star}.{name}", seen)
+            return Resolved("unknown", f"{scope.id}.{name}")
+        match binding.kind:
+            case "module":
+                return Resolved("module", binding.target)
+            case "import":
+                return self.resolveRef(binding.target, seen)
+            case "class" | "function":
+                return Resolved(binding.kind, binding.target, binding, scope)
+        if isinstance(binding.node, (ast.Name, ast.Attribute)):
+            result = self.resolveExpr(scope, binding.node, seen)
+            if result.kind in ("module", "class", "function", "external"):
+                return result
+            if result.kind == "attribute":
+                return Resolved(
+                    "attribute", binding.target, result.binding, result.scope
+                )
+        return Resolved("attribute", binding.target, binding, scope)
+
+    def resolveExpr(self, scope: Scope, node: ast.expr, seen: set[str] | None = None):
+        """Resolve the expression in the scope, with class scopes falling back to the module scope."""
+
+        seen = seen if seen is not None else set()
+        match node:
+            case ast.Name():
+                for current in (scope, scope.module.scope):
+                    if current is not None and (
+                        node.id in current.bindings
+                        or node.id in self.starNames(current)
+                    ):
+                        return self.resolveName(current, node.id, seen)
+                if hasattr(builtins, node.id):
+                    return Resolved("external", f"builtins.{node.id}")
+                return Resolved("unknown", node.id)
+            case ast.Attribute():
+                base = self.resolveExpr(scope, node.value, seen)
+                return self.resolveMember(base, node.attr, seen)
+            case ast.Subscript():
+                return self.resolveExpr(scope, node.value, seen)
+            case ast.Call():
+                return Resolved("unknown", ast.unparse(node))
+        return Resolved("unknown", "")
+
+    def valueType(self, scope: Scope, node: ast.AST | None):
+        """Type of the value like `str(type(value))`, or empty if it is not known statically."""
+
+        match node:
+            case ast.Constant():
+                return str(type(node.value))
+            case ast.UnaryOp(operand=ast.Constant()):
+                try:
+                    return str(type(ast.literal_eval(node)))
+                except ValueError:
+                    return ""
+            case ast.List() | ast.ListComp():
+                return str(list)
+            case ast.Tuple():
+                return str(tuple)
+            case ast.Dict() | ast.DictComp():
+                return str(dict)
+            case ast.Set() | ast.SetComp():
+                return str(set)
+            case ast.JoinedStr():
+                return str(str)
+            case ast.Call():
+                target = self.resolveExpr(scope, node.func)
+                if target.kind == "class":
+                    return f"<class '{target.id}'>"
+                if target.kind == "external":
+                    cls = self.externalClass(target.id)
+                    if cls is not None:
+                        return str(cls)
+        return ""
+
+    def locate(self, entry: ApiEntry, module: StaticModule, node: ast.AST, root: Path):
+        entry.location = Location(file=module.path, module=module.name)
+        if isinstance(node, ast.Module):
+            entry.location.line = 0
+            entry.src = module.source
+            entry.comments = moduleComments(module.lines)
+            return
+        start = node.lineno
+        decorators = getattr(node, "decorator_list", None)
+        if decorators:
+            start = decorators[0].lineno
+        entry.location.line = start
+        entry.src = "".join(module.lines[start - 1 : node.end_lineno])
+        entry.comments = precedingComments(module.lines, start - 1)
+
+    def addEntry(self, product: ApiDescription, entry: ApiEntry):
+        entry.name = entry.id.rsplit(".", 1)[-1]
+        if entry.id in product:
+            self.logger.debug(f"Entry {entry.id} has existed.")
+            return
+        product.addEntry(entry)  # type: ignore
+
+    def visitModule(self, module: StaticModule, product: ApiDescription, root: Path):
+        scope = module.scope
+        assert scope is not None
+        self.logger.debug(f"Module: {module.name}")
+
+        res = ModuleEntry(
+            id=module.name,
+            parent=module.name.rsplit(".", 1)[0] if "." in module.name else "",
+            annotations=dict(scope.annotations),
+        )
+        if module.tree is not None:
+            self.locate(res, module, module.tree, root)
+            res.docs = inspect.cleandoc(ast.get_docstring(module.tree) or "")
+        for base in scope.stars:
+            if base not in self.modules:
+                scope.unknown.append(f"star import from {base}")
+        if scope.unknown:
+            res.data[UNKNOWN] = ", ".join(scope.unknown)
+        self.addEntry(product, res)
+        self.visitMembers(scope, res, product, root)
+
+    def visitMembers(
+        self,
+        scope: Scope,
+        res: ModuleEntry | ClassEntry,
+        product: ApiDescription,
+        root: Path,
+    ):
+        names = list(scope.bindings)
+        names.extend(
+            name for name in self.starNames(scope) if name not in scope.bindings
+        )
+        for name in names:
+            if name in Processor.ignoredMember:
+                continue
+            try:
+                target = self.visitMember(scope, name, product, root)
+                if target:
+                    res.members[name] = target
+            except Exception as ex:
+                self.logger.error(
+                    f"Failed to extract member {scope.id}.{name}.", exc_info=ex
+                )
+
+    def visitMember(self, scope: Scope, name: str, product: ApiDescription, root: Path):
+        """Visit the member, and return the id of its target."""
+
+        id = f"{scope.id}.{name}"
+        resolved = self.resolveName(scope, name, set())
+        local = resolved.scope is scope and resolved.id == id
+        match resolved.kind:
+            case "module":
+                return resolved.id
+            case "external":
+                found, obj = self.externalObject(resolved.id)
+                # values without modules are not external for the API detector
+                if found and not (
+                    inspect.ismodule(obj)
+                    or inspect.isclass(obj)
+                    or inspect.isroutine(obj)
+                    or getattr(obj, "__module__", None)
+                ):
+                    return self.visitAttribute(
+                        scope, name, resolved, product, root, str(type(obj))
+                    ).id
+                return objectId(obj) if found else resolved.id
+            case "class":
+                if local:
+                    assert isinstance(resolved.binding.node, ast.ClassDef)  # type: ignore
+                    self.visitClass(self.classes[id], product, root)
+                return resolved.id
+            case "function":
+                if local:
+                    node = resolved.binding.node  # type: ignore
+                    assert isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    if self.isProperty(node):
+                        return self.visitProperty(scope, node, product, root).id
+                    return self.visitFunction(scope, node, product, root).id
+                return resolved.id
+            case "attribute":
+                return self.visitAttribute(scope, name, resolved, product, root).id
+        res = SpecialEntry(
+            id=id,
+            parent=scope.id,
+            kind=SpecialKind.Unknown,
+            data={UNKNOWN: f"unresolved {resolved.id}"},
+        )
+        self.addEntry(product, res)
+        return res.id
+
+    def classMro(self, id: str, working: set[str] | None = None) -> list[str]:
+        if id in self.mros:
+            return self.mros[id]
+        scope = self.classes.get(id)
+        if scope is None:
+            cls = self.externalClass(id)
+            if cls is None:
+                return [id, "builtins.object"]
+            result = [objectId(base) for base in cls.__mro__]
+            self.mros[id] = result
+            return result
+
+        working = working if working is not None else set()
+        if id in working:
+            return [id]
+        working.add(id)
+        bases = self.classBases(scope)
+        sequences = [self.classMro(base, working) for base in bases]
+        result = linearize(id, [*sequences, bases])
+        if result is None:
+            result = [id]
+            for sequence in sequences:
+                result.extend(item for item in sequence if item not in result)
+        working.discard(id)
+        self.mros[id] = result
+        return result
+
+    def classAbcs(self, mros: list[str]):
+        """ABCs of the classes in the MRO, with the standard library classes checked by `issubclass`."""
+
+        ids = set(mros)
+        classes = [cls for cls in map(self.externalClass, mros) if cls is not None]
+        return [
+            id
+            for id, item in abcTypes()
+            if id in ids or any(issubclass(cls, item) for cls in classes)
+        ]
+
+    def classBases(self, scope: Scope):
+        assert isinstance(scope.node, ast.ClassDef)
+        result = []
+        for base in scope.node.bases:
+            resolved = self.resolveExpr(scope.module.scope or scope, base)
+            if resolved.kind == "external":
+                cls = self.externalClass(resolved.id)
+                if cls is not None:
+                    result.append(objectId(cls))
+                    continue
+            result.append(resolved.id or ast.unparse(base))
+        return result or ["builtins.object"]
+
+    def isAbstract(self, scope: Scope, mros: list[str]):
+        """Whether the class has abstract methods not implemented, and ABCMeta as its metaclass."""
+
+        assert isinstance(scope.node, ast.ClassDef)
+        meta = False
+        for keyword in scope.node.keywords:
+            if keyword.arg == "metaclass":
+                resolved = self.resolveExpr(scope.module.scope or scope, keyword.value)
+                meta = resolved.id == "abc.ABCMeta"
+        decided: set[str] = set()
+        abstracts: set[str] = set()
+        for id in mros:
+            current = self.classes.get(id)
+            if current is not None:
+                for name, binding in current.bindings.items():
+                    if name in decided:
+                        continue
+                    decided.add(name)
+                    if binding.kind == "function" and any(
+                        decoratorName(item).startswith("abstract")
+                        for item in binding.node.decorator_list  # type: ignore
+                    ):
+                        abstracts.add(name)
+                continue
+            cls = self.externalClass(id)
+            if cls is None:
+                continue
+            meta = meta or isinstance(cls, abc.ABCMeta)
+            abstracts.update(
+                name
+                for name in getattr(cls, "__abstractmethods__", ())
+                if name not in decided
+            )
+            decided.update(vars(cls))
+        return meta and bool(abstracts)
+
+    def visitClass(self, scope: Scope, product: ApiDescription, root: Path):
+        node = scope.node
+        assert isinstance(node, ast.ClassDef)
+        if scope.id in product:
+            return product[scope.id]
+        self.logger.debug(f"Class: {scope.id}")
+
+        bases = self.classBases(scope)
+        mros = self.classMro(scope.id)
+        slots = self.slots(scope) or []
+        res = ClassEntry(
+            id=scope.id,
+            parent=scope.id.rsplit(".", 1)[0],
+            bases=bases,
+            abcs=self.classAbcs(mros),
+            mros=mros,
+            slots=slots,
+            abstract=self.isAbstract(scope, mros),
+            annotations=dict(scope.annotations),
+        )
+        self.locate(res, scope.module, node, root)
+        res.docs = inspect.cleandoc(ast.get_docstring(node) or "")
+
+        reasons = []
+        decorators = [decoratorName(item) for item in node.decorator_list]
+        if any(name not in CLASS_DECORATORS for name in decorators):
+            reasons.append(f"decorated by {', '.join(decorators)}")
+        if any(keyword.arg == "metaclass" for keyword in node.keywords):
+            reasons.append("metaclass")
+        external = [
+            base
+            for base in bases
+            if base not in self.classes and self.externalClass(base) is None
+        ]
+        if external:
+            reasons.append(f"external bases {', '.join(external)}")
+        if "__slots__" in scope.bindings and self.slots(scope) is None:
+            reasons.append("dynamic slots")
+        if reasons:
+            res.data[UNKNOWN] = ", ".join(reasons)
+        if any(
+            id not in self.classes
+            and id != "builtins.object"
+            and self.externalClass(id) is not None
+            for id in mros
+        ):
+            res.data[STDLIB] = STDLIB_VERSION
+        self.addEntry(product, res)
+
+        self.visitMembers(scope, res, product, root)
+        for name in slots:
+            if name in res.members or name in Processor.ignoredMember:
+                continue
+            entry = AttributeEntry(
+                id=f"{scope.id}.{name}",
+                parent=scope.id,
+                rawType="<class 'member_descriptor'>",
+                annotation=scope.annotations.get(name, ""),
+                scope=ItemScope.Instance,
+                location=res.location,
+            )
+            self.addEntry(product, entry)
+            res.members[name] = entry.id
+        return res
+
+    def slots(self, scope: Scope):
+        """Names in a literal `__slots__` of the class, or None if it is not literal."""
+
+        binding = scope.bindings.get("__slots__")
+        if binding is None:
+            return []
+        return literalStrings(binding.node)  # type: ignore
+
+    def isProperty(self, node: ast.FunctionDef | ast.AsyncFunctionDef):
+        return any(
+            decoratorName(item) in PROPERTY_DECORATORS for item in node.decorator_list
+        )
+
+    def visitProperty(
+        self,
+        scope: Scope,
+        node: ast.FunctionDef | ast.AsyncFunctionDef,
+        product: ApiDescription,
+        root: Path,
+    ):
+        id = f"{scope.id}.{node.name}"
+        cached = "cached_property" in map(decoratorName, node.decorator_list)
+        res = AttributeEntry(
+            id=id,
+            parent=scope.id,
+            rawType="<class 'functools.cached_property'>" if cached else str(property),
+            annotation=ast.unparse(node.returns) if node.returns else "",
+            property=not cached,
+        )
+        self.locate(res, scope.module, node, root)
+        res.src = ""
+        res.comments = ""
+        self.addEntry(product, res)
+        return res
+
+    def visitAttribute(
+        self,
+        scope: Scope,
+        name: str,
+        resolved: Resolved,
+        product: ApiDescription,
+        root: Path,
+        rawType: str = "",
+    ):
+        id = f"{scope.id}.{name}"
+        if id in product:
+            return product[id]
+        self.logger.debug(f"Attribute: {id}")
+
+        value = resolved.binding.node if resolved.binding else None
+        rawType = rawType or self.valueType(resolved.scope or scope, value)
+        if (
+            isinstance(scope.node, ast.ClassDef)
+            and "enum.Enum" in self.classMro(scope.id)
+            and not name.startswith("_")
+        ):
+            rawType = f"<enum '{scope.id.rsplit(".", 1)[-1]}'>"
+        res = AttributeEntry(
+            id=id,
+            parent=scope.id,
+            rawType=rawType,
+            annotation=scope.annotations.get(name, ""),
+        )
+        if scope.module.file is not None:
+            res.location = Location(
+                file=scope.module.path,
+                module=scope.module.name,
+            )
+            if value is not None:
+                res.location.line = value.lineno  # type: ignore
+        if not rawType:
+            res.data[UNKNOWN] = "value"
+        if isinstance(scope.node, ast.ClassDef) and name in (self.slots(scope) or []):
+            res.scope = ItemScope.Instance
+        self.addEntry(product, res)
+        return res
+
+    def visitFunction(
+        self,
+        scope: Scope,
+        node: ast.FunctionDef | ast.AsyncFunctionDef,
+        product: ApiDescription,
+        root: Path,
+    ):
+        id = f"{scope.id}.{node.name}"
+        if id in product:
+            return product[id]
+        self.logger.debug(f"Function: {id}")
+
+        decorators = [decoratorName(item) for item in node.decorator_list]
+        res = FunctionEntry(
+            id=id,
+            parent=scope.id,
+            coroutine=isinstance(node, ast.AsyncFunctionDef) and not isGenerator(node),
+            abstract="abstractmethod" in decorators,
+            override="override" in decorators,
+        )
+        self.locate(res, scope.module, node, root)
+        res.docs = inspect.cleandoc(ast.get_docstring(node) or "")
+        res.parameters = self.parameters(node.args, id)
+        if node.returns:
+            res.returnAnnotation = ast.unparse(node.returns)
+        res.annotations = {
+            item.name: item.annotation for item in res.parameters if item.annotation
+        }
+        if res.returnAnnotation:
+            res.annotations["return"] = res.returnAnnotation
+
+        if isinstance(scope.node, ast.ClassDef):
+            if "classmethod" in decorators or node.name == "__class_getitem__":
+                # bound to the class, so the first parameter is not in the signature
+                res.scope = ItemScope.Class
+                res.parameters = res.parameters[1:]
+            elif "staticmethod" not in decorators and node.name != "__new__":
+                if res.parameters and res.parameters[0].name == "self":
+                    res.scope = ItemScope.Instance
+        unknowns = [name for name in decorators if name not in FUNCTION_DECORATORS]
+        if unknowns:
+            res.data[UNKNOWN] = f"decorated by {', '.join(unknowns)}"
+        self.addEntry(product, res)
+        return res
+
+    def parameters(self, args: ast.arguments, source: str):
+        result: list[Parameter] = []
+
+        def add(arg: ast.arg, kind: ParameterKind, default: ast.expr | None = None):
+            para = Parameter(name=arg.arg, kind=kind, source=source)
+            if arg.annotation is not None:
+                para.annotation = ast.unparse(arg.annotation)
+            if default is not None:
+                para.optional = True
+                para.default = literalDefault(default)
+            result.append(para)
+
+        positionals = [*args.posonlyargs, *args.args]
+        defaults = [None] * (len(positionals) - len(args.defaults)) + list(
+            args.defaults
+        )
+        for index, (arg, default) in enumerate(zip(positionals, defaults)):
+            add(
+                arg,
+                (
+                    ParameterKind.Positional
+                    if index < len(args.posonlyargs)
+                    else ParameterKind.PositionalOrKeyword
+                ),
+                default,
+            )
+        if args.vararg:
+            add(args.vararg, ParameterKind.VarPositional)
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+            add(arg, ParameterKind.Keyword, default)
+        if args.kwarg:
+            add(args.kwarg, ParameterKind.VarKeyword)
+        return result
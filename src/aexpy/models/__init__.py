@@ -97,6 +97,11 @@ class PairProduct(Product, ABC):
         return super().overview().replace("overview", f"{self.pair()}", 1)
 
 
+class SourceFile(BaseModel):
+    size: int = 0
+    hash: str = ""
+
+
 class Distribution(SingleProduct):
     release: Release = Release()
     wheelFile: Path | None = None
@@ -109,6 +114,8 @@ class Distribution(SingleProduct):
     metadata: list[tuple[str, str]] = []
     description: str = ""
     dependencies: list[str] = []
+    files: dict[str, SourceFile] = {}
+    """Source files under the top-level modules, by POSIX path relative to the root path."""
 
     @override
     def overview(self):
@@ -132,6 +139,49 @@ class Distribution(SingleProduct):
         assert self.rootPath is not None
         return [self.rootPath / item for item in self.topModules]
 
+    def changedFiles(self, other: "Distribution"):
+        """Source files added, removed or modified compared to the other distribution."""
+
+        return sorted(
+            file
+            for file in self.files.keys() | other.files.keys()
+            if self.files.get(file) != other.files.get(file)
+        )
+
+    def changedModules(self, other: "Distribution"):
+        """Names of modules whose source files changed compared to the other distribution."""
+
+        result = set()
+        for file in self.changedFiles(other):
+            parts = file.removesuffix(".py").split("/")
+            if parts[-1] == "__init__":
+                parts.pop()
+            if parts:
+                result.add(".".join(parts))
+        return sorted(result)
+
+
+class StageProfile(BaseModel):
+    wall: float = 0
+    """Wall time in seconds."""
+    cpu: float = 0
+    """CPU time in seconds."""
+    rss: int = 0
+    """Resident set size delta in bytes."""
+    memory: int | None = None
+    """Traced memory delta in bytes, if tracemalloc is tracing."""
+
+
+class ModuleProfile(BaseModel):
+    """Costs of a module in the extractor, excluding nested modules visited in it."""
+
+    importing: StageProfile | None = None
+    visiting: StageProfile | None = None
+
+    @property
+    def wall(self):
+        return sum(stage.wall for stage in (self.importing, self.visiting) if stage)
+
 
 class ApiDescription(SingleProduct):
     distribution: Distribution = Distribution()
@@ -142,6 +192,9 @@ class ApiDescription(SingleProduct):
     attributes: dict[str, AttributeEntry] = {}
     specials: dict[str, SpecialEntry] = {}
 
+    profiles: dict[str, ModuleProfile] = {}
+    """Extraction profiles by module name."""
+
     def __contains__(self, id: str):
         return (
             id in self.modules
@@ -186,8 +239,29 @@ class ApiDescription(SingleProduct):
     Classes: {len(self.classes)}
     Functions: {len(self.functions)}
     Attributes: {len(self.attributes)}"""
+            + self.profileOverview()
         )
 
+    def profileOverview(self, count: int = 10):
+        if not self.profiles:
+            return ""
+        result = f"\n  🐢 Slowest modules (of {len(self.profiles)})"
+        slowest = sorted(self.profiles.items(), key=lambda x: x[1].wall, reverse=True)
+        for name, profile in slowest[:count]:
+            stages = []
+            for stage, item in (
+                ("import", profile.importing),
+                ("visit", profile.visiting),
+            ):
+                if item is None:
+                    continue
+                text = f"{stage} {item.wall:.3f}s (CPU {item.cpu:.3f}s, RSS {item.rss / 1024 / 1024:+.1f}MB"
+                if item.memory is not None:
+                    text += f", traced {item.memory / 1024 / 1024:+.1f}MB"
+                stages.append(text + ")")
+            result += f"\n    {name}: {', '.join(stages)}"
+        return result
+
     @override
     def single(self):
         assert self.distribution is not None
@@ -1,9 +1,167 @@
-from . import Preprocessor
+import hashlib
+import mmap
+import os
+import sqlite3
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from logging import Logger
+from pathlib import Path
 from typing import override
+
+from .. import getCacheDirectory, utils
+from ..models import SourceFile
 from ..utils import topLevelModules
+from . import Preprocessor
+
+COUNTER_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+COUNT_CHUNK = 1 << 20
+
+
+@dataclass
+class SourceStat:
+    size: int
+    lines: int
+    hash: str
+
+
+def countLines(data: bytes | mmap.mmap):
+    """Count lines by newlines, including a last line without a trailing newline."""
+
+    lines = sum(
+        data[i : i + COUNT_CHUNK].count(b"\n") for i in range(0, len(data), COUNT_CHUNK)
+    )
+    if len(data) > 0 and data[-1:] != b"\n":
+        lines += 1
+    return lines
+
+
+def hashSource(data: bytes | mmap.mmap):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def statSource(path: Path) -> SourceStat:
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return SourceStat(0, 0, hashSource(b""))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return SourceStat(size, countLines(data), hashSource(data))
+
+
+class SourceStatCache:
+    """SQLite cache of source statistics, keyed by absolute path, size and mtime."""
+
+    def __init__(self, file: Path | None = None):
+        self.file = file or (getCacheDirectory() / "sources.db")
+        utils.ensureDirectory(self.file.parent)
+        self.db = sqlite3.connect(self.file, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, lines INTEGER, hash TEXT)"
+        )
+
+    def get(self, path: str, size: int, mtime: int) -> SourceStat | None:
+        row = self.db.execute(
+            "SELECT lines, hash FROM sources WHERE path = ? AND size = ? AND mtime = ?",
+            (path, size, mtime),
+        ).fetchone()
+        return SourceStat(size, row[0], row[1]) if row else None
+
+    def put(self, items: list[tuple[str, int, SourceStat]]):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                [
+                    (path, stat.size, mtime, stat.lines, stat.hash)
+                    for path, mtime, stat in items
+                ],
+            )
+
+    def close(self):
+        self.db.close()
 
 
 class FileCounterPreprocessor(Preprocessor):
+    """Count Python files, their size and lines of code over all top-level modules.
+
+    Files are counted in parallel, and results are cached by path, size and mtime."""
+
+    def __init__(
+        self,
+        logger: Logger | None = None,
+        cache: SourceStatCache | None = None,
+        workers: int = COUNTER_WORKERS,
+    ):
+        super().__init__(logger)
+        self.cache = cache
+        self.workers = workers
+
+    def sources(self, product) -> list[Path]:
+        files: list[Path] = []
+        for src in product.src:
+            if src.is_dir():
+                files.extend(src.glob("**/*.py"))
+            elif src.with_suffix(".py").is_file():
+                files.append(src.with_suffix(".py"))
+        return files
+
+    def stats(self, files: list[Path]) -> dict[Path, SourceStat]:
+        cache = self.cache
+        if cache is None:
+            try:
+                cache = SourceStatCache()
+            except Exception as ex:
+                self.logger.warning(
+                    "Failed to open source statistics cache.", exc_info=ex
+                )
+
+        result: dict[Path, SourceStat] = {}
+        missing: list[tuple[Path, int]] = []
+        for file in files:
+            try:
+                stat = file.stat()
+            except Exception as ex:
+                self.logger.error(f"Failed to stat file {file}.", exc_info=ex)
+                continue
+            cached = (
+                cache.get(str(file.resolve()), stat.st_size, stat.st_mtime_ns)
+                if cache
+                else None
+            )
+            if cached:
+                result[file] = cached
+            else:
+                missing.append((file, stat.st_mtime_ns))
+
+        self.logger.info(f"Count {len(missing)} files, {len(result)} cached.")
+
+        def count(file: Path):
+            try:
+                return statSource(file)
+            except Exception as ex:
+                self.logger.error(f"Failed to count file {file}.", exc_info=ex)
+                return None
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            counted = list(pool.map(count, [file for file, _ in missing]))
+
+        updates = []
+        for (file, mtime), stat in zip(missing, counted):
+            if stat is not None:
+                result[file] = stat
+                updates.append((str(file.resolve()), mtime, stat))
+
+        if cache:
+            try:
+                cache.put(updates)
+            except Exception as ex:
+                self.logger.warning(
+                    "Failed to update source statistics cache.", exc_info=ex
+                )
+            if cache is not self.cache:
+                cache.close()
+        return result
+
     @override
     def preprocess(self, product):
         assert product.rootPath, "No root path provided."
@@ -11,14 +169,46 @@ class FileCounterPreprocessor(Preprocessor):
         if not product.topModules:
             product.topModules = list(topLevelModules(product.rootPath))
 
-        for src in product.src:
-            pyfiles = list(src.glob("**/*.py"))
-            product.fileCount = len(pyfiles)
-            product.fileSize = 0
-            product.locCount = 0
-            for item in pyfiles:
+        if product.rootPath.is_file():
+            self.countWheel(product)
+            return
+
+        stats = self.stats(self.sources(product))
+        product.fileCount = len(stats)
+        product.fileSize = sum(stat.size for stat in stats.values())
+        product.locCount = sum(stat.lines for stat in stats.values())
+        product.files = {
+            file.relative_to(product.rootPath).as_posix(): SourceFile(
+                size=stat.size, hash=stat.hash
+            )
+            for file, stat in sorted(stats.items())
+        }
+
+    def countWheel(self, product):
+        """Count Python files in a mounted wheel without extracting it."""
+
+        assert product.rootPath
+        prefixes = tuple(f"{item}/" for item in product.topModules)
+        files = {f"{item}.py" for item in product.topModules}
+        product.fileCount = 0
+        product.fileSize = 0
+        product.locCount = 0
+        product.files = {}
+        with zipfile.ZipFile(product.rootPath) as f:
+            for info in f.infolist():
+                if not (
+                    info.filename.startswith(prefixes) or info.filename in files
+                ) or not info.filename.endswith(".py"):
+                    continue
                 try:
-                    product.fileSize += item.stat().st_size
-                    product.locCount += len(item.read_text().splitlines())
+                    data = f.read(info)
+                    product.fileCount += 1
+                    product.fileSize += info.file_size
+                    product.locCount += countLines(data)
+                    product.files[info.filename] = SourceFile(
+                        size=info.file_size, hash=hashSource(data)
+                    )
                 except Exception as ex:
-                    self.logger.error(f"Failed to stat file {item}.", exc_info=ex)
+                    self.logger.error(
+                        f"Failed to read file {info.filename}.", exc_info=ex
+                    )
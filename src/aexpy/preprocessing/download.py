@@ -1,22 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import logging
 import platform
+import re
+import tempfile
+import threading
 from dataclasses import dataclass, field
+from email.parser import Parser
 from logging import Logger
 from pathlib import Path
-from typing import override
+from typing import Callable, override
 from urllib import parse
-import urllib.request
 import os
 import subprocess
+import zipfile
 
 from ..models import Release
-from .wheel import CompatibilityTag
+from .wheel import CompatibilityTag, DistInfo, applyDistInfo
 from . import Preprocessor, PYVERSION_UPPER, PYVERSION_LOWER
 from .. import getCacheDirectory, utils
-from .pypi import INDEX_ORIGIN, INDEX_TSINGHUA, FILE_ORIGIN, FILE_TSINGHUA, getReleases
+from .store import WheelStore, placeFile
+from .pypi import INDEX_ORIGIN, INDEX_TSINGHUA, PypiClient, RangeFile, getClient
 
 PYVERSIONS = [f"3.{i}" for i in range(PYVERSION_UPPER, PYVERSION_LOWER - 1, -1)]
+PROBE_WORKERS = 4
+
+
+def runCancellable(
+    args: list[str], cwd: Path, cancelled: threading.Event
+) -> subprocess.CompletedProcess[str]:
+    """Run a subprocess, and kill it once the cancelled event is set."""
+
+    with subprocess.Popen(
+        args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    ) as proc:
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancelled.is_set():
+                    proc.kill()
+                    stdout, stderr = proc.communicate()
+                    break
+    return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+
+
+def probePyversions[T](
+    pyversions: list[str],
+    probe: Callable[[str, threading.Event], T],
+    workers: int = PROBE_WORKERS,
+    logger: Logger | None = None,
+) -> tuple[T, str]:
+    """Run the probe for all Python versions concurrently, and return the result of the first (most preferred) succeeded version.
+
+    Probes for less preferred versions are cancelled once the result is decided."""
+
+    logger = logger or logging.getLogger("pre-probe")
+    cancelled = threading.Event()
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(workers, len(pyversions))),
+        thread_name_prefix="pre-probe",
+    ) as executor:
+        futures = [(v, executor.submit(probe, v, cancelled)) for v in pyversions]
+        try:
+            for pyversion, future in futures:
+                try:
+                    return future.result(), pyversion
+                except Exception as ex:
+                    logger.error(
+                        f"Failed to probe for Python {pyversion}.", exc_info=ex
+                    )
+        finally:
+            cancelled.set()
+            for _, future in futures:
+                future.cancel()
+
+    raise Exception(f"Failed to probe for Python {', '.join(pyversions)}.")
 
 
 def wheelByPip(
@@ -25,12 +86,15 @@ def wheelByPip(
     pyversions: list[str] | None = None,
     logger: Logger | None = None,
     mirror: bool = False,
+    workers: int = PROBE_WORKERS,
+    onUnavailable: Callable[[str], None] | None = None,
 ) -> tuple[Path, str]:
     logger = logger or logging.getLogger("pre-download-pip")
     index = INDEX_TSINGHUA if mirror else INDEX_ORIGIN
-    pyversions = pyversions or PYVERSIONS
+    # keep the preferred order, and probe each version only once
+    pyversions = list(dict.fromkeys(pyversions or PYVERSIONS))
 
-    def glob(suffix: str):
+    def glob(suffix: str, path: Path = path):
         prefix = f"{release.project}-{release.version}".lower()
         prefix2 = f"{release.project.replace('-', '_')}-{release.version}".lower()
 
@@ -47,110 +111,81 @@ def wheelByPip(
             (i for i in path.glob(f"*{suffix}") if check(i.name.removesuffix(suffix)))
         )
 
-    for item in glob(".whl"):
-        logger.warning(f"Remove downloaded {item}.")
-        os.remove(item)
-
-    for pyversion in pyversions:
-        logger.info(f"Download wheel distribution for Python {pyversion}.")
-        try:
-            subres = subprocess.run(
-                [
-                    "pip",
-                    "download",
-                    "--python-version",
-                    pyversion,
-                    f"{release.project}=={release.version}",
-                    "--no-deps",
-                    "--only-binary",
-                    ":all:",
-                    "-i",
-                    index,
-                ],
-                cwd=path,
-                capture_output=True,
-                text=True,
-            )
-            logger.info(
-                f"Inner pip download wheel for Python {pyversion} exit with {subres.returncode}."
-            )
-            if subres.stdout.strip():
-                logger.debug(f"STDOUT:\n{subres.stdout}")
-            if subres.stderr.strip():
-                logger.info(f"STDERR:\n{subres.stderr}")
+    def download(kind: str, suffix: str, option: str):
+        # each probe downloads into its own directory to avoid conflicts
+        with tempfile.TemporaryDirectory(prefix=".probe-", dir=path) as probeDir:
+
+            def probe(pyversion: str, cancelled: threading.Event):
+                if cancelled.is_set():
+                    raise Exception(f"Cancelled to download for Python {pyversion}.")
+
+                workdir = Path(probeDir) / pyversion
+                utils.ensureDirectory(workdir)
+                logger.info(f"Download {kind} for Python {pyversion}.")
+                subres = runCancellable(
+                    [
+                        "pip",
+                        "download",
+                        "--python-version",
+                        pyversion,
+                        f"{release.project}=={release.version}",
+                        "--no-deps",
+                        option,
+                        ":all:",
+                        "-i",
+                        index,
+                    ],
+                    workdir,
+                    cancelled,
+                )
+                utils.logProcessResult(logger, subres)
+                if (
+                    subres.returncode != 0
+                    and onUnavailable
+                    and "No matching distribution found" in subres.stderr
+                ):
+                    onUnavailable(pyversion)
+                subres.check_returncode()
 
-            subres.check_returncode()
+                files = glob(suffix, workdir)
+                assert len(files) > 0
+                return files[0]
 
-            files = glob(".whl")
-            assert len(files) > 0
-            return files[0].resolve(), pyversion
-        except Exception as ex:
-            logger.error(
-                f"Failed to download for Python {pyversion} wheel for {release}",
-                exc_info=ex,
+            file, pyversion = probePyversions(
+                pyversions, probe, workers=workers, logger=logger
             )
+            target = path / file.name
+            os.replace(file, target)
+            return target, pyversion
 
-    for item in glob(".tar.gz"):
-        logger.info(f"Remove downloaded {item}.")
-        os.remove(item)
+    try:
+        wheelFile, pyversion = download("wheel distribution", ".whl", "--only-binary")
+        return wheelFile.resolve(), pyversion
+    except Exception as ex:
+        logger.error(f"Failed to download wheel for {release}", exc_info=ex)
 
-    for pyversion in PYVERSIONS:
-        logger.info(f"Download source distribution for Python {pyversion}.")
-        try:
-            subres = subprocess.run(
-                [
-                    "pip",
-                    "download",
-                    "--python-version",
-                    pyversion,
-                    f"{release.project}=={release.version}",
-                    "--no-deps",
-                    "--no-binary",
-                    ":all:",
-                    "-i",
-                    index,
-                ],
-                cwd=path,
-                capture_output=True,
-                text=True,
-            )
-            logger.info(
-                f"Inner pip download sdist for Python {pyversion} exit with {subres.returncode}."
-            )
-            if subres.stdout.strip():
-                logger.debug(f"STDOUT:\n{subres.stdout}")
-            if subres.stderr.strip():
-                logger.info(f"STDERR:\n{subres.stderr}")
-
-            subres.check_returncode()
+    try:
+        sdistFile, pyversion = download("source distribution", ".tar.gz", "--no-binary")
 
-            files = glob(".tar.gz")
-            assert len(files) > 0
-
-            logger.info(f"Build wheel distribution for Python {pyversion}: {files[0]}.")
+        logger.info(f"Build wheel distribution for Python {pyversion}: {sdistFile}.")
+        with tempfile.TemporaryDirectory(prefix=".build-", dir=path) as buildDir:
             subres = subprocess.run(
-                f"pip wheel {release.project}=={release.version} --no-deps -i {index}",
+                ["pip", "wheel", str(sdistFile), "--no-deps", "-w", buildDir],
                 cwd=path,
                 capture_output=True,
                 text=True,
             )
-            logger.info(f"Inner pip wheel {files[0]} exit with {subres.returncode}.")
-            if subres.stdout.strip():
-                logger.debug(f"STDOUT:\n{subres.stdout}")
-            if subres.stderr.strip():
-                logger.info(f"STDERR:\n{subres.stderr}")
-
+            utils.logProcessResult(logger, subres)
             subres.check_returncode()
 
-            files = glob(".whl")
+            files = glob(".whl", Path(buildDir))
             assert len(files) > 0
+            wheelFile = path / files[0].name
+            os.replace(files[0], wheelFile)
 
-            return files[0].resolve(), pyversion
-        except Exception as ex:
-            logger.error(
-                f"Failed to download source dist for Python {pyversion} for {release}",
-                exc_info=ex,
-            )
+        return wheelFile.resolve(), pyversion
+    except Exception as ex:
+        logger.error(f"Failed to download source dist for {release}", exc_info=ex)
 
     raise Exception(f"Failed to download wheel for {release}.")
 
@@ -160,6 +195,9 @@ class DownloadInfo:
     url: str
     sha256: str = ""
     md5: str = ""
+    metadata: bool = False
+    """Whether the index serves the core metadata file (PEP 658)."""
+    metadataSha256: str = ""
     name: str = field(init=False)
 
     def __post_init__(self):
@@ -167,134 +205,334 @@ class DownloadInfo:
 
 
 def wheelByHttp(
-    release: Release, path: Path, logger: Logger | None, mirror: bool = False
-) -> Path:
+    release: Release,
+    path: Path,
+    pyversions: list[str] | None = None,
+    logger: Logger | None = None,
+    client: PypiClient | None = None,
+) -> tuple[Path, str]:
     logger = logger or logging.getLogger("pre-download-http")
+    client = client or getClient()
+    pyversions = list(dict.fromkeys(pyversions or PYVERSIONS))
 
-    rels = getReleases(release.project)
-    if rels is None or release.version not in rels:
-        rels = getReleases(release.project)
-    if rels is None or release.version not in rels:
+    releases = client.project(release.project)["releases"]
+    if release.version not in releases:
         raise Exception(f"Not found the release {release}")
-    download = getDownloadInfo(rels[release.version])
-    if download is None:
+    result = getDownloadInfo(releases[release.version], pyversions)
+    if result is None:
         raise Exception(f"Not found the valid distribution {release}")
-    return downloadRawWheel(download, path, logger, mirror)
+    download, pyversion = result
+    return downloadRawWheel(download, path, logger, client), pyversion
+
+
+def isPlatformCompatible(tag: CompatibilityTag):
+    if "any" in tag.platform:
+        return True
+    if "windows" in platform.platform().lower():
+        return any(
+            (
+                platform
+                for platform in tag.platform
+                if "win" in platform and "amd64" in platform
+            )
+        )
+    return any(
+        (
+            platform
+            for platform in tag.platform
+            if "linux" in platform
+            and "x86_64" in platform
+            and "musllinux" not in platform
+        )
+    )
+
+
+def getPythonRank(tag: CompatibilityTag, pyversion: str) -> int | None:
+    """Rank how specific the tag matches the Python version (lower is better), or None if incompatible."""
+
+    # https://www.python.org/dev/peps/pep-0425/#compressed-tag-sets
+    minor = int(pyversion.split(".")[1])
+    abis = set(tag.abi.split("."))
+    ranks = []
+    for python in tag.python.split("."):
+        if python == f"cp3{minor}":
+            if abis & {f"cp3{minor}", f"cp3{minor}m", "abi3", "none"}:
+                ranks.append(0)
+        elif python.startswith("cp3") and python[3:].isdigit():
+            if int(python[3:]) <= minor and "abi3" in abis:
+                ranks.append(1)
+        elif python.startswith("py3") and python[3:].isdigit():
+            if int(python[3:]) <= minor:
+                ranks.append(2)
+        elif python == "py3":
+            ranks.append(3)
+    return min(ranks) if ranks else None
+
+
+def matchRequiresPython(requires: str | None, pyversion: str):
+    """Check the Python version against a requires-python specifier, assuming matched if failing to parse."""
+
+    if not requires:
+        return True
+    version = tuple(int(x) for x in pyversion.split("."))
+    try:
+        for clause in requires.split(","):
+            clause = clause.strip()
+            if not clause:
+                continue
+            op, spec = re.fullmatch(r"(~=|==|!=|<=|>=|<|>)\s*(\S+)", clause).groups()
+            if spec.endswith(".*"):
+                prefix = tuple(int(x) for x in spec.removesuffix(".*").split("."))
+                matched = (version + (0,) * len(prefix))[: len(prefix)] == prefix
+                if op == "==" and not matched or op == "!=" and matched:
+                    return False
+                continue
+            target = tuple(int(x) for x in spec.split("."))
+            length = max(len(version), len(target))
+            current = version + (0,) * (length - len(version))
+            target = target + (0,) * (length - len(target))
+            if op == "~=":
+                # only compare the major and minor part of Python versions
+                if current[:2] < target[:2]:
+                    return False
+            elif not {
+                "==": current == target,
+                "!=": current != target,
+                "<=": current <= target,
+                ">=": current >= target,
+                "<": current < target,
+                ">": current > target,
+            }[op]:
+                return False
+    except Exception:
+        return True
+    return True
 
 
 def getDownloadInfo(
-    release: list[dict], packagetype="bdist_wheel"
-) -> DownloadInfo | None:
-    py3 = []
+    release: list[dict], pyversions: list[str] | None = None
+) -> tuple[DownloadInfo, str] | None:
+    """Select the most specific wheel for the most preferred Python version."""
+
+    candidates = []
 
     for item in release:
-        if item["packagetype"] != packagetype:
+        if item["packagetype"] != "bdist_wheel":
             continue
+        tag = CompatibilityTag.fromfile(item["filename"]) or CompatibilityTag()
+        if isPlatformCompatible(tag):
+            candidates.append((item, tag))
+
+    for pyversion in pyversions or PYVERSIONS:
+        ranked = []
+        for item, tag in candidates:
+            rank = getPythonRank(tag, pyversion)
+            if rank is not None and matchRequiresPython(
+                item.get("requires_python"), pyversion
+            ):
+                ranked.append((rank, item))
+        if ranked:
+            result = min(ranked, key=lambda x: x[0])[1]
+            metadata = result.get("core-metadata") or result.get(
+                "data-dist-info-metadata"
+            )
+            ret = DownloadInfo(
+                result["url"],
+                result["digests"].get("sha256", ""),
+                result["digests"].get("md5", ""),
+                metadata=bool(metadata),
+                metadataSha256=(
+                    metadata.get("sha256", "") if isinstance(metadata, dict) else ""
+                ),
+            )
+            return ret, pyversion
 
-        # https://www.python.org/dev/peps/pep-0425/#compressed-tag-sets
+    return None
 
-        tag = CompatibilityTag.fromfile(item["filename"]) or CompatibilityTag()
-        if "py3" not in tag.python:
-            if "cp3" not in tag.python:
-                continue
-        if "any" not in tag.platform:
-            if "windows" in platform.platform().lower():
-                if not any(
-                    (
-                        platform
-                        for platform in tag.platform
-                        if "win" in platform and "amd64" in platform
-                    )
-                ):
-                    continue
-            else:
-                if not any(
-                    (
-                        platform
-                        for platform in tag.platform
-                        if "linux" in platform and "x86_64" in platform
-                    )
-                ):
-                    continue
 
-        py3.append((item, tag))
+def downloadRawWheel(
+    info: DownloadInfo, path: Path, logger: Logger, client: PypiClient | None = None
+) -> Path:
+    cacheFile = path / info.name
+    client = client or getClient()
+
+    if not cacheFile.exists():
+        logger.info(f"Download wheel @ {info.url}.")
+        try:
+            client.download(info.url, cacheFile, sha256=info.sha256, md5=info.md5)
+        except Exception as ex:
+            logger.error(f"Not found wheel {info.url}.", exc_info=ex)
+            raise Exception(f"Not found download: {info.url}.")
+
+    return cacheFile.resolve()
 
-    supportedPy = []
-    for item, tag in py3:
-        for i in range(PYVERSION_UPPER, PYVERSION_LOWER - 1, -1):
-            if f"py3{i}" in tag.python or f"cp3{i}" in tag.python:
-                supportedPy.append(item)
-                break
 
-    result = None
+def fetchDistInfo(
+    info: DownloadInfo,
+    project: str,
+    logger: Logger,
+    client: PypiClient | None = None,
+) -> DistInfo | None:
+    """Load dist-info of a remote wheel without downloading it.
 
-    if len(supportedPy) > 0:
-        result = supportedPy[0]
+    METADATA comes from the PEP 658 metadata file if the index serves it, and other files are read by HTTP range requests.
+    """
 
-    if len(py3) > 0:
-        result = py3[0][0]
+    client = client or getClient()
 
-    if result:
-        ret = DownloadInfo(
-            result["url"],
-            result["digests"].get("sha256", ""),
-            result["digests"].get("md5", ""),
+    metadata = None
+    if info.metadata:
+        try:
+            content = client.get(client.fileUrl(f"{info.url}.metadata"))
+            if (
+                info.metadataSha256
+                and hashlib.sha256(content).hexdigest() != info.metadataSha256
+            ):
+                raise Exception(f"Metadata sha256 mismatch: {info.url}.metadata")
+            metadata = content.decode()
+        except Exception as ex:
+            logger.warning(
+                f"Failed to fetch metadata file for {info.url}.", exc_info=ex
+            )
+
+    try:
+        with RangeFile(client, info.url) as file:
+            with zipfile.ZipFile(file) as f:
+                result = DistInfo.fromzip(f, project, metadata)
+            logger.info(
+                f"Read dist-info of {info.url} ({file.size} bytes) by {file.requests} range requests."
+            )
+            return result
+    except Exception as ex:
+        if metadata is None:
+            raise
+        logger.warning(
+            f"Failed to read {info.url} by range requests, use metadata file only.",
+            exc_info=ex,
         )
-        return ret
 
-    return None
+    tag = CompatibilityTag.fromfile(info.name) or CompatibilityTag()
+    wheel = "".join(
+        f"Tag: {python}-{abi}-{plat}\n"
+        for python in tag.python.split(".")
+        for abi in tag.abi.split(".")
+        for plat in tag.platform
+    )
+    return DistInfo(
+        metadata=Parser().parsestr(metadata),
+        topLevel=[],
+        wheel=Parser().parsestr(wheel),
+    )
 
 
-def downloadRawWheel(
-    info: DownloadInfo, path: Path, logger: Logger, mirror: bool = False
-) -> Path:
-    cacheFile = path / info.name
+class WheelMetadataFetchPreprocessor(Preprocessor):
+    """Load dist-info of the release wheel from the index, without downloading and unpacking the wheel."""
 
-    if mirror:
-        url = info.url.replace(FILE_ORIGIN, FILE_TSINGHUA)
-    else:
-        url = info.url
+    def __init__(
+        self,
+        mirror: bool = False,
+        logger: Logger | None = None,
+        client: PypiClient | None = None,
+        offline: bool = False,
+    ):
+        super().__init__(logger)
+        self.client = client or PypiClient(
+            mirror=mirror, logger=self.logger, offline=offline
+        )
 
-    if not cacheFile.exists():
-        logger.info(f"Download wheel @ {url}.")
-        try:
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=60) as res:
-                content = res.read()
-            if info.sha256:
-                if hashlib.sha256(content).hexdigest() != info.sha256:
-                    raise Exception(f"Release download sha256 mismatch: {info}.")
-
-            if info.md5:
-                if hashlib.md5(content).hexdigest() != info.md5:
-                    raise Exception(f"Release download md5 mismatch: {info}.")
-
-            with open(cacheFile, "wb") as file:
-                file.write(content)
-        except Exception as ex:
-            logger.error(f"Not found wheel {url}.", exc_info=ex)
-            raise Exception(f"Not found download: {url}.")
+    @override
+    def preprocess(self, product):
+        if product.pyversion:
+            pyversions = list(dict.fromkeys([product.pyversion] + PYVERSIONS))
+        else:
+            pyversions = PYVERSIONS
+
+        releases = self.client.project(product.release.project)["releases"]
+        assert (
+            product.release.version in releases
+        ), f"Not found the release {product.release}"
+        result = getDownloadInfo(releases[product.release.version], pyversions)
+        assert result, f"Not found the valid distribution {product.release}"
+        info, pyversion = result
+
+        self.logger.info(f"Fetch dist-info of {info.name} for Python {pyversion}.")
+        distInfo = fetchDistInfo(
+            info, product.release.project, self.logger, self.client
+        )
+        assert distInfo, f"Not found dist-info in {info.name}"
+
+        # no sources are fetched, so there is no root path to extract
+        product.rootPath = None
+        product.pyversion = pyversion
+        applyDistInfo(product, distInfo)
 
-    return cacheFile.resolve()
 
+class WheelDownloadPreprocessor(Preprocessor):
+    """Download the release wheel, from the wheel store, PyPI, or pip for source distributions."""
 
-class PipWheelDownloadPreprocessor(Preprocessor):
     def __init__(
-        self, cacheDir: Path | None, mirror: bool = False, logger: Logger | None = None
+        self,
+        cacheDir: Path | None,
+        mirror: bool = False,
+        logger: Logger | None = None,
+        store: WheelStore | None = None,
+        client: PypiClient | None = None,
+        offline: bool = False,
     ):
         super().__init__(logger)
         self.mirror = mirror
+        self.offline = offline
         self.cacheDir = cacheDir or getCacheDirectory()
+        self.store = store or WheelStore(logger=self.logger)
+        self.client = client or PypiClient(
+            mirror=mirror, logger=self.logger, offline=offline
+        )
         utils.ensureDirectory(self.cacheDir)
 
+    def download(self, release: Release, pyversions: list[str]):
+        try:
+            wheelFile, pyversion = wheelByHttp(
+                release,
+                self.cacheDir,
+                pyversions,
+                logger=self.logger,
+                client=self.client,
+            )
+            # the index has no compatible wheel for more preferred versions
+            for item in pyversions[: pyversions.index(pyversion)]:
+                self.store.markUnavailable(release, item)
+            return wheelFile, pyversion
+        except Exception as ex:
+            if self.offline:
+                raise Exception(
+                    f"Failed to find stored wheel for {release} in offline mode."
+                ) from ex
+            self.logger.error(
+                f"Failed to download wheel for {release} from index, fallback to pip.",
+                exc_info=ex,
+            )
+        return wheelByPip(
+            release,
+            self.cacheDir,
+            pyversions,
+            logger=self.logger,
+            mirror=self.mirror,
+            onUnavailable=lambda v: self.store.markUnavailable(release, v),
+        )
+
     @override
     def preprocess(self, product):
         if product.pyversion:
-            pyversions = [product.pyversion] + PYVERSIONS
+            pyversions = list(dict.fromkeys([product.pyversion] + PYVERSIONS))
         else:
-            pyversions = None
-        wheelFile, pyversion = wheelByPip(
-            product.release, self.cacheDir, pyversions, logger=self.logger
-        )
+            pyversions = PYVERSIONS
+
+        stored = self.store.find(product.release, pyversions, offline=self.offline)
+        if stored:
+            storedFile, pyversion = stored
+            wheelFile = placeFile(storedFile, self.cacheDir / storedFile.name)
+        else:
+            wheelFile, pyversion = self.download(product.release, pyversions)
+            self.store.add(product.release, pyversion, wheelFile)
         product.pyversion = pyversion
-        product.wheelFile = wheelFile
+        product.wheelFile = wheelFile.resolve()
@@ -1,37 +1,459 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import http.client
+import io
 import json
-import urllib.request
+import logging
+import os
 import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from logging import Logger
+from pathlib import Path
+from typing import Any
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from .. import getCacheDirectory, runOffline, utils
 
 FILE_ORIGIN = "https://files.pythonhosted.org/"
 FILE_TSINGHUA = "https://pypi.tuna.tsinghua.edu.cn/"
 INDEX_ORIGIN = "https://pypi.org/simple/"
 INDEX_TSINGHUA = "https://pypi.tuna.tsinghua.edu.cn/simple/"
+JSON_ORIGIN = "https://pypi.org/pypi/"
 
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+METADATA_TTL = 60 * 60
+RANGE_BLOCK = 1 << 16
+MEMORY_BUDGET = 32 << 20
+MEMORY_ITEM = 4 << 20
 
-def getIndex(mirror: bool = False):
-    req = urllib.request.Request(INDEX_TSINGHUA if mirror else INDEX_ORIGIN)
-    with urllib.request.urlopen(req, timeout=60) as res:
-        htmlContent = res.read().decode("utf-8")
 
-    regex = r'<a href="[\w:/\.]*">([\S\s]*?)</a>'
-    return re.findall(regex, htmlContent)
+class ConnectionPool:
+    """Pool of keep-alive HTTP connections, grouped by scheme, host and port."""
+
+    def __init__(self, timeout: float = 60, size: int = 8):
+        self.timeout = timeout
+        self.size = size
+        """Maximum idle connections kept for each host."""
+        self.lock = threading.Lock()
+        self.idle: dict[
+            tuple[str, str, int | None], list[http.client.HTTPConnection]
+        ] = {}
+
+    def acquire(self, key: tuple[str, str, int | None]):
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                return conns.pop()
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def release(
+        self, key: tuple[str, str, int | None], conn: http.client.HTTPConnection
+    ):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.size:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle.clear()
+
+    @contextmanager
+    def open(self, url: str, headers: dict[str, str] | None = None, redirects: int = 5):
+        """Send a GET request, and provide the response to read.
+
+        The connection returns to the pool if the response body has been fully read."""
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname or "", parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        for retry in range(2):
+            conn = self.acquire(key)
+            try:
+                conn.request("GET", path, headers=headers or {})
+                res = conn.getresponse()
+                break
+            except (
+                http.client.RemoteDisconnected,
+                http.client.CannotSendRequest,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                # the idle connection may have been closed by the server
+                conn.close()
+                if retry:
+                    raise
+        else:
+            raise AssertionError("Unreachable")
+
+        location = None
+        try:
+            if res.status in REDIRECT_STATUS and redirects > 0:
+                location = res.getheader("Location")
+                res.read()
+            if not location:
+                if res.status >= 400:
+                    raise HTTPError(url, res.status, res.reason, res.headers, None)
+                yield res
+        finally:
+            if not res.isclosed() or res.will_close:
+                conn.close()
+            else:
+                self.release(key, conn)
+
+        if location:
+            with self.open(urljoin(url, location), headers, redirects - 1) as res:
+                yield res
+
+
+class MemoryCache[T]:
+    """Least recently used items in memory, bounded by total size in bytes.
+
+    Items larger than the limit are not kept."""
+
+    def __init__(self, budget: int = MEMORY_BUDGET, limit: int = MEMORY_ITEM):
+        self.budget = budget
+        self.limit = limit
+        self.size = 0
+        self.lock = threading.Lock()
+        self.items: OrderedDict[str, tuple[int, T]] = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key: str) -> T | None:
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            self.items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, value: T, size: int):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= old[0]
+            if size > self.limit:
+                return
+            self.items[key] = (size, value)
+            self.size += size
+            while self.size > self.budget:
+                _, (evicted, _) = self.items.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    time: float
+    etag: str = ""
+    lastModified: str = ""
+
+
+class MetadataCache:
+    """On-disk cache for index responses, with a bounded in-memory layer."""
+
+    def __init__(self, root: Path | None = None, memory: MemoryCache | None = None):
+        self.root = root or (getCacheDirectory() / "pypi")
+        self.memory: MemoryCache[CachedResponse] = (
+            MemoryCache() if memory is None else memory
+        )
+
+    def path(self, url: str):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.root / key[:2] / key
+
+    def load(self, url: str) -> CachedResponse | None:
+        entry = self.memory.get(url)
+        if entry is not None:
+            return entry
+        try:
+            with self.path(url).open("rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except Exception:
+            return None
+        if header.get("url") != url:
+            return None
+        entry = CachedResponse(
+            body, header["time"], header["etag"], header["lastModified"]
+        )
+        self.memory.put(url, entry, len(body))
+        return entry
+
+    def save(self, url: str, body: bytes, etag: str = "", lastModified: str = ""):
+        entry = CachedResponse(body, time.time(), etag, lastModified)
+        header = {
+            "url": url,
+            "time": entry.time,
+            "etag": etag,
+            "lastModified": lastModified,
+        }
+        file = self.path(url)
+        utils.ensureDirectory(file.parent)
+        with tempfile.NamedTemporaryFile(
+            dir=file.parent, suffix=".tmp", delete=False
+        ) as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(body)
+        os.replace(f.name, file)
+        self.memory.put(url, entry, len(body))
+        return entry
+
+
+class PypiClient:
+    """In-process client for PyPI JSON and simple API, reusing connections.
+
+    Responses are cached, and revalidated by ETag and Last-Modified after the TTL (in seconds).
+    In offline mode, only cached responses are served."""
+
+    def __init__(
+        self,
+        mirror: bool = False,
+        timeout: float = 60,
+        logger: Logger | None = None,
+        cache: MetadataCache | None = None,
+        ttl: float = METADATA_TTL,
+        offline: bool = False,
+    ):
+        self.mirror = mirror
+        self.pool = ConnectionPool(timeout=timeout)
+        self.logger = logger or logging.getLogger("pypi")
+        self.cache = cache or MetadataCache()
+        self.ttl = ttl
+        self.offline = offline
+        self.parsed: MemoryCache[tuple[bytes, Any]] = MemoryCache()
+        """Parsed JSON of response bodies, bounded by the size of bodies."""
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> bytes:
+        cached = self.cache.load(url)
+        if cached is not None:
+            if self.offline or time.time() - cached.time < self.ttl:
+                return cached.body
+        if self.offline:
+            raise Exception(f"No cached response for {url} in offline mode.")
+
+        headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.lastModified:
+                headers["If-Modified-Since"] = cached.lastModified
+
+        with self.pool.open(url, headers) as res:
+            body = res.read()
+            if res.status == 304 and cached is not None:
+                self.logger.debug(f"Revalidated cached response for {url}.")
+                return self.cache.save(
+                    url, cached.body, cached.etag, cached.lastModified
+                ).body
+            return self.cache.save(
+                url,
+                body,
+                res.getheader("ETag") or "",
+                res.getheader("Last-Modified") or "",
+            ).body
+
+    def getJson(self, url: str):
+        body = self.get(url, {"Accept": "application/json"})
+        parsed = self.parsed.get(url)
+        if parsed is not None and parsed[0] is body:
+            return parsed[1]
+        data = json.loads(body)
+        self.parsed.put(url, (body, data), len(body))
+        return data
+
+    def index(self) -> list[str]:
+        htmlContent = self.get(INDEX_TSINGHUA if self.mirror else INDEX_ORIGIN).decode(
+            "utf-8"
+        )
+        regex = r'<a href="[\w:/\.]*">([\S\s]*?)</a>'
+        return re.findall(regex, htmlContent)
+
+    def project(self, project: str) -> dict:
+        url = f"{JSON_ORIGIN}{project}/json"
+        data = self.getJson(url)
+        # file URLs may be relative to the JSON URL on some mirrors
+        for files in data.get("releases", {}).values():
+            for file in files:
+                file["url"] = urljoin(url, file["url"])
+        return data
+
+    def release(self, project: str, version: str) -> dict:
+        return self.getJson(f"{JSON_ORIGIN}{project}/{version}/json")
+
+    def fileUrl(self, url: str):
+        return url.replace(FILE_ORIGIN, FILE_TSINGHUA) if self.mirror else url
+
+    def download(self, url: str, target: Path, sha256: str = "", md5: str = ""):
+        """Stream the file to target while hashing it, and check the digests."""
+
+        url = self.fileUrl(url)
+        if self.offline:
+            raise Exception(f"Cannot download {url} in offline mode.")
+        self.logger.info(f"Download {url} to {target}.")
+        expected = {"sha256": sha256, "md5": md5}
+        hashers = {name: hashlib.new(name) for name, v in expected.items() if v}
+        with tempfile.NamedTemporaryFile(
+            dir=target.parent, prefix=f".{target.name}", suffix=".part", delete=False
+        ) as f:
+            temp = Path(f.name)
+            try:
+                with self.pool.open(url) as res:
+                    for chunk in iter(lambda: res.read(1 << 16), b""):
+                        for hasher in hashers.values():
+                            hasher.update(chunk)
+                        f.write(chunk)
+            except:
+                f.close()
+                temp.unlink(missing_ok=True)
+                raise
+
+        for name, hasher in hashers.items():
+            if expected[name] and hasher.hexdigest() != expected[name]:
+                temp.unlink(missing_ok=True)
+                raise Exception(
+                    f"Download {name} mismatch: {url}, expected {expected[name]}, got {hasher.hexdigest()}."
+                )
+
+        os.replace(temp, target)
+        return target
+
+    def range(self, url: str, start: int, end: int | None = None) -> tuple[bytes, int]:
+        """Read bytes in [start, end) of the file, or the last -start bytes if start is negative, and return them with the file size."""
+
+        url = self.fileUrl(url)
+        if self.offline:
+            raise Exception(f"Cannot read {url} in offline mode.")
+        if start < 0:
+            spec = f"bytes={start}"
+        elif end is None:
+            spec = f"bytes={start}-"
+        else:
+            spec = f"bytes={start}-{end - 1}"
+        with self.pool.open(url, {"Range": spec}) as res:
+            if res.status != 206:
+                raise Exception(f"Range requests are not supported by {url}.")
+            match = re.fullmatch(
+                r"bytes (\d+)-(\d+)/(\d+)", res.getheader("Content-Range") or ""
+            )
+            if match is None:
+                raise Exception(f"Invalid content range from {url}.")
+            return res.read(), int(match.group(3))
+
+
+class RangeFile(io.RawIOBase):
+    """Read-only seekable file over HTTP range requests, to read parts of a remote archive.
+
+    Fetched blocks are kept, and the file tail is prefetched since zip archives keep their directory at the end.
+    """
+
+    def __init__(self, client: PypiClient, url: str, blockSize: int = RANGE_BLOCK):
+        super().__init__()
+        self.client = client
+        self.url = url
+        self.blockSize = blockSize
+        tail, self.size = client.range(url, -blockSize)
+        self.chunks: list[tuple[int, bytes]] = [(self.size - len(tail), tail)]
+        self.position = 0
+        self.requests = 1
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self.position = max(0, self.position)
+        return self.position
+
+    def fetch(self, start: int, size: int):
+        for chunkStart, chunk in self.chunks:
+            if chunkStart <= start and start + size <= chunkStart + len(chunk):
+                return chunk[start - chunkStart : start - chunkStart + size]
+        end = min(self.size, start + max(size, self.blockSize))
+        data, _ = self.client.range(self.url, start, end)
+        self.requests += 1
+        self.chunks.append((start, data))
+        return data[:size]
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.size - self.position)
+        if size <= 0:
+            return 0
+        data = self.fetch(self.position, size)
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+_client: PypiClient | None = None
+
+
+def getClient():
+    global _client
+    if _client is None:
+        _client = PypiClient(offline=runOffline())
+    return _client
+
+
+def getIndex(mirror: bool = False):
+    if mirror:
+        return PypiClient(mirror=True, offline=getClient().offline).index()
+    return getClient().index()
 
 
 def getReleases(project: str) -> dict | None:
+    """Get releases of the project, or None if the project is not found."""
+
     try:
-        req = urllib.request.Request(f"https://pypi.org/pypi/{project}/json")
-        with urllib.request.urlopen(req, timeout=60) as res:
-            text = res.read().decode("utf-8")
-        return json.loads(text)["release"]
-    except:
-        return None
+        return getClient().project(project)["releases"]
+    except HTTPError as ex:
+        if ex.code == 404:
+            return None
+        raise
+
 
+def getReleaseInfo(project: str, version: str) -> dict | None:
+    """Get information of the release, or None if the release is not found."""
 
-def getReleaseInfo(self, project: str, version: str) -> dict | None:
     try:
-        req = urllib.request.Request(f"https://pypi.org/pypi/{project}/{version}/json")
-        with urllib.request.urlopen(req, timeout=60) as res:
-            text = res.read().decode("utf-8")
-        return json.loads(text)["info"]
-    except:
-        return None
+        return getClient().release(project, version)["info"]
+    except HTTPError as ex:
+        if ex.code == 404:
+            return None
+        raise
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from logging import Logger
+from pathlib import Path
+
+from .. import getCacheDirectory, utils
+from ..models import Release
+from .pypi import METADATA_TTL
+from .wheel import CompatibilityTag
+
+DEFAULT_STORE_BUDGET = 10 * 1024**3
+
+
+def normalizeProject(project: str):
+    # https://peps.python.org/pep-0503/#normalized-names
+    return re.sub(r"[-_.]+", "-", project).lower()
+
+
+def hashFile(path: Path):
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def placeFile(source: Path, target: Path):
+    """Place the file to target by hard link, or copy when linking is unavailable."""
+
+    utils.ensureDirectory(target.parent)
+    with tempfile.TemporaryDirectory(dir=target.parent) as tmpdir:
+        temp = Path(tmpdir) / target.name
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copyfile(source, temp)
+        os.replace(temp, target)
+    return target
+
+
+class WheelStore:
+    """Content-addressed store for downloaded artifacts.
+
+    Artifacts are stored by their sha256 under `objects`, and indexed by project, version and Python version under `index`.
+    Least recently used artifacts are evicted when the store exceeds its size budget.
+    Records of unavailable artifacts expire after the TTL (in seconds), as the index may publish them later.
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        budget: int = DEFAULT_STORE_BUDGET,
+        logger: Logger | None = None,
+        ttl: float = METADATA_TTL,
+    ):
+        self.root = root or (getCacheDirectory() / "wheels")
+        self.budget = budget
+        self.ttl = ttl
+        self.logger = logger or logging.getLogger("wheel-store")
+        utils.ensureDirectory(self.root)
+
+    def indexFile(self, release: Release, pyversion: str):
+        return (
+            self.root
+            / "index"
+            / normalizeProject(release.project)
+            / release.version
+            / f"{pyversion}.json"
+        )
+
+    def objectFile(self, sha256: str, filename: str):
+        return self.root / "objects" / sha256[:2] / sha256 / filename
+
+    def record(self, release: Release, pyversion: str) -> dict | None:
+        try:
+            return json.loads(self.indexFile(release, pyversion).read_text())
+        except Exception:
+            return None
+
+    def write(self, release: Release, pyversion: str, data: dict):
+        file = self.indexFile(release, pyversion)
+        utils.ensureDirectory(file.parent)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=file.parent, suffix=".tmp", delete=False
+        ) as f:
+            f.write(json.dumps(data))
+        os.replace(f.name, file)
+
+    def find(
+        self, release: Release, pyversions: list[str], offline: bool = False
+    ) -> tuple[Path, str] | None:
+        """Find the stored artifact for the most preferred Python version.
+
+        Returns None if any more preferred version is unknown to the store, or only expired as unavailable, since it may have a better artifact.
+        In offline mode, records never expire.
+        """
+
+        for pyversion in pyversions:
+            data = self.record(release, pyversion)
+            if data is None:
+                return None
+            if data.get("unavailable"):
+                if not offline and time.time() - data.get("time", 0) >= self.ttl:
+                    self.logger.info(
+                        f"Unavailable record for {release} ({pyversion}) has expired."
+                    )
+                    return None
+                continue
+            file = self.objectFile(data["sha256"], data["filename"])
+            if not file.is_file():
+                self.logger.info(f"Stored artifact {file} has been evicted.")
+                return None
+            # refresh the access time for LRU eviction
+            os.utime(file)
+            self.logger.info(
+                f"Found stored artifact for {release} ({pyversion}): {file}"
+            )
+            return file, pyversion
+        return None
+
+    def add(self, release: Release, pyversion: str, file: Path):
+        """Add an artifact for the release and the Python version, and return the stored file."""
+
+        sha256 = hashFile(file)
+        target = self.objectFile(sha256, file.name)
+        if not target.is_file():
+            placeFile(file, target)
+        tag = CompatibilityTag.fromfile(file.name) or CompatibilityTag()
+        self.write(
+            release,
+            pyversion,
+            {
+                "filename": file.name,
+                "sha256": sha256,
+                "tag": f"{tag.python}-{tag.abi}-{'.'.join(tag.platform)}",
+            },
+        )
+        self.logger.info(f"Stored artifact for {release} ({pyversion}): {target}")
+        self.evict()
+        return target
+
+    def markUnavailable(self, release: Release, pyversion: str):
+        """Record that the release has no artifact for the Python version."""
+
+        self.write(release, pyversion, {"unavailable": True, "time": time.time()})
+
+    def evict(self):
+        """Remove least recently used artifacts until the store fits the size budget."""
+
+        objects = self.root / "objects"
+        if not objects.is_dir():
+            return
+        files = []
+        total = 0
+        for file in objects.glob("*/*/*"):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+            total += stat.st_size
+        files.sort()
+        for _, size, file in files:
+            if total <= self.budget:
+                break
+            self.logger.info(f"Evict stored artifact {file}.")
+            shutil.rmtree(file.parent, ignore_errors=True)
+            total -= size
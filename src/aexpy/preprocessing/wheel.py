@@ -1,5 +1,11 @@
+import hashlib
+import json
+import os
 import shutil
-from typing import override
+import tempfile
+import time
+from fnmatch import fnmatch
+from typing import IO, Literal, override
 import zipfile
 from dataclasses import dataclass, field
 from email.message import Message
@@ -8,6 +14,7 @@ from logging import Logger
 from pathlib import Path
 
 from aexpy import getCacheDirectory, utils
+from ..models import Distribution
 from . import PYVERSION_LOWER, PYVERSION_UPPER, Preprocessor
 
 FILE_ORIGIN = "https://files.pythonhosted.org/"
@@ -15,6 +22,11 @@ FILE_TSINGHUA = "https://pypi.tuna.tsinghua.edu.cn/"
 INDEX_ORIGIN = "https://pypi.org/simple/"
 INDEX_TSINGHUA = "https://pypi.tuna.tsinghua.edu.cn/simple/"
 
+type UnpackMode = Literal["full", "sources", "mount"]
+"""How a wheel is made available: fully extracted, only Python sources extracted, or read in place."""
+
+SOURCE_SUFFIXES = (".py", ".pyi")
+
 
 def readPackageInfo(path: Path):
     return Parser().parsestr(path.read_text())
@@ -87,6 +99,8 @@ class DistInfo:
 
     @classmethod
     def fromdir(cls, path: Path, project: str = ""):
+        if path.is_file():
+            return cls.fromwheel(path, project)
         distinfoDir = list(path.glob(f"{project.replace('-', '_')}*.dist-info"))
         if len(distinfoDir) == 0:
             return None
@@ -108,17 +122,160 @@ class DistInfo:
         except:
             return None
 
+    @classmethod
+    def fromwheel(cls, wheelFile: Path | IO[bytes], project: str = ""):
+        """Load dist-info from the wheel file in place, or from a seekable file object."""
+
+        with zipfile.ZipFile(wheelFile) as f:
+            return cls.fromzip(f, project)
+
+    @classmethod
+    def fromzip(
+        cls, f: zipfile.ZipFile, project: str = "", metadata: str | None = None
+    ):
+        """Load dist-info from the opened wheel, reading only the dist-info members.
+
+        Use the given METADATA content (e.g. from PEP 658) if provided.
+        Top-level modules are derived from the file list if top_level.txt is missing."""
+
+        pattern = f"{project.replace('-', '_')}*.dist-info"
+        names = f.namelist()
+        nameSet = set(names)
+        distinfoDir = sorted(
+            {
+                name.split("/", 1)[0]
+                for name in names
+                if "/" in name and fnmatch(name.split("/", 1)[0], pattern)
+            }
+        )
+        if len(distinfoDir) == 0:
+            return None
+        distinfoDir = distinfoDir[0]
+        try:
+            if metadata is None:
+                metadata = f.read(f"{distinfoDir}/METADATA").decode()
+            tp = f"{distinfoDir}/top_level.txt"
+
+            if tp in nameSet:
+                toplevel = [
+                    s.strip() for s in f.read(tp).decode().splitlines() if s.strip()
+                ]
+            else:
+                toplevel = topLevelFromNames(names)
+
+            return DistInfo(
+                metadata=Parser().parsestr(metadata),
+                topLevel=toplevel,
+                wheel=Parser().parsestr(f.read(f"{distinfoDir}/WHEEL").decode()),
+            )
+        except:
+            return None
+
+
+def topLevelFromNames(names: list[str]):
+    """Derive top-level module names from the file list of a wheel."""
 
-def unpackWheel(wheelFile: Path, targetDir: Path):
+    result = set()
+    for name in names:
+        top, sep, rest = name.partition("/")
+        if top.endswith((".dist-info", ".data")):
+            continue
+        if sep:
+            if rest.endswith(".py"):
+                result.add(top)
+        elif top.endswith(".py"):
+            result.add(top.removesuffix(".py"))
+        elif top.endswith((".so", ".pyd")):
+            result.add(top.split(".", 1)[0])
+    return sorted(item for item in result if item.isidentifier() and item != "__main__")
+
+
+def isSourceMember(name: str):
+    """Whether the wheel member is a Python source, a stub, a type marker or in dist-info."""
+
+    return (
+        name.split("/", 1)[0].endswith(".dist-info")
+        or name.endswith(SOURCE_SUFFIXES)
+        or name == "py.typed"
+        or name.endswith("/py.typed")
+    )
+
+
+def unpackWheel(wheelFile: Path, targetDir: Path, mode: UnpackMode = "full"):
     utils.ensureDirectory(targetDir)
     with zipfile.ZipFile(wheelFile) as f:
-        f.extractall(targetDir)
+        if mode == "sources":
+            f.extractall(
+                targetDir,
+                members=[
+                    info for info in f.infolist() if isSourceMember(info.filename)
+                ],
+            )
+        else:
+            f.extractall(targetDir)
+
+
+def hashWheel(wheelFile: Path):
+    with wheelFile.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+MANIFEST_NAME = ".aexpy-manifest.json"
+
+
+def scanTree(path: Path) -> dict[str, list[int]]:
+    """Collect size and mtime (in ns) of each file in the tree, by relative path.
+
+    Bytecode written by imports from the tree and the manifest itself are skipped."""
+
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(path):
+        if "__pycache__" in dirnames:
+            dirnames.remove("__pycache__")
+        for filename in filenames:
+            if filename.endswith(".pyc") or filename == MANIFEST_NAME:
+                continue
+            file = Path(dirpath) / filename
+            stat = file.stat()
+            result[file.relative_to(path).as_posix()] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+            ]
+    return result
+
+
+def manifestFile(targetDir: Path):
+    return targetDir / MANIFEST_NAME
+
+
+def verifyUnpacked(targetDir: Path, sha256: str, mode: UnpackMode):
+    """Whether the unpacked tree is intact and matches its manifest for the wheel."""
+
+    try:
+        manifest = json.loads(manifestFile(targetDir).read_text())
+        if manifest["sha256"] != sha256 or manifest["mode"] != mode:
+            return False
+        return targetDir.is_dir() and scanTree(targetDir) == manifest["files"]
+    except Exception:
+        return False
 
 
 class WheelUnpackPreprocessor(Preprocessor):
-    def __init__(self, cacheDir: Path | None, logger: Logger | None = None):
+    """Unpack the wheel file as the root path.
+
+    In `sources` mode, only Python sources, stubs and dist-info are extracted.
+    In `mount` mode, nothing is extracted, and the wheel file itself becomes the root path, which is importable by zipimport.
+    Extension modules cannot be imported in both modes."""
+
+    def __init__(
+        self,
+        cacheDir: Path | None,
+        logger: Logger | None = None,
+        mode: UnpackMode = "full",
+    ):
         super().__init__(logger)
         self.cacheDir = cacheDir or getCacheDirectory()
+        self.mode = mode
         utils.ensureDirectory(self.cacheDir)
 
     @override
@@ -127,16 +284,96 @@ class WheelUnpackPreprocessor(Preprocessor):
             product.wheelFile and product.wheelFile.exists()
         ), "No wheel file provided."
 
+        if self.mode == "mount":
+            self.logger.info(f"Mount {product.wheelFile} without unpacking")
+            product.rootPath = product.wheelFile
+            return
+
         targetDir = self.cacheDir / product.wheelFile.stem
-        if targetDir.exists():
-            self.logger.warning(f"Remove unpacked directory {targetDir}")
-            shutil.rmtree(targetDir)
+        sha256 = hashWheel(product.wheelFile)
+        if verifyUnpacked(targetDir, sha256, self.mode):
+            self.logger.info(f"Reuse unpacked directory {targetDir}")
+            product.rootPath = targetDir
+            return
 
-        self.logger.info(f"Unpacking {product.wheelFile} to {targetDir}")
-        unpackWheel(product.wheelFile, targetDir)
+        self.logger.info(f"Unpacking {product.wheelFile} to {targetDir} ({self.mode})")
+        self.unpack(product.wheelFile, targetDir, sha256)
         self.logger.info(f"Unpacked {product.wheelFile} to {targetDir}")
         product.rootPath = targetDir
 
+    def unpack(self, wheelFile: Path, targetDir: Path, sha256: str):
+        """Unpack to a temporary directory, and swap it in by renaming, so that concurrent workers never see a partial tree."""
+
+        tempDir = Path(
+            tempfile.mkdtemp(prefix=f".{targetDir.name}.", dir=self.cacheDir)
+        )
+        try:
+            unpackWheel(wheelFile, tempDir, self.mode)
+            manifest = {"sha256": sha256, "mode": self.mode, "files": scanTree(tempDir)}
+            # the manifest is in the tree, so both are placed by one rename
+            manifestFile(tempDir).write_text(json.dumps(manifest))
+
+            for _ in range(3):
+                if verifyUnpacked(targetDir, sha256, self.mode):
+                    # another worker has placed the same tree in the meantime
+                    self.logger.info(
+                        f"Use directory unpacked by another worker {targetDir}"
+                    )
+                    return
+                staleDir = None
+                if targetDir.exists():
+                    self.logger.warning(f"Replace stale unpacked directory {targetDir}")
+                    staleDir = Path(
+                        tempfile.mkdtemp(
+                            prefix=f".{targetDir.name}.", dir=self.cacheDir
+                        )
+                    )
+                    try:
+                        os.replace(targetDir, staleDir / "stale")
+                    except FileNotFoundError:
+                        pass
+                try:
+                    os.rename(tempDir, targetDir)
+                except OSError:
+                    time.sleep(0.1)
+                    continue
+                else:
+                    return
+                finally:
+                    if staleDir is not None:
+                        shutil.rmtree(staleDir, ignore_errors=True)
+            raise Exception(f"Failed to place unpacked directory {targetDir}.")
+        finally:
+            if tempDir.exists():
+                shutil.rmtree(tempDir, ignore_errors=True)
+
+
+def applyDistInfo(product: Distribution, distInfo: DistInfo):
+    """Fill the distribution with the release, Python version, modules, dependencies and metadata in dist-info."""
+
+    if distInfo.pyversion:
+        if not product.pyversion:
+            product.pyversion = distInfo.pyversion
+    if distInfo.name:
+        if product.release.project:
+            assert (
+                product.release.project == distInfo.name
+            ), "Different name between release and dist-info."
+        else:
+            product.release.project = distInfo.name
+    if distInfo.version:
+        if product.release.version:
+            assert (
+                product.release.version == distInfo.version
+            ), "Different version between release and dist-info."
+        else:
+            product.release.version = distInfo.version
+    product.topModules.extend(distInfo.topLevel)
+    product.dependencies.extend(distInfo.dependencies)
+    if distInfo.metadata:
+        product.description = str(distInfo.metadata.get_payload())
+        product.metadata = [(x, str(y)) for x, y in distInfo.metadata.items()]
+
 
 class WheelMetadataPreprocessor(Preprocessor):
     @override
@@ -152,25 +389,4 @@ class WheelMetadataPreprocessor(Preprocessor):
         self.logger.info(f"Loaded dist-info from {product.rootPath}: {distInfo}")
 
         if distInfo:
-            if distInfo.pyversion:
-                if not product.pyversion:
-                    product.pyversion = distInfo.pyversion
-            if distInfo.name:
-                if product.release.project:
-                    assert (
-                        product.release.project == distInfo.name
-                    ), "Different name between release and dist-info."
-                else:
-                    product.release.project = distInfo.name
-            if distInfo.version:
-                if product.release.version:
-                    assert (
-                        product.release.version == distInfo.version
-                    ), "Different version between release and dist-info."
-                else:
-                    product.release.version = distInfo.version
-            product.topModules.extend(distInfo.topLevel)
-            product.dependencies.extend(distInfo.dependencies)
-            if distInfo.metadata:
-                product.description = str(distInfo.metadata.get_payload())
-                product.metadata = [(x, str(y)) for x, y in distInfo.metadata.items()]
+            applyDistInfo(product, distInfo)
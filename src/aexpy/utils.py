@@ -5,10 +5,18 @@ import pathlib
 from contextlib import contextmanager
 from datetime import timedelta
 import pkgutil
+import shutil
+import time
 from subprocess import CompletedProcess
 from timeit import default_timer
 from typing import IO
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 
 def isFunction(obj):
     return (
@@ -110,6 +118,69 @@ def ensureFile(path: pathlib.Path, content: str | None = None):
     path.write_text(content)
 
 
+def linkTree(source: pathlib.Path, target: pathlib.Path):
+    """Copy the directory tree by hard links for files, falling back to copying."""
+
+    def link(src: str, dst: str):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    shutil.copytree(source, target, symlinks=True, copy_function=link)
+
+
+def tryLockFile(fd: int):
+    """Take the exclusive lock on the open file without blocking, and return whether it is taken."""
+
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def fileLock(path: pathlib.Path, timeout: float = 3600):
+    """Provide an inter-process exclusive lock by locking the open lock file.
+
+    The lock is held by the open file, and released by the system once the holder exits, even if it crashes,
+    so a lock is never broken while its holder is alive, however long it holds the lock.
+    Lock files are kept after release, and a lock file removed by others is opened again.
+    """
+
+    ensureDirectory(path.parent)
+    start = default_timer()
+    while True:
+        fd = os.open(path, os.O_CREAT | os.O_RDWR)
+        try:
+            if tryLockFile(fd):
+                try:
+                    same = os.stat(path).st_ino == os.fstat(fd).st_ino
+                except FileNotFoundError:
+                    same = False
+                if same:
+                    break
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+        if default_timer() - start >= timeout:
+            raise TimeoutError(f"Timeout to acquire lock {path}.")
+        time.sleep(0.1)
+    try:
+        # the holder, only for diagnosis
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
 @contextmanager
 def elapsedTimer():
     """Provide a context with a timer."""
@@ -0,0 +1,101 @@
+import io
+import re
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class Index:
+    """Routes and request log of a local stand-in for the package index and file host."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.routes: dict[str, bytes] = {}
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.connections = 0
+        self.ranges = True
+        """Whether range requests are served with partial content."""
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.index.connections += 1  # type: ignore
+
+    def do_GET(self):
+        index: Index = self.server.index  # type: ignore
+        index.requests.append((self.path, dict(self.headers)))
+        body = index.routes.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+
+        status = 200
+        headers = {}
+        spec = self.headers.get("Range")
+        if spec and index.ranges:
+            start, end = re.fullmatch(r"bytes=(\d*)-(\d*)", spec).groups()
+            size = len(body)
+            if not start:
+                first, last = max(0, size - int(end)), size - 1
+            else:
+                first, last = int(start), min(size - 1, int(end or size - 1))
+            body = body[first : last + 1]
+            status = 206
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+
+        if self.path.endswith("/"):
+            headers["Content-Type"] = "text/html"
+        elif self.path.endswith("/json"):
+            headers["Content-Type"] = "application/json"
+        else:
+            headers["Content-Type"] = "application/octet-stream"
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def index():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IndexHandler)
+    server.index = Index(f"http://127.0.0.1:{server.server_port}/")  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.index  # type: ignore
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def makeWheel(project: str, version: str, padding: int = 0):
+    """Wheel of a pure Python package, with an uncompressed padding file to make it larger."""
+
+    distInfo = f"{project}-{version}.dist-info"
+    files = {
+        f"{project}/__init__.py": "VALUE = 1\n",
+        f"{project}/padding.txt": "\n" * padding,
+        f"{distInfo}/METADATA": f"Metadata-Version: 2.1\nName: {project}\nVersion: {version}\nRequires-Dist: click\n",
+        f"{distInfo}/WHEEL": "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        f"{distInfo}/top_level.txt": f"{project}\n",
+        f"{distInfo}/RECORD": "",
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as f:
+        for name, content in files.items():
+            f.writestr(name, content)
+    return buffer.getvalue()
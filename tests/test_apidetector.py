@@ -0,0 +1,129 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from aexpy.models import Distribution
+
+SRC = pathlib.Path(__file__).parent.parent / "src"
+
+PACKAGE = {
+    "__init__.py": """
+from .core import Base, helper
+from .shapes import Shape, area
+
+__all__ = ["Shape", "area", "helper"]
+""",
+    "core/__init__.py": """
+__all__ = ["Base"]
+
+
+def helper(value):
+    return value
+
+
+def run(self, value):
+    return value
+
+
+class Base:
+    def method(self):
+        pass
+
+    @classmethod
+    def create(cls):
+        return cls()
+
+    @staticmethod
+    def check(value):
+        return value
+""",
+    "core/tools.py": """
+import pkghelpers
+
+from . import Base, helper
+
+__all__ = ["Tool"]
+
+
+class Tool(Base):
+    apply = helper
+""",
+    "shapes/__init__.py": """
+from ..core import Base, run
+
+__all__ = ["Shape", "area"]
+
+
+def area(shape):
+    return 0
+
+
+class Shape(Base):
+    run = run
+    build = Base.create
+""",
+    "shapes/extra.py": """
+import pkghelpers
+
+from ..core import helper
+from ..core.tools import Tool
+
+__all__ = []
+
+
+class Square(Tool):
+    pass
+""",
+    "plugins.py": """
+def load():
+    pass
+""",
+}
+
+# a top-level module reached from several subtrees, without a dotted id
+HELPERS = """
+def assist():
+    pass
+"""
+
+
+def extract(root: pathlib.Path, *options: str):
+    dist = Distribution(rootPath=root, topModules=["pkg"], pyversion="3.12")
+    res = subprocess.run(
+        [sys.executable, "-m", "aexpy.apidetector", "--payload", "minimal", *options],
+        input=dist.model_dump_json(),
+        capture_output=True,
+        text=True,
+        cwd=root,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+    )
+    assert res.returncode == 0, res.stderr
+    entries = {}
+    for line in res.stdout.split("AEXPY_TRANSFER_BEGIN", 1)[1].splitlines():
+        kind, _, data = line.partition("\t")
+        if kind == "entry":
+            entry = json.loads(data)
+            entries[entry["id"]] = entry
+    return entries
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="workers need fork")
+def test_workers_match_serial(tmp_path: pathlib.Path):
+    for name, content in PACKAGE.items():
+        file = tmp_path / "pkg" / name
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(content)
+    (tmp_path / "pkghelpers.py").write_text(HELPERS)
+
+    serial = extract(tmp_path)
+    assert serial["pkg.core.run"]["scope"] == serial["pkg.core.Base.method"]["scope"]
+    assert serial["pkg.core.Base.create"]["scope"] != serial["pkg.core.helper"]["scope"]
+    assert serial["pkghelpers"]["parent"] == "pkg.core.tools"
+    assert "pkg.plugins" in serial["pkg"]["members"].values()
+
+    for workers in ("2", "4"):
+        assert extract(tmp_path, "--workers", workers) == serial
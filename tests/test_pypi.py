@@ -0,0 +1,293 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pytest
+
+from aexpy.models import Distribution, Release
+from aexpy.preprocessing import download, pypi
+from aexpy.preprocessing.download import (
+    PYVERSIONS,
+    WheelDownloadPreprocessor,
+    WheelMetadataFetchPreprocessor,
+)
+from aexpy.preprocessing.pypi import MemoryCache, MetadataCache, PypiClient
+from aexpy.preprocessing.store import WheelStore
+
+from conftest import Index, makeWheel
+
+WHEEL_NAME = "demo-1.0-py3-none-any.whl"
+
+
+@pytest.fixture
+def wheel(index: Index):
+    content = makeWheel("demo", "1.0")
+    index.routes[f"/files/{WHEEL_NAME}"] = content
+    return content
+
+
+@pytest.fixture
+def client(tmp_path: Path):
+    client = PypiClient(cache=MetadataCache(tmp_path / "pypi"))
+    yield client
+    client.pool.close()
+
+
+def test_memory_bounded(tmp_path: Path):
+    memory = MemoryCache(budget=10, limit=6)
+    memory.put("a", 1, 4)
+    memory.put("b", 2, 4)
+    assert memory.get("a") == 1
+    memory.put("c", 3, 4)
+    # the least recently used item is evicted
+    assert memory.get("b") is None
+    assert memory.get("a") == 1 and memory.get("c") == 3
+    memory.put("d", 4, 7)
+    assert memory.get("d") is None and memory.size == 8
+
+    # responses out of memory are loaded from disk
+    cache = MetadataCache(tmp_path, memory=MemoryCache(budget=10, limit=6))
+    cache.save("small", b"1234")
+    cache.save("large", b"1234567")
+    assert len(cache.memory) == 1
+    loaded = cache.load("large")
+    assert loaded is not None and loaded.body == b"1234567"
+    assert len(cache.memory) == 1
+
+
+def test_unavailable_expires(tmp_path: Path):
+    store = WheelStore(tmp_path)
+    release = Release(project="demo", version="1.0")
+    wheel = tmp_path / WHEEL_NAME
+    wheel.write_bytes(makeWheel("demo", "1.0"))
+    store.add(release, "3.11", wheel)
+    store.markUnavailable(release, "3.12")
+    assert store.find(release, ["3.12", "3.11"]) == (
+        store.objectFile(hashlib.sha256(wheel.read_bytes()).hexdigest(), WHEEL_NAME),
+        "3.11",
+    )
+
+    # the index is probed again for the more preferred version
+    store.ttl = 0
+    assert store.find(release, ["3.12", "3.11"]) is None
+    assert store.find(release, ["3.12", "3.11"], offline=True) is not None
+
+
+def addJson(
+    index: Index, wheel: bytes, sha256: str = "", metadata: bytes | None = None
+):
+    release = {
+        "filename": WHEEL_NAME,
+        "packagetype": "bdist_wheel",
+        "url": f"../../files/{WHEEL_NAME}",
+        "digests": {"sha256": sha256 or hashlib.sha256(wheel).hexdigest()},
+        "requires_python": ">=3.8",
+    }
+    if metadata is not None:
+        release["core-metadata"] = {"sha256": hashlib.sha256(metadata).hexdigest()}
+        index.routes[f"/files/{WHEEL_NAME}.metadata"] = metadata
+    index.routes["/pypi/demo/json"] = json.dumps(
+        {"info": {"name": "demo"}, "releases": {"1.0": [release]}}
+    ).encode()
+
+
+def addSimple(index: Index, wheel: bytes):
+    sha256 = hashlib.sha256(wheel).hexdigest()
+    index.routes["/simple/"] = (
+        b'<html><body><a href="/simple/demo/">demo</a></body></html>'
+    )
+    index.routes["/simple/demo/"] = (
+        f'<html><body><a href="../../files/{WHEEL_NAME}#sha256={sha256}">{WHEEL_NAME}</a></body></html>'
+    ).encode()
+
+
+def preprocessor(tmp_path: Path, client: PypiClient):
+    return WheelDownloadPreprocessor(
+        tmp_path / "wheels", store=WheelStore(tmp_path / "store"), client=client
+    )
+
+
+def test_keep_alive(index: Index, wheel: bytes, client: PypiClient, tmp_path: Path):
+    addJson(index, wheel)
+    addSimple(index, wheel)
+    client.get(f"{index.url}pypi/demo/json")
+    client.download(
+        f"{index.url}files/{WHEEL_NAME}",
+        tmp_path / WHEEL_NAME,
+        sha256=hashlib.sha256(wheel).hexdigest(),
+    )
+    client.get(f"{index.url}simple/demo/")
+
+    assert (tmp_path / WHEEL_NAME).read_bytes() == wheel
+    assert len(index.requests) == 3
+    assert index.connections == 1
+
+
+def test_sha256_mismatch(
+    index: Index, wheel: bytes, client: PypiClient, tmp_path: Path
+):
+    target = tmp_path / WHEEL_NAME
+    with pytest.raises(Exception, match="sha256 mismatch"):
+        client.download(f"{index.url}files/{WHEEL_NAME}", target, sha256="0" * 64)
+    assert list(tmp_path.glob(f"*{WHEEL_NAME}*")) == []
+
+
+def test_download_json(
+    index: Index,
+    wheel: bytes,
+    client: PypiClient,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(pypi, "JSON_ORIGIN", f"{index.url}pypi/")
+    addJson(index, wheel)
+
+    product = Distribution(release=Release(project="demo", version="1.0"))
+    preprocessor(tmp_path, client).preprocess(product)
+
+    assert product.pyversion == PYVERSIONS[0]
+    assert product.wheelFile and product.wheelFile.read_bytes() == wheel
+    assert not any(path.startswith("/simple/") for path in index.paths())
+
+
+def test_download_json_sha256_mismatch(
+    index: Index,
+    wheel: bytes,
+    client: PypiClient,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(pypi, "JSON_ORIGIN", f"{index.url}pypi/")
+    monkeypatch.setattr(download, "INDEX_ORIGIN", f"{index.url}simple/")
+    addJson(index, wheel, sha256="0" * 64)
+
+    product = Distribution(release=Release(project="demo", version="1.0"))
+    with pytest.raises(Exception):
+        preprocessor(tmp_path, client).preprocess(product)
+    assert f"/files/{WHEEL_NAME}" in index.paths()
+    assert not (tmp_path / "wheels" / WHEEL_NAME).exists()
+
+
+def test_download_simple(
+    index: Index,
+    wheel: bytes,
+    client: PypiClient,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(pypi, "JSON_ORIGIN", f"{index.url}pypi/")
+    monkeypatch.setattr(pypi, "INDEX_ORIGIN", f"{index.url}simple/")
+    monkeypatch.setattr(download, "INDEX_ORIGIN", f"{index.url}simple/")
+    addSimple(index, wheel)
+
+    assert client.index() == ["demo"]
+
+    # no JSON API, so pip downloads from the simple API
+    product = Distribution(release=Release(project="demo", version="1.0"))
+    preprocessor(tmp_path, client).preprocess(product)
+
+    assert product.pyversion == PYVERSIONS[0]
+    assert product.wheelFile and product.wheelFile.read_bytes() == wheel
+    assert "/pypi/demo/json" in index.paths()
+    assert "/simple/demo/" in index.paths()
+
+
+METADATA = b"Metadata-Version: 2.1\nName: demo\nVersion: 1.0\nSummary: From the metadata file\nRequires-Dist: click\n"
+
+
+@pytest.fixture
+def largeWheel(index: Index):
+    content = makeWheel("demo", "1.0", padding=1 << 20)
+    index.routes[f"/files/{WHEEL_NAME}"] = content
+    return content
+
+
+def fetchMetadata(tmp_path: Path, client: PypiClient):
+    product = Distribution(
+        release=Release(project="demo", version="1.0"), rootPath=tmp_path
+    )
+    WheelMetadataFetchPreprocessor(client=client).preprocess(product)
+    return product
+
+
+def wheelRequests(index: Index):
+    return [
+        headers for path, headers in index.requests if path == f"/files/{WHEEL_NAME}"
+    ]
+
+
+@pytest.fixture
+def jsonApi(index: Index, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(pypi, "JSON_ORIGIN", f"{index.url}pypi/")
+
+
+@pytest.mark.usefixtures("jsonApi")
+def test_fetch_metadata_file(
+    index: Index, largeWheel: bytes, client: PypiClient, tmp_path: Path
+):
+    addJson(index, largeWheel, metadata=METADATA)
+
+    product = fetchMetadata(tmp_path, client)
+
+    assert product.rootPath is None and product.wheelFile is None
+    assert product.pyversion == PYVERSIONS[0]
+    assert product.topModules == ["demo"]
+    assert product.dependencies == ["click"]
+    assert ("Summary", "From the metadata file") in product.metadata
+    assert f"/files/{WHEEL_NAME}.metadata" in index.paths()
+    requests = wheelRequests(index)
+    assert requests and all("Range" in headers for headers in requests)
+
+
+@pytest.mark.usefixtures("jsonApi")
+def test_fetch_metadata_mismatch(
+    index: Index, largeWheel: bytes, client: PypiClient, tmp_path: Path
+):
+    addJson(index, largeWheel, metadata=METADATA)
+    index.routes[f"/files/{WHEEL_NAME}.metadata"] = METADATA + b"Summary: Changed\n"
+
+    product = fetchMetadata(tmp_path, client)
+
+    # the metadata file is rejected, and METADATA is read from the wheel
+    assert product.dependencies == ["click"]
+    assert not any(name == "Summary" for name, _ in product.metadata)
+
+
+@pytest.mark.usefixtures("jsonApi")
+def test_fetch_range(
+    index: Index, largeWheel: bytes, client: PypiClient, tmp_path: Path
+):
+    addJson(index, largeWheel)
+
+    product = fetchMetadata(tmp_path, client)
+
+    assert product.rootPath is None
+    assert product.topModules == ["demo"]
+    assert product.dependencies == ["click"]
+    requests = wheelRequests(index)
+    assert requests and all("Range" in headers for headers in requests)
+    # the padding in the middle of the wheel is never read
+    assert len(requests) <= 3
+    assert index.connections == 1
+
+
+@pytest.mark.usefixtures("jsonApi")
+def test_fetch_no_range(
+    index: Index, largeWheel: bytes, client: PypiClient, tmp_path: Path
+):
+    index.ranges = False
+    addJson(index, largeWheel, metadata=METADATA)
+
+    # the metadata file alone gives no top-level modules
+    product = fetchMetadata(tmp_path, client)
+    assert product.rootPath is None
+    assert product.pyversion == PYVERSIONS[0]
+    assert product.topModules == []
+    assert product.dependencies == ["click"]
+
+    del index.routes[f"/files/{WHEEL_NAME}.metadata"]
+    addJson(index, largeWheel)
+    client.cache.memory.clear()
+    client.ttl = 0
+    with pytest.raises(Exception, match="Range requests are not supported"):
+        fetchMetadata(tmp_path, client)
@@ -0,0 +1,75 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+from aexpy.environments import ClonableEnvironmentBuilder, ExecutionEnvironment
+from aexpy.environments.reuse import ReusableEnvironmentBuilder
+
+SRC = pathlib.Path(__file__).parent.parent / "src"
+
+HOLDER = """
+import pathlib
+import sys
+import time
+from aexpy import utils
+
+with utils.fileLock(pathlib.Path(sys.argv[1]), timeout=0):
+    print("locked", flush=True)
+    time.sleep(60)
+"""
+
+
+class FakeBuilder(ClonableEnvironmentBuilder[ExecutionEnvironment]):
+    def __init__(self):
+        super().__init__(envprefix="fake-")
+        self.removed: list[str] = []
+
+    def create(self, name, pyversion="3.12"):
+        pass
+
+    def clone(self, source, name):
+        pass
+
+    def remove(self, name):
+        self.removed.append(name)
+
+    def environment(self, name, logger=None):
+        raise NotImplementedError()
+
+    def build(self, pyversion="3.12", logger=None):
+        raise NotImplementedError()
+
+    def clean(self, env):
+        pass
+
+
+def test_evict_skips_envs_in_use(tmp_path: pathlib.Path):
+    inner = FakeBuilder()
+    builder = ReusableEnvironmentBuilder(inner, budget=0, root=tmp_path)
+    for key in ("used", "idle"):
+        builder.recordFile(key).write_text(
+            json.dumps({"name": f"env-{key}", "size": 1, "used": 0})
+        )
+
+    # an extraction holds the lock of its env for longer than any timeout
+    proc = subprocess.Popen(
+        [sys.executable, "-c", HOLDER, str(builder.lockFile("used"))],
+        stdout=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+    )
+    try:
+        assert proc.stdout is not None and proc.stdout.readline() == "locked\n"
+        os.utime(builder.lockFile("used"), (0, 0))
+        builder.evict()
+        assert inner.removed == ["env-idle"]
+        assert builder.recordFile("used").exists()
+    finally:
+        proc.kill()
+        proc.wait()
+
+    # the lock is released once the holder exits
+    builder.evict()
+    assert inner.removed == ["env-idle", "env-used"]
@@ -0,0 +1,63 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+SRC = pathlib.Path(__file__).parent.parent / "src"
+
+PACKAGE = """
+import asyncio
+import collections
+
+
+class Fut(asyncio.Future):
+    pass
+
+
+class Ordered(collections.OrderedDict):
+    pass
+"""
+
+SCRIPT = """
+import json
+import sys
+
+if sys.argv[2] == "preload":
+    import asyncio
+
+from pathlib import Path
+from aexpy.extracting.static import StaticExtractor
+from aexpy.models import ApiDescription, Distribution
+
+dist = Distribution(rootPath=Path(sys.argv[1]), topModules=["pkg"], pyversion="3.12")
+product = ApiDescription(distribution=dist)
+StaticExtractor().extract(dist, product)
+print(json.dumps({id: entry.model_dump(mode="json") for id, entry in product.classes.items()}))
+"""
+
+
+def extract(root: pathlib.Path, mode: str):
+    res = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(root), mode],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+    )
+    assert res.returncode == 0, res.stderr
+    return json.loads(res.stdout)
+
+
+def test_external_bases(tmp_path: pathlib.Path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text(PACKAGE)
+
+    plain = extract(tmp_path, "plain")
+    assert extract(tmp_path, "preload") == plain
+
+    fut = plain["pkg.Fut"]
+    assert fut["bases"] == ["_asyncio.Future"]
+    assert fut["mros"] == ["pkg.Fut", "_asyncio.Future", "builtins.object"]
+    assert "collections.abc.Awaitable" in fut["abcs"]
+    assert "unknown" not in fut["data"]
+    assert fut["data"]["stdlib"] == f"{sys.version_info.major}.{sys.version_info.minor}"
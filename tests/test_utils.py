@@ -0,0 +1,63 @@
+import os
+import pathlib
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from aexpy import utils
+
+SRC = pathlib.Path(__file__).parent.parent / "src"
+
+HOLDER = """
+import pathlib
+import sys
+import time
+from aexpy import utils
+
+with utils.fileLock(pathlib.Path(sys.argv[1])):
+    print("locked", flush=True)
+    time.sleep(60)
+"""
+
+
+@pytest.fixture
+def holder(tmp_path: pathlib.Path):
+    """Process holding the lock until killed."""
+
+    path = tmp_path / "test.lock"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", HOLDER, str(path)],
+        stdout=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+    )
+    try:
+        assert proc.stdout is not None and proc.stdout.readline() == "locked\n"
+        yield proc, path
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_lock_held_while_alive(holder):
+    proc, path = holder
+    # an old lock is not broken while the holder is alive
+    os.utime(path, (0, 0))
+    with pytest.raises(TimeoutError):
+        with utils.fileLock(path, timeout=0.3):
+            pass
+    assert path.read_text() == str(proc.pid)
+
+
+def test_lock_released_on_exit(holder):
+    proc, path = holder
+    proc.send_signal(signal.SIGKILL)
+    proc.wait()
+    with utils.fileLock(path, timeout=0):
+        assert path.read_text() == str(os.getpid())
+    # the lock file is kept, and taken again
+    assert path.exists()
+    with utils.fileLock(path, timeout=0):
+        pass